@@ -0,0 +1,90 @@
+"""Measures conversion throughput for each number of worker processes.
+
+An input file is converted with MasterConverter once for each worker count
+(--mp), and the elapsed time and lines per second are printed. The crv,
+crs, crm, and crl outputs of all worker counts are checked to be identical.
+Without --input, a synthetic VCF file is made, for which a VCF converter
+module must be installed.
+
+    python benchmarks/converter_workers.py --lines 500000 --workers 1 2 4
+    python benchmarks/converter_workers.py --input in.tsv \\
+        --converter path/to/tsvx-converter --workers 1 4
+    python benchmarks/converter_workers.py --input in.utf16.tsv --encoding utf-16 \\
+        --converter path/to/tsvx-converter --workers 1 4
+"""
+
+from pathlib import Path
+
+OUTPUT_SUFFIXES = [".crv", ".crs", ".crm", ".crl"]
+
+
+def make_vcf(path: Path, num_lines: int):
+    import random
+
+    random.seed(1)
+    with open(path, "w") as wf:
+        wf.write("##fileformat=VCFv4.2\n")
+        wf.write("#CHROM\tPOS\tID\tREF\tALT\tQUAL\tFILTER\tINFO\tFORMAT\ts1\ts2\n")
+        pos = 10000
+        for i in range(num_lines):
+            pos += random.randint(1, 50)
+            ref = random.choice("ACGT")
+            alt = random.choice([b for b in "ACGT" if b != ref])
+            gts = random.choice(["0/1\t1/1", "1/1\t0/0", "0/1\t0/1"])
+            wf.write(f"chr1\t{pos}\t.\t{ref}\t{alt}\t50\tPASS\t.\tGT\t{gts}\n")
+
+
+def main():
+    import argparse
+    import tempfile
+    from time import time
+    from oakvar.lib.base.master_converter import MasterConverter
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--input", default=None)
+    parser.add_argument("--converter", default=None)
+    parser.add_argument("--genome", default="hg38")
+    parser.add_argument("--encoding", default=None, help="Encoding of --input")
+    parser.add_argument("--lines", type=int, default=500000)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    args = parser.parse_args()
+    with tempfile.TemporaryDirectory() as tmpdir:
+        if args.input:
+            input_path = Path(args.input).absolute()
+        else:
+            input_path = Path(tmpdir) / "input.vcf"
+            make_vcf(input_path, args.lines)
+        with open(input_path, "rb") as f:
+            num_lines = sum(1 for _ in f)
+        outputs = set()
+        for num_workers in args.workers:
+            output_dir = Path(tmpdir) / f"workers{num_workers}"
+            output_dir.mkdir()
+            converter = MasterConverter(
+                inputs=[str(input_path)],
+                converter_module=args.converter,
+                name="input",
+                output_dir=str(output_dir),
+                genome=args.genome,
+                input_encoding=args.encoding,
+                mp=num_workers,
+            )
+            start_time = time()
+            converter.run()
+            elapsed = time() - start_time
+            print(
+                f"workers={num_workers}\t{elapsed:.2f}s\t"
+                + f"{num_lines / elapsed:.0f} lines/s"
+            )
+            output = b""
+            for suffix in OUTPUT_SUFFIXES:
+                output_path = output_dir / ("input" + suffix)
+                if output_path.exists():
+                    output += output_path.read_bytes()
+            outputs.add(output)
+        if len(outputs) != 1:
+            raise SystemExit("outputs differ between worker counts")
+
+
+if __name__ == "__main__":
+    main()
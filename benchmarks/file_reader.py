@@ -0,0 +1,90 @@
+"""Measures how fast FileReader reads intermediate files.
+
+A synthetic .crx-like file with int, float, and string columns is written
+in csv format, and rows per second are printed for reading rows as dicts
+(loop_data), as tuples (loop_data(as_tuple=True)), and as pyarrow record
+batches (loop_column_batches). Modes which the FileReader being measured
+does not have are skipped, so the same script can be run with an earlier
+OakVar source tree on PYTHONPATH for comparison.
+
+    python benchmarks/file_reader.py --rows 200000 --repeat 3
+"""
+
+from pathlib import Path
+
+
+def make_file(path: Path, num_rows: int):
+    import random
+    from oakvar.lib.util.inout import FileWriter
+
+    random.seed(1)
+    columns = [
+        {"name": "uid", "title": "UID", "type": "int"},
+        {"name": "chrom", "title": "Chrom", "type": "string"},
+        {"name": "pos", "title": "Position", "type": "int"},
+        {"name": "ref_base", "title": "Ref", "type": "string"},
+        {"name": "alt_base", "title": "Alt", "type": "string"},
+        {"name": "score", "title": "Score", "type": "float"},
+        {"name": "af", "title": "AF", "type": "float"},
+        {"name": "depth", "title": "Depth", "type": "int"},
+        {"name": "gene", "title": "Gene", "type": "string"},
+        {"name": "so", "title": "SO", "type": "string"},
+        {"name": "qual", "title": "Qual", "type": "float"},
+        {"name": "note", "title": "Note", "type": "string"},
+    ]
+    wf = FileWriter(str(path))
+    wf.add_columns(columns)
+    wf.write_definition()
+    for uid in range(1, num_rows + 1):
+        wf.write_data(
+            {
+                "uid": uid,
+                "chrom": "chr1",
+                "pos": uid * 10,
+                "ref_base": random.choice("ACGT"),
+                "alt_base": random.choice("ACGT"),
+                "score": random.random(),
+                "af": random.choice([None, random.random()]),
+                "depth": random.randint(0, 100),
+                "gene": f"GENE{uid % 500}",
+                "so": "MIS",
+                "qual": random.uniform(0, 100),
+                "note": random.choice(["", "note"]),
+            }
+        )
+    wf.close()
+
+
+def main():
+    import argparse
+    import tempfile
+    from time import time
+    from inspect import signature
+    from oakvar.lib.util.inout import FileReader
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=200000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+    with tempfile.TemporaryDirectory() as tmpdir:
+        path = Path(tmpdir) / "input.crx"
+        make_file(path, args.rows)
+        modes = {"dict": lambda reader: reader.loop_data()}
+        if "as_tuple" in signature(FileReader.loop_data).parameters:
+            modes["tuple"] = lambda reader: reader.loop_data(as_tuple=True)
+        if hasattr(FileReader, "loop_column_batches"):
+            modes["record batch"] = lambda reader: reader.loop_column_batches()
+        for title, loop in modes.items():
+            elapsed_l = []
+            for _ in range(args.repeat):
+                reader = FileReader(str(path))
+                start_time = time()
+                for _ in loop(reader):
+                    pass
+                elapsed_l.append(time() - start_time)
+            elapsed = min(elapsed_l)
+            print(f"{title}\t{elapsed:.3f}s\t{args.rows / elapsed:.0f} rows/s")
+
+
+if __name__ == "__main__":
+    main()
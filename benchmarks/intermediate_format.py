@@ -0,0 +1,96 @@
+"""Measures a whole job with each format of intermediate files.
+
+An input file is run through the converter, mapper, annotators, and
+aggregator with csv and with arrow intermediate files (the
+intermediate_format system conf, set here through its environment
+variable), and the elapsed time of each job is printed. The tables of the
+two result databases, including the info table apart from the entries
+which depend on the time of the job, are checked to be identical. The
+mapper, the annotators, and the converter module for the input, unless
+given as a path with --converter, must be installed.
+
+    python benchmarks/intermediate_format.py --input in.vcf -m gencode -a clinvar
+    python benchmarks/intermediate_format.py --input in.tsv \\
+        --converter path/to/tsvx-converter -m fakemapper --genome hg38 --mp 4
+"""
+
+from pathlib import Path
+
+FORMATS = ["csv", "arrow"]
+TIME_INFO_KEYS = ["created_at", "modified_at", "job_name"]
+
+
+def get_table_digests(db_path: Path):
+    import sqlite3
+    from hashlib import md5
+
+    conn = sqlite3.connect(db_path)
+    table_names = [
+        row[0]
+        for row in conn.execute(
+            "select name from sqlite_master where type='table' order by name"
+        )
+    ]
+    digests = {}
+    for table_name in table_names:
+        if table_name == "info":
+            q = "select * from info where colkey not in ({}) order by colkey".format(
+                ", ".join(["?"] * len(TIME_INFO_KEYS))
+            )
+            rows = conn.execute(q, TIME_INFO_KEYS).fetchall()
+        else:
+            rows = sorted(
+                conn.execute(f'select * from "{table_name}"').fetchall(), key=repr
+            )
+        digests[table_name] = md5(repr(rows).encode()).hexdigest()
+    conn.close()
+    return digests
+
+
+def main():
+    import argparse
+    import tempfile
+    from os import environ
+    from time import time
+    from oakvar.api import run
+    from oakvar.lib.system import get_env_key
+    from oakvar.lib.system.consts import intermediate_format_key
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--input", required=True)
+    parser.add_argument("--converter", default=None, help="Converter module")
+    parser.add_argument("-m", "--mapper", required=True)
+    parser.add_argument("-a", "--annotators", nargs="*", default=[])
+    parser.add_argument("--genome", default=None)
+    parser.add_argument("--mp", type=int, default=None)
+    args = parser.parse_args()
+    env_key = get_env_key(intermediate_format_key)
+    input_path = Path(args.input).absolute()
+    with tempfile.TemporaryDirectory() as tmpdir:
+        digests = {}
+        for fmt in FORMATS:
+            environ[env_key] = fmt
+            output_dir = Path(tmpdir) / fmt
+            output_dir.mkdir()
+            start_time = time()
+            run(
+                inputs=[str(input_path)],
+                annotators=args.annotators,
+                mapper_name=[args.mapper],
+                converter_module=args.converter,
+                genome=args.genome,
+                mp=args.mp,
+                output_dir=[str(output_dir)],
+                run_name=[input_path.name],
+            )
+            elapsed = time() - start_time
+            print(f"{fmt}\t{elapsed:.2f}s")
+            digests[fmt] = get_table_digests(output_dir / (input_path.name + ".sqlite"))
+        for table_name in sorted(set().union(*digests.values())):
+            values = [digests[fmt].get(table_name) for fmt in FORMATS]
+            if len(set(values)) > 1:
+                raise SystemExit(f"{table_name} table differs between formats")
+
+
+if __name__ == "__main__":
+    main()
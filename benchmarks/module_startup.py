@@ -0,0 +1,132 @@
+"""Measures the startup time of `ov module ls` and `oakvar.get_annotator`
+with many installed modules.
+
+A temporary OakVar root with the given number of synthetic annotators is
+made, and each command is run in a new process several times with no
+module index in the conf directory (cold) and with the index written by an
+earlier run (warm). Median wall times are printed. --pythonpath runs the
+commands with another OakVar source tree, for comparison.
+
+    python benchmarks/module_startup.py --modules 300 --repeat 5
+"""
+
+import sys
+from pathlib import Path
+
+MODULE_YML = """title: Synthetic annotator {n}
+version: 1.0.{n}
+type: annotator
+level: variant
+description: Synthetic annotator {n} for startup benchmarks
+tags:
+- variants
+- benchmark
+developer:
+  module:
+    name: OakVar
+    email: info@oakbioinformatics.com
+    organization: Oak Bioinformatics
+    citation: ''
+    website: https://oakvar.com
+  data:
+    name: OakVar
+    email: ''
+    organization: ''
+    citation: ''
+    website: ''
+output_columns:
+- name: score
+  title: Score
+  type: float
+- name: label
+  title: Label
+  type: string
+- name: count
+  title: Count
+  type: int
+"""
+MODULE_PY = """from oakvar import BaseAnnotator
+
+
+class Annotator(BaseAnnotator):
+    def annotate(self, input_data, secondary_data=None):
+        return {"score": 1.0, "label": "a", "count": 1}
+"""
+
+
+def make_modules(modules_dir: Path, num_modules: int):
+    for n in range(num_modules):
+        name = f"synth{n:04d}"
+        module_dir = modules_dir / "annotators" / name
+        (module_dir / "test").mkdir(parents=True)
+        (module_dir / "data").mkdir()
+        (module_dir / f"{name}.yml").write_text(MODULE_YML.format(n=n))
+        (module_dir / f"{name}.py").write_text(MODULE_PY)
+        (module_dir / f"{name}.md").write_text(f"# {name}\n\n" + "text " * 4000)
+        (module_dir / "test" / "input").write_text("chr1\t1\t+\tA\tG\n")
+        (module_dir / "test" / "key").write_text("chr1\t1\t+\tA\tG\n")
+        (module_dir / "logo.png").write_bytes(b"\x89PNG\r\n\x1a\n" + b"\0" * 2048)
+        (module_dir / "data" / f"{name}.sqlite").write_bytes(b"\0" * 4096)
+
+
+def time_command(cmd, env) -> float:
+    import subprocess
+    from time import time
+
+    start_time = time()
+    subprocess.run(cmd, env=env, check=True, stdout=subprocess.DEVNULL)
+    return time() - start_time
+
+
+def main():
+    import argparse
+    import os
+    import tempfile
+    from statistics import median
+    from oakvar.lib.consts import MODULE_INDEX_FNAME
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--modules", type=int, default=300)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--pythonpath", default=None)
+    args = parser.parse_args()
+    with tempfile.TemporaryDirectory() as root_dir:
+        root = Path(root_dir)
+        env = dict(os.environ)
+        for key, subdir in [
+            ("OV_ROOT_DIR", ""),
+            ("OV_CONF_DIR", "conf"),
+            ("OV_MODULES_DIR", "modules"),
+            ("OV_JOBS_DIR", "jobs"),
+            ("OV_LOG_DIR", "logs"),
+        ]:
+            (root / subdir).mkdir(exist_ok=True)
+            env[key] = str(root / subdir)
+        if args.pythonpath:
+            env["PYTHONPATH"] = args.pythonpath
+        make_modules(root / "modules", args.modules)
+        index_path = root / "conf" / MODULE_INDEX_FNAME
+        commands = {
+            "ov module ls": [sys.executable, "-m", "oakvar", "module", "ls"],
+            "get_annotator": [
+                sys.executable,
+                "-c",
+                "import oakvar; oakvar.get_annotator('synth0000')",
+            ],
+        }
+        for title, cmd in commands.items():
+            cold = []
+            warm = []
+            for _ in range(args.repeat):
+                if index_path.exists():
+                    index_path.unlink()
+                cold.append(time_command(cmd, env))
+                warm.append(time_command(cmd, env))
+            print(
+                f"{title}\t{args.modules} modules\t"
+                + f"cold {median(cold):.3f}s\twarm {median(warm):.3f}s"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,194 @@
+"""Measures how fast a postaggregator writes its output columns.
+
+A synthetic result database with variant, gene, and header tables is
+written, and a postaggregator which computes a score and a label from
+base__pos is run on a copy of it once for each way of writing: annotate
+with the buffered write_output, the same with staged writes (staged_write),
+and annotate_df with save_df (df_mode). Staged writes are also run with
+the correlated subqueries used on SQLite older than 3.33.0 instead of
+update ... from (update_from = False). The time and a digest of the
+written columns are printed, and the written columns of all modes are
+checked to be identical. Modes which the OakVar being measured does not
+have are skipped, so the same script can be run with an earlier OakVar
+source tree on PYTHONPATH for comparison.
+
+    python benchmarks/postaggregator_df.py --variants 500000 --repeat 3
+"""
+
+from pathlib import Path
+
+from oakvar.lib.base.postaggregator import BasePostAggregator
+
+MODULE_NAME = "benchpost"
+RUN_NAME = "bench"
+MODULE_CONF = {
+    "level": "variant",
+    "title": "Benchmark postaggregator",
+    "version": "1.0.0",
+    "input_columns": ["base__uid", "base__pos"],
+    "output_columns": [
+        {"name": "score", "title": "Score", "type": "float"},
+        {"name": "label", "title": "Label", "type": "string", "category": "single"},
+    ],
+}
+
+
+class RowPostAggregator(BasePostAggregator):
+    def annotate(self, input_data):
+        pos = input_data["base__pos"]
+        # Some variants get no output, to exercise rows which are not written.
+        if pos % 7 == 0:
+            return None
+        return {
+            "score": pos % 1000 * 0.5,
+            "label": "even" if pos % 2 == 0 else "odd",
+        }
+
+
+class StagedRowPostAggregator(RowPostAggregator):
+    staged_write = True
+
+
+class CorrelatedRowPostAggregator(StagedRowPostAggregator):
+    update_from = False
+
+
+class DfPostAggregator(BasePostAggregator):
+    df_mode = True
+
+    def annotate_df(self, df):
+        import polars as pl
+
+        return df.filter(pl.col("base__pos") % 7 != 0).select(
+            pl.col("base__uid"),
+            (pl.col("base__pos") % 1000 * 0.5).alias("score"),
+            pl.when(pl.col("base__pos") % 2 == 0)
+            .then(pl.lit("even"))
+            .otherwise(pl.lit("odd"))
+            .alias("label"),
+        )
+
+
+class CorrelatedDfPostAggregator(DfPostAggregator):
+    update_from = False
+
+
+def make_db(path: Path, num_variants: int):
+    import sqlite3
+    import random
+
+    random.seed(0)
+    conn = sqlite3.connect(path)
+    conn.execute(
+        "create table variant (base__uid integer primary key, base__chrom text, "
+        + "base__pos integer, base__ref_base text, base__alt_base text, "
+        + "base__hugo text)"
+    )
+    conn.execute("create table gene (base__hugo text)")
+    for level in ["variant", "gene"]:
+        conn.execute(f"create table {level}_header (col_name text, col_def text)")
+        conn.execute(
+            f"create table {level}_annotator (name text primary key, "
+            + "displayname text, version text)"
+        )
+    conn.executemany(
+        "insert into variant values (?, ?, ?, ?, ?, ?)",
+        (
+            (
+                uid,
+                "chr1",
+                random.randint(1, 200000000),
+                "A",
+                "G",
+                f"GENE{uid % 100}",
+            )
+            for uid in range(1, num_variants + 1)
+        ),
+    )
+    conn.executemany(
+        "insert into gene values (?)", ((f"GENE{i}",) for i in range(100))
+    )
+    conn.execute("create index variant_idx_0 on variant (base__uid)")
+    conn.commit()
+    conn.close()
+
+
+def get_output_digest(db_path: Path) -> str:
+    import sqlite3
+    from hashlib import md5
+
+    conn = sqlite3.connect(db_path)
+    digest = md5()
+    q = (
+        f"select base__uid, {MODULE_NAME}__score, {MODULE_NAME}__label "
+        + "from variant order by base__uid"
+    )
+    for row in conn.execute(q):
+        digest.update(repr(row).encode())
+    conn.close()
+    return digest.hexdigest()
+
+
+def run_mode(postaggregator_class, db_path: Path, tmpdir: Path):
+    from shutil import copyfile
+    from time import time
+    from copy import deepcopy
+
+    run_dir = tmpdir / "run"
+    run_dir.mkdir(exist_ok=True)
+    run_db_path = run_dir / f"{RUN_NAME}.sqlite"
+    copyfile(db_path, run_db_path)
+    postaggregator = postaggregator_class(
+        module_name=MODULE_NAME,
+        # fix_col_names prefixes the column names of the conf in place.
+        module_conf=deepcopy(MODULE_CONF),
+        run_name=RUN_NAME,
+        output_dir=str(run_dir),
+    )
+    start_time = time()
+    postaggregator.run()
+    elapsed = time() - start_time
+    digest = get_output_digest(run_db_path)
+    run_db_path.unlink()
+    return elapsed, digest
+
+
+def main():
+    import argparse
+    import tempfile
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--variants", type=int, default=500000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+    modes = {"annotate": RowPostAggregator}
+    if hasattr(BasePostAggregator, "staged_write"):
+        modes["annotate staged"] = StagedRowPostAggregator
+    if hasattr(BasePostAggregator, "update_from"):
+        modes["annotate correlated"] = CorrelatedRowPostAggregator
+    if hasattr(BasePostAggregator, "df_mode"):
+        modes["annotate_df"] = DfPostAggregator
+        modes["annotate_df correlated"] = CorrelatedDfPostAggregator
+    with tempfile.TemporaryDirectory() as tmpdir:
+        tmpdir = Path(tmpdir)
+        db_path = tmpdir / "source.sqlite"
+        make_db(db_path, args.variants)
+        digests = set()
+        for title, postaggregator_class in modes.items():
+            results = [
+                run_mode(postaggregator_class, db_path, tmpdir)
+                for _ in range(args.repeat)
+            ]
+            elapsed = min([v[0] for v in results])
+            digest = results[0][1]
+            digests.update([v[1] for v in results])
+            print(
+                f"{title}\t{elapsed:.3f}s\t{args.variants / elapsed:.0f} rows/s\t"
+                + digest
+            )
+        if len(digests) > 1:
+            raise SystemExit("written columns differ between modes")
+
+
+if __name__ == "__main__":
+    main()
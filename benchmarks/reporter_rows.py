@@ -0,0 +1,201 @@
+"""Measures how fast BaseReporter post-processes and writes result rows.
+
+A result database (run_name.sqlite) is reported with BaseReporter
+subclasses which only hash the rows they are given, so that the time is
+spent in reading rows and in report substitution, all_mappings handling,
+and newline escaping. The rows are written as dicts (the default), as
+lists (dictrow = False), and with all_mappings kept as JSON
+(keep_json_all_mapping). Installed reporter modules, such as tsvreporter,
+csvreporter, and excelreporter, can be given with --reporters to time
+them on the same database.
+
+With --reportsub, report substitutions for the so and all_mappings columns
+of the base module are added to the copied database, so that a database
+made without them still exercises the substitution path.
+
+The database is copied to a temporary directory before each run, so the
+report filter and any files written by reporters do not change it. The
+digest of the rows (or of the output files of a reporter module) is
+printed with the time, so the same script can be run with an earlier
+OakVar source tree on PYTHONPATH to compare both the speed and the output.
+
+    python benchmarks/reporter_rows.py --db run_name.sqlite --repeat 3 --reportsub
+    python benchmarks/reporter_rows.py --db run_name.sqlite --reporters tsvreporter
+"""
+
+from pathlib import Path
+
+from oakvar.lib.base.reporter import BaseReporter
+
+SO_SUB = {"MIS": "missense_variant", "SYN": "synonymous_variant"}
+REPORTSUB = {"so": SO_SUB, "all_mappings": SO_SUB}
+
+
+class RowHashReporter(BaseReporter):
+    def setup(self):
+        from hashlib import md5
+
+        self.digest = md5()
+        self.num_rows = 0
+
+    def write_table_row(self, row):
+        from json import dumps
+
+        self.num_rows += 1
+        self.digest.update(dumps(row, sort_keys=True).encode())
+
+
+class ListRowHashReporter(RowHashReporter):
+    def setup(self):
+        super().setup()
+        self.dictrow = False
+
+
+class KeepJsonRowHashReporter(RowHashReporter):
+    def setup(self):
+        super().setup()
+        self.keep_json_all_mapping = True
+
+
+def copy_db(db_path: Path, tmpdir: Path, reportsub: bool) -> Path:
+    from shutil import copyfile
+
+    run_dir = tmpdir / "run"
+    if run_dir.exists():
+        from shutil import rmtree
+
+        rmtree(run_dir)
+    run_dir.mkdir()
+    dst = run_dir / db_path.name
+    copyfile(db_path, dst)
+    if reportsub:
+        import sqlite3
+        from json import dumps
+
+        conn = sqlite3.connect(dst)
+        conn.execute(
+            "insert or replace into variant_reportsub values (?, ?)",
+            ("base", dumps(REPORTSUB)),
+        )
+        conn.commit()
+        conn.close()
+    return dst
+
+
+def get_files_digest(run_dir: Path, db_path: Path) -> str:
+    from hashlib import md5
+
+    digest = md5()
+    for path in sorted(run_dir.iterdir()):
+        if path.name.startswith(db_path.name) or path.name.endswith(".log"):
+            continue
+        digest.update(path.name.encode())
+        digest.update(path.read_bytes())
+    return digest.hexdigest()
+
+
+async def run_mode(reporter_class, db_path: Path, tmpdir: Path, args):
+    from time import time
+
+    dbpath = copy_db(db_path, tmpdir, args.reportsub)
+    reporter = reporter_class(
+        dbpath=str(dbpath),
+        module_name="benchreporter",
+        separatesample=args.separatesample,
+    )
+    start_time = time()
+    await reporter.run()
+    elapsed = time() - start_time
+    return elapsed, reporter.num_rows, reporter.digest.hexdigest()
+
+
+async def run_module(module_name: str, db_path: Path, tmpdir: Path, args):
+    from time import time
+    from oakvar.lib.module.local import get_local_module_info
+    from oakvar.lib.util.util import load_class
+
+    module = get_local_module_info(module_name)
+    if module is None:
+        return None
+    Reporter = load_class(module.script_path, "Reporter")
+    dbpath = copy_db(db_path, tmpdir, args.reportsub)
+    run_name = dbpath.stem
+    reporter = Reporter(  # type: ignore
+        dbpath=str(dbpath),
+        savepath=dbpath.parent / run_name,
+        output_dir=str(dbpath.parent),
+        run_name=run_name,
+        module_name=module_name,
+        separatesample=args.separatesample,
+    )
+    start_time = time()
+    await reporter.run()
+    elapsed = time() - start_time
+    return elapsed, get_files_digest(dbpath.parent, dbpath)
+
+
+async def run_benchmark(args):
+    import tempfile
+
+    db_path = Path(args.db).absolute()
+    modes = {
+        "dict": RowHashReporter,
+        "list": ListRowHashReporter,
+        "keep-JSON": KeepJsonRowHashReporter,
+    }
+    with tempfile.TemporaryDirectory() as tmpdir:
+        tmpdir = Path(tmpdir)
+        for title, reporter_class in modes.items():
+            results = [
+                await run_mode(reporter_class, db_path, tmpdir, args)
+                for _ in range(args.repeat)
+            ]
+            elapsed = min([v[0] for v in results])
+            num_rows, digest = results[0][1:]
+            print(
+                f"{title}\t{elapsed:.3f}s\t{num_rows / elapsed:.0f} rows/s\t"
+                + f"{num_rows} rows\t{digest}"
+            )
+        for module_name in args.reporters:
+            results = []
+            for _ in range(args.repeat):
+                ret = await run_module(module_name, db_path, tmpdir, args)
+                if ret is None:
+                    break
+                results.append(ret)
+            if not results:
+                print(f"{module_name}\tnot installed")
+                continue
+            elapsed = min([v[0] for v in results])
+            print(f"{module_name}\t{elapsed:.3f}s\t{results[0][1]}")
+
+
+def main():
+    import argparse
+    import asyncio
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--db", required=True, help="OakVar result database")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument(
+        "--separatesample",
+        action="store_true",
+        help="Write a row per sample of each variant",
+    )
+    parser.add_argument(
+        "--reportsub",
+        action="store_true",
+        help="Add report substitutions for base so and all_mappings",
+    )
+    parser.add_argument(
+        "--reporters",
+        nargs="*",
+        default=[],
+        help="Installed reporter modules to time as well",
+    )
+    args = parser.parse_args()
+    asyncio.run(run_benchmark(args))
+
+
+if __name__ == "__main__":
+    main()
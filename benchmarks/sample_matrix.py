@@ -0,0 +1,125 @@
+"""Measures how fast the sample x variant matrix of a result database is made.
+
+A synthetic result database with variant and sample tables, indexed as
+the aggregator indexes them, is written, and get_sample_uid_variant_arrays
+is timed without variant criteria and with criteria selecting half of the
+variants. For each run, the time, the dtype, shape, and size of the dense
+matrix, and a digest of its values are printed. Modes which the OakVar
+being measured does not have (sparse matrices, blocks of samples) are
+skipped, so the same script can be run with an earlier OakVar source tree
+on PYTHONPATH to compare both the speed and the matrices.
+
+    python benchmarks/sample_matrix.py --samples 200 --variants 50000
+"""
+
+from pathlib import Path
+
+
+def make_db(path: Path, num_samples: int, num_variants: int, fraction: float):
+    import sqlite3
+    import numpy as np
+
+    conn = sqlite3.connect(path)
+    conn.execute("create table variant (base__uid integer, base__chrom text)")
+    conn.execute(
+        "create table sample (base__uid integer, base__sample_id text, "
+        + "base__zygosity text)"
+    )
+    conn.executemany(
+        "insert into variant values (?, ?)",
+        ((uid, "chr1" if uid % 2 else "chr2") for uid in range(1, num_variants + 1)),
+    )
+    rng = np.random.default_rng(0)
+    for sample_no in range(num_samples):
+        uids = np.nonzero(rng.random(num_variants) < fraction)[0] + 1
+        zygosities = np.where(rng.random(len(uids)) < 0.3, "hom", "het")
+        sample_id = f"s{sample_no:05d}"
+        conn.executemany(
+            "insert into sample values (?, ?, ?)",
+            zip(uids.tolist(), [sample_id] * len(uids), zygosities.tolist()),
+        )
+    for q in [
+        "create index sample_idx_0 on sample (base__uid)",
+        "create index sample_idx_1 on sample (base__sample_id)",
+        "create index sample_idx_2 on sample (base__sample_id, base__uid)",
+        "create index variant_idx_0 on variant (base__uid)",
+    ]:
+        conn.execute(q)
+    conn.commit()
+    conn.close()
+
+
+def get_matrix_summary(arr) -> str:
+    from hashlib import sha1
+    import numpy as np
+
+    if hasattr(arr, "toarray"):
+        arr = arr.toarray()
+    digest = sha1(arr.astype(np.int8).tobytes()).hexdigest()[:12]
+    return f"{arr.dtype}\t{arr.shape}\t{arr.nbytes / 1e6:.1f}MB\t{digest}"
+
+
+def main():
+    import argparse
+    import tempfile
+    from time import time
+    from inspect import signature
+    import numpy as np
+    from oakvar.lib.util import util
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--samples", type=int, default=200)
+    parser.add_argument("--variants", type=int, default=50000)
+    parser.add_argument(
+        "--fraction",
+        type=float,
+        default=0.3,
+        help="Fraction of variants each sample has",
+    )
+    parser.add_argument("--block-size", type=int, default=50)
+    args = parser.parse_args()
+    params = signature(util.get_sample_uid_variant_arrays).parameters
+    with tempfile.TemporaryDirectory() as tmpdir:
+        db_path = str(Path(tmpdir) / "matrix.sqlite")
+        make_db(Path(db_path), args.samples, args.variants, args.fraction)
+        for title, criteria in [
+            ("no criteria", None),
+            ("chr1 criteria", "base__chrom='chr1'"),
+        ]:
+            modes = {"dense": {}}
+            if "sparse" in params:
+                try:
+                    import scipy  # type: ignore # noqa: F401
+
+                    modes["sparse"] = {"sparse": True}
+                except ModuleNotFoundError:
+                    pass
+            for mode, kwargs in modes.items():
+                start_time = time()
+                _, _, arr = util.get_sample_uid_variant_arrays(
+                    db_path, variant_criteria=criteria, **kwargs
+                )
+                elapsed = time() - start_time
+                print(
+                    f"{title}\t{mode}\t{elapsed:.2f}s\t{get_matrix_summary(arr)}"
+                )
+            if hasattr(util, "iter_sample_uid_variant_arrays"):
+                start_time = time()
+                blocks = [
+                    block
+                    for _, _, block in util.iter_sample_uid_variant_arrays(
+                        db_path,
+                        block_size=args.block_size,
+                        variant_criteria=criteria,
+                    )
+                ]
+                elapsed = time() - start_time
+                arr = np.vstack(blocks)
+                print(
+                    f"{title}\tblocks of {args.block_size}\t{elapsed:.2f}s\t"
+                    + get_matrix_summary(arr)
+                )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""Measures vcf2vcf throughput for each number of worker processes.
+
+A synthetic VCF file is annotated with the given mapper and annotators,
+which must be installed, once for each worker count, and the elapsed time
+and lines per second are printed. Outputs of all worker counts are checked
+to be identical.
+
+    python benchmarks/vcf2vcf_workers.py -m gencode -a clinvar \\
+        --lines 200000 --workers 1 2 4 [--bgzip]
+"""
+
+from pathlib import Path
+
+
+def make_vcf(path: Path, num_lines: int):
+    import random
+
+    random.seed(1)
+    with open(path, "w") as wf:
+        wf.write("##fileformat=VCFv4.2\n")
+        wf.write("#CHROM\tPOS\tID\tREF\tALT\tQUAL\tFILTER\tINFO\tFORMAT\ts1\n")
+        pos = 10000
+        for i in range(num_lines):
+            pos += random.randint(1, 50)
+            ref = random.choice("ACGT")
+            alts = [random.choice([b for b in "ACGT" if b != ref])]
+            if i % 7 == 0:
+                alts.append(ref + "TT")
+            info = f"DP={i % 40}" if i % 2 else "."
+            wf.write(
+                f"chr1\t{pos}\t.\t{ref}\t{','.join(alts)}\t50\tPASS\t{info}\tGT\t0/1\n"
+            )
+
+
+def main():
+    import argparse
+    import tempfile
+    import gzip
+    from time import time
+    from oakvar.lib.util.util import load_class
+    from oakvar.lib.base import vcf2vcf
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-m", dest="mapper_name", required=True)
+    parser.add_argument("-a", dest="annotator_names", nargs="*", default=[])
+    parser.add_argument("--lines", type=int, default=200000)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--bgzip", action="store_true", default=False)
+    args = parser.parse_args()
+    VCF2VCF = load_class(vcf2vcf.__file__, "VCF2VCF")
+    with tempfile.TemporaryDirectory() as tmpdir:
+        input_path = Path(tmpdir) / "input.vcf"
+        make_vcf(input_path, args.lines)
+        outputs = set()
+        for num_workers in args.workers:
+            run_name = f"workers{num_workers}"
+            m = VCF2VCF(
+                inputs=[str(input_path)],
+                run_name=run_name,
+                output_dir=tmpdir,
+                mapper_name=args.mapper_name,
+                annotator_names=args.annotator_names,
+                num_workers=num_workers,
+                bgzip=args.bgzip,
+            )
+            start_time = time()
+            m.run()
+            elapsed = time() - start_time
+            print(
+                f"workers={num_workers}\t{elapsed:.2f}s\t"
+                + f"{args.lines / elapsed:.0f} lines/s"
+            )
+            output_path = m.get_output_path(input_path)
+            opener = gzip.open if args.bgzip else open
+            with opener(output_path, "rb") as f:
+                outputs.add(f.read())
+        if len(outputs) != 1:
+            raise SystemExit("outputs differ between worker counts")
+
+
+if __name__ == "__main__":
+    main()
@@ -119,6 +119,9 @@ def run(
     skip_variant_deduplication: bool = False,
     keep_liftover_failed: bool = False,
     keep_ref: bool = False,
+    incremental: bool = False,
+    write_parquet: bool = False,
+    bgzip: bool = False,
     loop=None,
     outer=None,
 ) -> Optional[Dict[str, Any]]:
@@ -170,6 +173,9 @@ def run(
         uid (Optional[str]): uid
         skip_variant_deduplication (bool): Skip de-duplication of variants.
         keep_ref (bool): Keep reference alleles.
+        incremental (bool): Reuses outputs of an earlier run of the same job which are still valid, according to the run manifest (run_name.manifest.json) which is written by incremental runs. Only stages whose inputs, modules, or options changed run again, and new annotations are merged into the existing result database.
+        write_parquet (bool): Writes the variant, gene, and sample tables of the result database to Parquet files (run_name.variant.parquet, etc.) at the end of the run. get_df_from_db reads them instead of the result database while the database is unchanged.
+        bgzip (bool): In vcf2vcf mode, writes bgzip-compressed output (.vcf.gz) with a tabix index (.vcf.gz.tbi).
         loop:
         outer:
 
@@ -242,6 +248,9 @@ def run(
         skip_variant_deduplication=skip_variant_deduplication,
         keep_liftover_failed=keep_liftover_failed,
         keep_ref=keep_ref,
+        incremental=incremental,
+        write_parquet=write_parquet,
+        bgzip=bgzip,
         uid=uid,
         outer=outer,
     )
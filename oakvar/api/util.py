@@ -146,18 +146,6 @@ def job_to_gui(args, __name__="util to-gui"):
     return True
 
 
-def variant_id(chrom, pos, ref, alt):
-    """variant_id.
-
-    Args:
-        chrom:
-        pos:
-        ref:
-        alt:
-    """
-    return chrom + str(pos) + ref + alt
-
-
 def sqliteinfo(dbpath: Union[Path, str], fmt: str = "json", outer=None):
     """sqliteinfo.
 
@@ -182,13 +170,20 @@ def sqliteinfo(dbpath: Union[Path, str], fmt: str = "json", outer=None):
 def mergesqlite(dbpaths: List[str] = [], outpath: str = ""):
     """mergesqlite.
 
+    The first result database is copied to `outpath`, and the others are
+    attached to it one by one. Variants are matched on (chrom, pos, ref, alt)
+    through an indexed temporary table, new variants get new UIDs, and the
+    sample and mapping rows of all variants are added with their remapped
+    UIDs, with set-based SQL.
+
     Args:
         dbpaths (List[str]): dbpaths
         outpath (str): outpath
     """
     import sqlite3
-    from json import loads, dumps
+    from json import dumps
     from shutil import copy
+    from time import time
 
     if len(dbpaths) < 2:
         exit("Multiple sqlite file paths should be given")
@@ -212,116 +207,185 @@ def mergesqlite(dbpaths: List[str] = [], outpath: str = ""):
         c.execute("select col_name from gene_header")
         if g_cols != sorted([r[0] for r in c.fetchall()]):
             exit("Annotation columns mismatch (gene table)")
+        c.close()
+        conn.close()
     # Copies the first db.
     print(f"Copying {dbpaths[0]} to {outpath}...")
     copy(dbpaths[0], outpath)
     outconn = sqlite3.connect(outpath)
     outc = outconn.cursor()
-    # Gets key column numbers.
-    outc.execute("select col_name from variant_header order by rowid")
-    cols = [r[0] for r in outc.fetchall()]
-    v_chrom_colno = cols.index("base__chrom")
-    v_pos_colno = cols.index("base__pos")
-    v_ref_colno = cols.index("base__ref_base")
-    v_alt_colno = cols.index("base__alt_base")
-    outc.execute("select col_name from gene_header order by rowid")
-    cols = [r[0] for r in outc.fetchall()]
-    g_hugo_colno = cols.index("base__hugo")
-    outc.execute("select col_name from sample_header order by rowid")
-    cols = [r[0] for r in outc.fetchall()]
-    s_uid_colno = cols.index("base__uid")
-    outc.execute("select col_name from mapping_header order by rowid")
-    cols = [r[0] for r in outc.fetchall()]
-    m_uid_colno = cols.index("base__uid")
-    m_fileno_colno = cols.index("base__fileno")
-    outc.execute("select max(base__uid) from variant")
-    new_uid = outc.fetchone()[0] + 1
+    outc.execute("pragma synchronous=off")
+    table_cols = {}
+    for table_name in ["variant", "gene", "sample", "mapping"]:
+        outc.execute(f"pragma main.table_info({table_name})")
+        table_cols[table_name] = [r[1] for r in outc.fetchall()]
     # Input paths
-    outc.execute('select colkey, colval from info where colkey="_input_paths"')
-    input_paths = loads(outc.fetchone()[1].replace("'", '"'))
-    new_fileno = max([int(v) for v in input_paths.keys()]) + 1
+    input_paths = get_merge_input_paths(outc, "main")
     rev_input_paths = {}
     for fileno, filepath in input_paths.items():
         rev_input_paths[filepath] = fileno
-    # Makes initial hugo and variant id lists.
-    outc.execute("select base__hugo from gene")
-    genes = {r[0] for r in outc.fetchall()}
+    new_fileno = max([int(v) for v in input_paths.keys()] + [-1]) + 1
+    # Keys of merged genes and variants
+    outc.execute("create temp table merge_genes (hugo text primary key)")
+    outc.execute("insert or ignore into temp.merge_genes select base__hugo from main.gene")
+    outc.execute(
+        "create temp table merge_variants (chrom text, pos integer, ref text, "
+        + "alt text, uid integer, primary key (chrom, pos, ref, alt)) without rowid"
+    )
     outc.execute(
-        "select base__chrom, base__pos, base__ref_base, base__alt_base from variant"
+        "insert or ignore into temp.merge_variants select base__chrom, base__pos, "
+        + "base__ref_base, base__alt_base, base__uid from main.variant"
     )
-    variants = {variant_id(r[0], r[1], r[2], r[3]) for r in outc.fetchall()}
+    outc.execute(
+        "create temp table merge_uids (old_uid integer primary key, "
+        + "new_uid integer, is_new integer)"
+    )
+    outc.execute(
+        "create temp table merge_filenos (old_fileno integer primary key, "
+        + "new_fileno integer)"
+    )
+    outconn.commit()
+    total_start_time = time()
+    total_num_rows = 0
     for dbpath in dbpaths[1:]:
         print(f"Merging {dbpath}...")
-        conn = sqlite3.connect(dbpath)
-        c = conn.cursor()
+        start_time = time()
+        outc.execute("attach database ? as src", (dbpath,))
+        outc.execute("delete from temp.merge_uids")
+        outc.execute("delete from temp.merge_filenos")
         # Gene
-        c.execute("select * from gene order by rowid")
-        for r in c.fetchall():
-            hugo = r[g_hugo_colno]
-            if hugo in genes:
-                continue
-            q = f'insert into gene values ({",".join(["?" for _ in range(len(r))])})'
-            outc.execute(q, r)
-            genes.add(hugo)
+        cols = ", ".join(table_cols["gene"])
+        outc.execute(
+            f"insert into main.gene ({cols}) select {cols} from src.gene "
+            + "where base__hugo not in (select hugo from temp.merge_genes) "
+            + "order by rowid"
+        )
+        num_genes = outc.rowcount
+        outc.execute("insert or ignore into temp.merge_genes select base__hugo from src.gene")
+        # Variant UIDs. Existing variants keep their UIDs, and new variants
+        # get new UIDs in the order of the source database.
+        outc.execute("select max(base__uid) from main.variant")
+        max_uid = outc.fetchone()[0] or 0
+        outc.execute(
+            "insert or ignore into temp.merge_uids select s.base__uid, m.uid, 0 "
+            + "from src.variant as s join temp.merge_variants as m "
+            + "on m.chrom = s.base__chrom and m.pos = s.base__pos "
+            + "and m.ref = s.base__ref_base and m.alt = s.base__alt_base"
+        )
+        outc.execute(
+            "insert or ignore into temp.merge_uids select base__uid, "
+            + "? + row_number() over (order by rowid), 1 from src.variant "
+            + "where base__uid not in (select old_uid from temp.merge_uids)",
+            (max_uid,),
+        )
         # Variant
-        uid_dic = {}
-        c.execute("select * from variant order by rowid")
-        for r in c.fetchall():
-            vid = variant_id(
-                r[v_chrom_colno], r[v_pos_colno], r[v_ref_colno], r[v_alt_colno]
-            )
-            if vid in variants:
-                continue
-            old_uid = r[0]
-            r = list(r)
-            r[0] = new_uid
-            uid_dic[old_uid] = new_uid
-            new_uid += 1
-            q = f'insert into variant values ({",".join(["?" for _ in range(len(r))])})'
-            outc.execute(q, r)
-            variants.add(vid)
+        cols = ", ".join(table_cols["variant"])
+        src_cols = ", ".join(
+            ["u.new_uid" if col == "base__uid" else f"s.{col}" for col in table_cols["variant"]]
+        )
+        outc.execute(
+            f"insert into main.variant ({cols}) select {src_cols} from src.variant as s "
+            + "join temp.merge_uids as u on u.old_uid = s.base__uid "
+            + "where u.is_new = 1 order by u.new_uid"
+        )
+        num_variants = outc.rowcount
+        outc.execute(
+            "insert or ignore into temp.merge_variants select s.base__chrom, "
+            + "s.base__pos, s.base__ref_base, s.base__alt_base, u.new_uid "
+            + "from src.variant as s join temp.merge_uids as u "
+            + "on u.old_uid = s.base__uid where u.is_new = 1"
+        )
         # Sample
-        c.execute("select * from sample order by rowid")
-        for r in c.fetchall():
-            uid = r[s_uid_colno]
-            if uid in uid_dic:
-                new_uid = uid_dic[uid]
-                r = list(r)
-                r[s_uid_colno] = new_uid
-                q = f'insert into sample values ({",".join(["?" for _ in range(len(r))])})'
-                outc.execute(q, r)
+        cols = ", ".join(table_cols["sample"])
+        src_cols = ", ".join(
+            ["u.new_uid" if col == "base__uid" else f"s.{col}" for col in table_cols["sample"]]
+        )
+        outc.execute(
+            f"insert into main.sample ({cols}) select {src_cols} from src.sample as s "
+            + "join temp.merge_uids as u on u.old_uid = s.base__uid "
+            + "where u.is_new = 1 or not exists (select 1 from main.sample as t "
+            + "where t.base__uid = u.new_uid and t.base__sample_id = s.base__sample_id) "
+            + "order by s.rowid"
+        )
+        num_samples = outc.rowcount
         # File numbers
-        c.execute('select colkey, colval from info where colkey="_input_paths"')
-        ips = loads(c.fetchone()[1].replace("'", '"'))
-        fileno_dic = {}
-        for fileno, filepath in ips.items():
+        for fileno, filepath in get_merge_input_paths(outc, "src").items():
             if filepath not in rev_input_paths:
                 input_paths[str(new_fileno)] = filepath
                 rev_input_paths[filepath] = str(new_fileno)
-                fileno_dic[int(fileno)] = new_fileno
                 new_fileno += 1
+            outc.execute(
+                "insert into temp.merge_filenos values (?, ?)",
+                (int(fileno), int(rev_input_paths[filepath])),
+            )
         # Mapping
-        c.execute("select * from mapping order by rowid")
-        for r in c.fetchall():
-            uid = r[m_uid_colno]
-            if uid in uid_dic:
-                new_uid = uid_dic[uid]
-                r = list(r)
-                r[m_uid_colno] = new_uid
-                r[m_fileno_colno] = fileno_dic[r[m_fileno_colno]]
-                q = f'insert into mapping values ({",".join(["?" for _ in range(len(r))])})'
-                outc.execute(q, r)
-    q = 'update info set colval=? where colkey="_input_paths"'
-    outc.execute(q, [dumps(input_paths)])
-    q = 'update info set colval=? where colkey="Input file name"'
-    v = ";".join(
-        [input_paths[str(v)] for v in sorted(input_paths.keys(), key=lambda v: int(v))]
-    )
-    outc.execute(q, [v])
+        cols = ", ".join(table_cols["mapping"])
+        src_cols = []
+        for col in table_cols["mapping"]:
+            if col == "base__uid":
+                src_cols.append("u.new_uid")
+            elif col == "base__fileno":
+                src_cols.append("f.new_fileno")
+            else:
+                src_cols.append(f"s.{col}")
+        outc.execute(
+            f"insert into main.mapping ({cols}) select {', '.join(src_cols)} "
+            + "from src.mapping as s "
+            + "join temp.merge_uids as u on u.old_uid = s.base__uid "
+            + "join temp.merge_filenos as f on f.old_fileno = s.base__fileno "
+            + "where u.is_new = 1 or not exists (select 1 from main.mapping as t "
+            + "where t.base__uid = u.new_uid and t.base__fileno = f.new_fileno "
+            + "and t.base__original_line is s.base__original_line) "
+            + "order by s.rowid"
+        )
+        num_mappings = outc.rowcount
+        outconn.commit()
+        outc.execute("detach database src")
+        num_rows = num_genes + num_variants + num_samples + num_mappings
+        total_num_rows += num_rows
+        runtime = time() - start_time
+        print(
+            f"  {num_variants} new variants, {num_samples} sample rows, "
+            + f"{num_mappings} mapping rows, {num_genes} genes in {runtime:.1f}s "
+            + f"({num_rows / max(runtime, 1e-6):.0f} rows/s)"
+        )
+    # Info
+    outc.execute("select count(*) from main.variant")
+    num_variants = outc.fetchone()[0]
+    inputs = [input_paths[v] for v in sorted(input_paths.keys(), key=lambda v: int(v))]
+    for colkey, colval in [
+        ("input_paths", dumps(input_paths)),
+        ("_input_paths", dumps(input_paths)),
+        ("inputs", dumps(inputs)),
+        ("Input file name", ";".join(inputs)),
+        ("num_variants", str(num_variants)),
+    ]:
+        outc.execute("update info set colval=? where colkey=?", (colval, colkey))
     outconn.commit()
+    outc.close()
+    outconn.close()
+    runtime = time() - total_start_time
+    print(
+        f"Merged {len(dbpaths)} files into {outpath}: {num_variants} variants, "
+        + f"{total_num_rows} rows added in {runtime:.1f}s "
+        + f"({total_num_rows / max(runtime, 1e-6):.0f} rows/s)"
+    )
     return True
 
 
+def get_merge_input_paths(cursor, schema: str) -> dict:
+    from json import loads
+
+    for colkey in ["input_paths", "_input_paths"]:
+        cursor.execute(
+            f"select colval from {schema}.info where colkey=?", (colkey,)
+        )
+        ret = cursor.fetchone()
+        if ret:
+            return loads(ret[0].replace("'", '"'))
+    return {}
+
+
 def filtersqlite(
     dbpaths: List[str] = [],
     suffix: str = "filtered",
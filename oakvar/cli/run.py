@@ -358,4 +358,22 @@ def add_parser_ov_run(subparsers):
         default=False,
         help="Keep reference variants",
     )
+    parser_ov_run.add_argument(
+        "--incremental",
+        action="store_true",
+        default=False,
+        help="Reuse outputs of an earlier run of the same job which are still valid. Only stages whose inputs, modules, or options changed run again, and new annotations are merged into the existing result database. Use with --keep-temp to reuse intermediate files as well.",
+    )
+    parser_ov_run.add_argument(
+        "--write-parquet",
+        action="store_true",
+        default=False,
+        help="Write the variant, gene, and sample tables of the result database to Parquet files (run_name.variant.parquet, etc.) at the end of the run, for faster loading with get_df_from_db.",
+    )
+    parser_ov_run.add_argument(
+        "--bgzip",
+        action="store_true",
+        default=False,
+        help="With --vcf2vcf, write bgzip-compressed output (.vcf.gz) with a tabix index (.vcf.gz.tbi).",
+    )
     parser_ov_run.set_defaults(func=cli_run)
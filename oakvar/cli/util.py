@@ -93,16 +93,18 @@ def movejob(args, __name__="util move-job"):
     console.print(out)
 
 
-# @cli_entry
-# def cli_util_mergesqlite(args):
-# mergesqlite(args)
-#
-#
-# @cli_func
-# def mergesqlite(args, __name__="util mergesqlite"):
-# from ..api.util import mergesqlite
-#
-# return mergesqlite(**args)
+@cli_entry
+def cli_util_mergesqlite(args):
+    return mergesqlite(args)
+
+
+@cli_func
+def mergesqlite(args, __name__="util mergesqlite"):
+    from ..api.util import mergesqlite
+
+    dbpaths = args.get("dbpaths")
+    outpath = args.get("outpath")
+    return mergesqlite(dbpaths=dbpaths, outpath=outpath)
 
 
 @cli_entry
@@ -152,22 +154,22 @@ def get_parser_fn_util():
     ]
 
     # Merge SQLite files
-    # parser_fn_util_mergesqlite = _subparsers.add_parser(
-    #    "mergesqlite", help="Merge SQLite result files"
-    # )
-    # parser_fn_util_mergesqlite.add_argument(
-    #    "path", nargs="+", help="Path to result database"
-    # )
-    # parser_fn_util_mergesqlite.add_argument(
-    #    "-o", dest="outpath", required=True, help="Output SQLite file path"
-    # )
-    # parser_fn_util_mergesqlite.set_defaults(func=cli_util_mergesqlite)
-    # parser_fn_util_mergesqlite.r_return = "A boolean. TRUE if successful, FALSE if not"  # type: ignore
-    # parser_fn_util_mergesqlite.r_examples = [  # type: ignore
-    #    "# Merge two OakVar analysis result files into one SQLite file",
-    #    '#roakvar::util.mergesqlite(path=list("example1.sqlite",
-    #          "example2.sqlite"), outpath="merged.sqlite")',
-    # ]
+    parser_fn_util_mergesqlite = _subparsers.add_parser(
+        "mergesqlite", help="Merge SQLite result files"
+    )
+    parser_fn_util_mergesqlite.add_argument(
+        "dbpaths", nargs="+", help="Path to result database"
+    )
+    parser_fn_util_mergesqlite.add_argument(
+        "-o", dest="outpath", required=True, help="Output SQLite file path"
+    )
+    parser_fn_util_mergesqlite.set_defaults(func=cli_util_mergesqlite)
+    parser_fn_util_mergesqlite.r_return = "A boolean. TRUE if successful, FALSE if not"  # type: ignore
+    parser_fn_util_mergesqlite.r_examples = [  # type: ignore
+        "# Merge two OakVar analysis result files into one SQLite file",
+        '#roakvar::util.mergesqlite(dbpaths=list("example1.sqlite", '
+        + '"example2.sqlite"), outpath="merged.sqlite")',
+    ]
 
     # Show SQLite info
     parser_fn_util_showsqliteinfo = _subparsers.add_parser(
@@ -103,6 +103,9 @@ class ServerAdminDb:
 
         self.job_dir = job_dir
         self.job_name = job_name
+        # If set, job info updates are sent to a JobStatusWriter through
+        # this queue instead of being written directly.
+        self.status_queue = None
         admindb_path = get_admindb_path()
         if (not admindb_path or not admindb_path.exists()) and not new_setup:
             raise SystemMissingException("server admin database is missing.")
@@ -504,23 +507,30 @@ class ServerAdminDb:
     def update_job_info(self, info_dict, job_dir=None, job_name=None):
         from sys import stderr
 
+        if not job_dir or not job_name:
+            job_dir = self.job_dir
+            job_name = self.job_name
+        if not job_dir or not job_name:
+            stderr.write("no job_dir nor job_name for server admin DB")
+            return
+        if self.status_queue is not None:
+            try:
+                self.status_queue.put((job_dir, job_name, info_dict))
+                return
+            except Exception:
+                pass  # writer is gone. Write directly.
+        self.write_job_info(info_dict, job_dir, job_name)
+
+    def write_job_info(self, info_dict, job_dir, job_name):
         conn = self.get_sync_db_conn()
         if not conn:
             return
         cursor = conn.cursor()
         columns = list(info_dict.keys())
         values = [info_dict.get(column) for column in columns]
-        set_cmds = []
-        for k in info_dict.keys():
-            set_cmds.append(f"set {k}=?")
-        q = f"update jobs {','.join(set_cmds)} where dir=? and name=?"
-        if job_dir and job_name:
-            values.extend([job_dir, job_name])
-        elif self.job_dir and self.job_name:
-            values.extend([self.job_dir, self.job_name])
-        else:
-            stderr.write("no job_dir nor job_name for server admin DB")
-            return
+        set_cmds = [f"{column}=?" for column in columns]
+        q = f"update jobs set {', '.join(set_cmds)} where dir=? and name=?"
+        values.extend([job_dir, job_name])
         try:
             cursor.execute(q, values)
             conn.commit()
@@ -755,6 +765,68 @@ class ServerAdminDb:
         return ret
 
 
+class JobStatusWriter:
+    """Single writer of job info updates to the server admin DB.
+
+    Updates from the processes of a job arrive through a queue. Updates
+    for the same job are merged, and the latest values are written at most
+    once every `interval` seconds. Remaining updates are written at stop.
+    """
+
+    def __init__(self, serveradmindb: ServerAdminDb, queue, interval: float):
+        self.serveradmindb = serveradmindb
+        self.queue = queue
+        self.interval = interval
+        self.pending = {}
+        self.last_write_time = 0
+        self.thread = None
+
+    def start(self):
+        from threading import Thread
+
+        self.thread = Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def run(self):
+        from queue import Empty
+        from time import time
+
+        while True:
+            try:
+                item = self.queue.get(True, self.interval)
+            except Empty:
+                item = False
+            except Exception:
+                break
+            if item is None:
+                break
+            if item:
+                job_dir, job_name, info_dict = item
+                self.pending.setdefault((job_dir, job_name), {}).update(info_dict)
+            if self.pending and time() - self.last_write_time >= self.interval:
+                self.flush()
+        self.flush()
+
+    def flush(self):
+        from time import time
+
+        pending = self.pending
+        self.pending = {}
+        for (job_dir, job_name), info_dict in pending.items():
+            self.serveradmindb.write_job_info(info_dict, job_dir, job_name)
+        self.last_write_time = time()
+
+    def stop(self):
+        if not self.thread:
+            return
+        try:
+            self.queue.put(None)
+        except Exception:
+            pass
+        self.thread.join()
+        self.thread = None
+
+
 def setup_serveradmindb(clean: bool = False) -> ServerAdminDb:
     from os import remove
     from pathlib import Path
@@ -54,12 +54,16 @@ from ... import ReportFilter
 from aiohttp import web
 import time
 from typing import Type
+from collections import OrderedDict
 
 wu = None
 logger = None
 default_gui_result_pagesize = 100
 gui_result_pagesize_key = "gui_result_pagesize"
 servermode = False
+result_reporter_cache_size = 8
+result_reporter_cache = OrderedDict()
+jsonreporter_class = None
 
 
 async def get_nowg_annot_modules(_):
@@ -369,10 +373,86 @@ async def get_count(request):
     return web.json_response(content)
 
 
-async def get_result(request):
-    import importlib
-    import importlib.util
+def get_jsonreporter_class():
     from pathlib import Path
+    from ...lib.base.reporter import BaseReporter
+    from ...lib.util.util import load_class
+
+    global jsonreporter_class
+    if jsonreporter_class is None:
+        script_path = Path(__file__).parent / "jsonreporter.py"
+        Reporter: Type[BaseReporter] = load_class(script_path, "Reporter")  # type: ignore
+        jsonreporter_class = Reporter
+    return jsonreporter_class
+
+
+def get_db_mtime(dbpath: str) -> float:
+    mtime = os.path.getmtime(dbpath)
+    # Changes stay in the write-ahead log until a checkpoint. An empty log is
+    # made just by opening the database, so it does not count.
+    wal_path = dbpath + "-wal"
+    if os.path.exists(wal_path) and os.path.getsize(wal_path) > 0:
+        mtime = max(mtime, os.path.getmtime(wal_path))
+    return mtime
+
+
+async def get_result_reporter(
+    request,
+    dbpath: str,
+    confpath=None,
+    filterstring=None,
+    separatesample=False,
+    no_summary=None,
+) -> dict:
+    """Returns a cached jsonreporter for a job and its result viewer options.
+
+    A jsonreporter keeps its column information between runs, so reusing it
+    skips rebuilding the column definitions and categories on every page.
+    Entries are dropped when the job database changes and in least recently
+    used order beyond result_reporter_cache_size. Runs of a reporter should
+    hold the lock of its entry.
+    """
+    from asyncio import Lock
+
+    mtime = get_db_mtime(dbpath)
+    key = (dbpath, mtime, filterstring, confpath, separatesample, no_summary)
+    entry = result_reporter_cache.get(key)
+    if entry is not None:
+        result_reporter_cache.move_to_end(key)
+        return entry
+    for old_key in list(result_reporter_cache.keys()):
+        if old_key[0] == dbpath and old_key[1] != mtime:
+            del result_reporter_cache[old_key]
+    Reporter = get_jsonreporter_class()
+    reporter = Reporter(
+        dbpath=dbpath,
+        module_name="jsonreporter",
+        nogenelevelonvariantlevel=True,
+        confpath=confpath,
+        filterstring=filterstring,
+        separatesample=separatesample,
+        report_types=["text"],
+        no_summary=no_summary,
+        make_col_categories=True,
+    )
+    entry = {
+        "reporter": reporter,
+        "lock": Lock(),
+        "modules_info": await get_modules_info(request),
+    }
+    result_reporter_cache[key] = entry
+    while len(result_reporter_cache) > result_reporter_cache_size:
+        result_reporter_cache.popitem(last=False)
+    return entry
+
+
+def remove_result_reporter(reporter):
+    for key, entry in list(result_reporter_cache.items()):
+        if entry["reporter"] is reporter:
+            del result_reporter_cache[key]
+
+
+async def get_result(request):
     from ...lib.exceptions import DatabaseConnectionError
 
     global logger
@@ -400,14 +480,6 @@ async def get_result(request):
         confpath = queries["confpath"]
     else:
         confpath = None
-    reporter_name = "jsonreporter"
-    this_file_dir = Path(__file__).parent
-    reporter_path = this_file_dir / f"{reporter_name}.py"
-    spec = importlib.util.spec_from_file_location(reporter_name, reporter_path)
-    if spec is None:
-        raise Exception(f"Could not load {reporter_name}.")
-    m = importlib.util.module_from_spec(spec)
-    spec.loader.exec_module(m)  # type: ignore
     if "separatesample" in queries:
         separatesample = queries["separatesample"]
         if separatesample == "true":
@@ -418,41 +490,44 @@ async def get_result(request):
         separatesample = False
     no_summary = queries.get("no_summary")
     add_summary = not no_summary
-    reporter = m.Reporter(
-        dbpath=dbpath,
-        module_name=reporter_name,
-        nogenelevelonvariantlevel=True,
+    entry = await get_result_reporter(
+        request,
+        dbpath,
         confpath=confpath,
         filterstring=filterstring,
         separatesample=separatesample,
-        report_types=["text"],
         no_summary=no_summary,
-        make_col_categories=True,
     )
-    data = await reporter.run(
-        tab=tab,
-        pagesize=pagesize,
-        page=page,
-        add_summary=add_summary,
-        make_filtered_table=make_filtered_table,
-        make_col_categories=True,
-    )
-    data["modules_info"] = await get_modules_info(request)
-    content = {}
-    content["stat"] = {
-        "rowsreturned": True,
-        "wherestr": "",
-        "filtered": True,
-        "filteredresultmessage": "",
-        "norows": data["info"]["norows"],
-    }
-    content["columns"] = get_colmodel(tab, data["colinfo"])
-    content["data"] = get_datamodel(data[tab])
-    content["status"] = "normal"
-    content["modules_info"] = data["modules_info"]
-    content["warning_msgs"] = data["warning_msgs"]
-    content["total_norows"] = data["total_norows"]
-    content["ftable_uid"] = reporter.ftable_uid
+    reporter = entry["reporter"]
+    async with entry["lock"]:
+        try:
+            data = await reporter.run(
+                tab=tab,
+                pagesize=pagesize,
+                page=page,
+                add_summary=add_summary,
+                make_filtered_table=make_filtered_table,
+                make_col_categories=True,
+            )
+        except Exception:
+            remove_result_reporter(reporter)
+            raise
+        data["modules_info"] = entry["modules_info"]
+        content = {}
+        content["stat"] = {
+            "rowsreturned": True,
+            "wherestr": "",
+            "filtered": True,
+            "filteredresultmessage": "",
+            "norows": data["info"]["norows"],
+        }
+        content["columns"] = get_colmodel(tab, data["colinfo"])
+        content["data"] = get_datamodel(data[tab])
+        content["status"] = "normal"
+        content["modules_info"] = data["modules_info"]
+        content["warning_msgs"] = data["warning_msgs"]
+        content["total_norows"] = data["total_norows"]
+        content["ftable_uid"] = reporter.ftable_uid
     t = round(time.time() - start_time, 3)
     if logger is not None:
         logger.info("Done getting result of [{}][{}] in {}s".format(dbname, tab, t))
@@ -724,17 +799,10 @@ def get_colmodel(tab, colinfo):
 
 
 async def get_colinfo(dbpath, confpath=None, filterstring=None, add_summary=True):
-    from pathlib import Path
-    from ...lib.base.reporter import BaseReporter
-    from ...lib.util.util import load_class
-
-    reporter_name = "jsonreporter"
-    this_file_dir = Path(__file__).parent
-    script_path = this_file_dir / f"{reporter_name}.py"
-    Reporter: Type[BaseReporter] = load_class(script_path, "Reporter")  # type: ignore
+    Reporter = get_jsonreporter_class()
     reporter = Reporter(
         dbpath,
-        module_name=reporter_name,
+        module_name="jsonreporter",
         confpath=confpath,
         filterstring=filterstring,
         report_types=["text"],
@@ -819,6 +887,7 @@ async def serve_runwidget(request):
     filterstring = await cf.exec_db(
         cf.get_report_filter_string, uid=queries.get("ftable_uid")
     )
+    await cf.close_db()
     queries_dict = queries.copy()
     queries_dict["filterstring"] = filterstring
     content = await m.get_data(queries_dict)
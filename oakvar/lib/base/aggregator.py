@@ -47,11 +47,14 @@
 
 from typing import Optional
 from typing import List
+from typing import Dict
 
 
 class Aggregator(object):
     cr_type_to_sql = {"string": "text", "int": "integer", "float": "real"}
     commit_threshold = 10000
+    stage_schema = "stage"
+    max_join_tables = 60
 
     def __init__(
         self,
@@ -62,13 +65,18 @@ class Aggregator(object):
         delete: bool = False,
         append: bool = False,
         serveradmindb=None,
+        annotator_names: Optional[List[str]] = None,
     ):
+        from ..util.inout import ColumnStats
+
         self.input_dir = input_dir
         self.level = level
         self.run_name = run_name
         self.output_dir = output_dir
         self.delete = delete
         self.append = append
+        # Outputs of only these annotators are read if given.
+        self.annotator_names = annotator_names
         self.serveradmindb = serveradmindb
         self.annotators = []
         self.ipaths = {}
@@ -90,6 +98,9 @@ class Aggregator(object):
         self.header_table_name = None
         self.reportsub_table_name = None
         self.base_prefix = "base"
+        self.stage_db_path: Optional[str] = None
+        self.index_queries: List[str] = []
+        self.column_stats = ColumnStats()
         self.setup_directories()
         self._setup_logger()
 
@@ -135,63 +146,25 @@ class Aggregator(object):
         if self.logger is not None:
             self.logger.info("started: %s" % asctime(localtime(start_time)))
         self.dbconn.commit()
-        n = 0
+        staged_cnames = {}
+        if self.annotators:
+            self.open_stage_db()
         if not self.append:
-            col_names = self.base_reader.get_column_names()
-            columns = ",".join(col_names)
-            placeholders = ",".join(["?"] * len(col_names))
-            q = f"insert into {self.table_name} ({columns}) values ({placeholders});"
-            batch_size = 1_000_000
-            value_batch = []
-            for lnum, line, rd in self.base_reader.loop_data():
-                try:
-                    n += 1
-                    vals = [rd.get(c) for c in col_names]
-                    value_batch.append(vals)
-                    if len(value_batch) == batch_size:
-                        self.cursor.executemany(q, value_batch)
-                        self.dbconn.commit()
-                        value_batch = []
-                    if lnum % 100000 == 0:
-                        status = f"Running Aggregator ({self.level}:base): line {lnum}"
-                        update_status(
-                            status, logger=self.logger, serveradmindb=self.serveradmindb
-                        )
-                except Exception as e:
-                    self._log_runtime_error(lnum, line, e, fn=self.base_reader.path)
-            if value_batch:
-                self.cursor.executemany(q, value_batch)
-                self.dbconn.commit()
+            if self.annotators:
+                self.insert_base_data(f"{self.stage_schema}.{self.base_prefix}")
+            else:
+                self.insert_base_data(self.table_name)
         for annot_name in self.annotators:
-            reader = self.readers[annot_name]
-            n = 0
-            ordered_cnames = [
-                cname for cname in reader.get_column_names() if cname != self.key_name
-            ]
-            if len(ordered_cnames) == 0:
+            cnames = self.stage_annotator_data(annot_name)
+            if not cnames:
                 continue
-            update_template = "update {} set {} where {}=?".format(
-                self.table_name,
-                ", ".join([f"{cname}=?" for cname in ordered_cnames]),
-                self.base_prefix + "__" + self.key_name,
-            )
-            for lnum, line, rd in reader.loop_data():
-                try:
-                    n += 1
-                    key_val = rd[self.key_name]
-                    ins_vals = [rd.get(cname) for cname in ordered_cnames]
-                    ins_vals.append(key_val)
-                    self.cursor.execute(update_template, ins_vals)
-                    if n % self.commit_threshold == 0:
-                        self.dbconn.commit()
-                    if lnum % 100000 == 0:
-                        status = f"Running Aggregator ({self.level}:{annot_name}): line {lnum}"
-                        update_status(
-                            status, logger=self.logger, serveradmindb=self.serveradmindb
-                        )
-                except Exception as e:
-                    self._log_runtime_error(lnum, line, e, fn=reader.path)
-            self.dbconn.commit()
+            staged_cnames[annot_name] = cnames
+            if self.append:
+                self.update_with_staged_data(annot_name, cnames)
+        if not self.append and self.annotators:
+            self.merge_staged_data(staged_cnames)
+        self.close_stage_db()
+        self.create_indices()
         self.fill_categories()
         # self.cursor.execute("pragma synchronous=2;")
         # self.cursor.execute("pragma journal_mode=delete;")
@@ -204,6 +177,250 @@ class Aggregator(object):
         status = f"finished aggregator ({self.level})"
         update_status(status, logger=self.logger, serveradmindb=self.serveradmindb)
 
+    def insert_base_data(self, table_name: str):
+        from ..util.run import update_status
+
+        if self.cursor is None or self.dbconn is None or self.base_reader is None:
+            return
+        col_names = self.base_reader.get_column_names()
+        columns = ",".join(col_names)
+        placeholders = ",".join(["?"] * len(col_names))
+        q = f"insert into {table_name} ({columns}) values ({placeholders});"
+        self.column_stats.add_columns(self.base_reader.get_all_col_defs().values())
+        batch_size = 1_000_000
+        value_batch = []
+        for lnum, line, rd in self.base_reader.loop_data():
+            try:
+                vals = [rd.get(c) for c in col_names]
+                value_batch.append(vals)
+                if len(value_batch) == batch_size:
+                    self.cursor.executemany(q, value_batch)
+                    self.dbconn.commit()
+                    self.column_stats.add_rows(col_names, value_batch)
+                    value_batch = []
+                if lnum % 100000 == 0:
+                    status = f"Running Aggregator ({self.level}:base): line {lnum}"
+                    update_status(
+                        status, logger=self.logger, serveradmindb=self.serveradmindb
+                    )
+            except Exception as e:
+                self._log_runtime_error(lnum, line, e, fn=self.base_reader.path)
+        if value_batch:
+            self.cursor.executemany(q, value_batch)
+            self.dbconn.commit()
+            self.column_stats.add_rows(col_names, value_batch)
+
+    def open_stage_db(self):
+        from os.path import join
+        from os.path import exists
+        from os import remove
+
+        if self.cursor is None or self.output_dir is None:
+            return
+        self.stage_db_path = join(
+            self.output_dir, f"{self.output_base_fname}.aggregator_stage.sqlite"
+        )
+        if exists(self.stage_db_path):
+            remove(self.stage_db_path)
+        self.cursor.execute(
+            f"attach database ? as {self.stage_schema}", (self.stage_db_path,)
+        )
+        self.cursor.execute(f"pragma {self.stage_schema}.synchronous=0;")
+        self.cursor.execute(f"pragma {self.stage_schema}.journal_mode=off;")
+        if not self.append and self.base_reader is not None:
+            col_def_strings = [
+                f"{col_def.name} {self.cr_type_to_sql[col_def.type]}"
+                for col_def in self.base_reader.get_all_col_defs().values()
+            ]
+            self.cursor.execute(
+                f"create table {self.stage_schema}.{self.base_prefix} "
+                + f"({', '.join(col_def_strings)})"
+            )
+
+    def close_stage_db(self):
+        from os.path import exists
+        from os import remove
+
+        if self.cursor is None or self.dbconn is None or not self.stage_db_path:
+            return
+        self.dbconn.commit()
+        self.cursor.execute(f"detach database {self.stage_schema}")
+        if exists(self.stage_db_path):
+            remove(self.stage_db_path)
+        self.stage_db_path = None
+
+    def stage_annotator_data(self, annot_name: str) -> List[str]:
+        """Loads the output of an annotator into a table in the stage database,
+        keyed by uid (variant level) or hugo (gene level). Returns the names of
+        the staged columns in the final table."""
+        from time import time
+        from ..util.run import update_status
+
+        if self.cursor is None or self.dbconn is None or not self.key_name:
+            return []
+        reader = self.readers[annot_name]
+        ordered_cnames = [
+            cname for cname in reader.get_column_names() if cname != self.key_name
+        ]
+        if len(ordered_cnames) == 0:
+            return []
+        start_time = time()
+        col_types = {
+            col_def.name: col_def.type for col_def in reader.get_all_col_defs().values()
+        }
+        self.column_stats.add_columns(
+            [
+                col_def
+                for col_def in reader.get_all_col_defs().values()
+                if col_def.name in ordered_cnames
+            ]
+        )
+        key_type = "integer" if self.level == "variant" else "text"
+        col_def_strings = [f"_key {key_type} primary key"]
+        for cname in ordered_cnames:
+            col_def_strings.append(f"{cname} {self.cr_type_to_sql[col_types[cname]]}")
+        self.cursor.execute(
+            f"create table {self.stage_schema}.{annot_name} "
+            + f"({', '.join(col_def_strings)})"
+        )
+        q = (
+            f"insert or replace into {self.stage_schema}.{annot_name} values "
+            + f"({', '.join(['?'] * (len(ordered_cnames) + 1))})"
+        )
+        n = 0
+        value_batch = []
+        for lnum, line, rd in reader.loop_data():
+            try:
+                key_val = rd[self.key_name]
+                if key_val is None:
+                    continue
+                vals = [key_val]
+                vals.extend([rd.get(cname) for cname in ordered_cnames])
+                value_batch.append(vals)
+                n += 1
+                if len(value_batch) == self.commit_threshold:
+                    self.cursor.executemany(q, value_batch)
+                    value_batch = []
+                if lnum % 100000 == 0:
+                    status = f"Running Aggregator ({self.level}:{annot_name}): line {lnum}"
+                    update_status(
+                        status, logger=self.logger, serveradmindb=self.serveradmindb
+                    )
+            except Exception as e:
+                self._log_runtime_error(lnum, line, e, fn=reader.path)
+        if value_batch:
+            self.cursor.executemany(q, value_batch)
+        self.dbconn.commit()
+        if not self.append:
+            self.add_staged_column_stats(annot_name, ordered_cnames)
+        if self.logger is not None:
+            self.logger.info(
+                f"{annot_name}: staged {n} rows in {round(time() - start_time, 3)}s"
+            )
+        return ordered_cnames
+
+    def add_staged_column_stats(self, annot_name: str, cnames: List[str]):
+        """Collects the statistics of the columns of a staged annotator table.
+        Only the rows which merge_staged_data will join onto base rows are
+        read, so duplicate keys count once and keys absent from the base
+        table, such as genes without a variant, do not count."""
+        if self.cursor is None:
+            return
+        table = f"{self.stage_schema}.{annot_name}"
+        key_col = f"{self.base_prefix}__{self.key_name}"
+        base_table = f"{self.stage_schema}.{self.base_prefix}"
+        q = (
+            f"select {', '.join(cnames)} from {table} where _key in "
+            + f"(select {key_col} from {base_table})"
+        )
+        self.cursor.execute(q)
+        while True:
+            rows = self.cursor.fetchmany(self.commit_threshold)
+            if not rows:
+                break
+            self.column_stats.add_rows(cnames, rows)
+
+    def merge_staged_data(self, staged_cnames: Dict[str, List[str]]):
+        """Builds the final table by joining the staged base table with the
+        staged annotator tables on the key column, in groups which fit in the
+        join limit of SQLite."""
+        from time import time
+
+        if self.cursor is None or self.dbconn is None or self.base_reader is None:
+            return
+        start_time = time()
+        key_col = f"{self.base_prefix}__{self.key_name}"
+        src_table = f"{self.stage_schema}.{self.base_prefix}"
+        src_cnames = self.base_reader.get_column_names()
+        annot_names = list(staged_cnames.keys())
+        group_size = self.max_join_tables - 1
+        groups = [
+            annot_names[i : i + group_size]
+            for i in range(0, len(annot_names), group_size)
+        ] or [[]]
+        for group_no, group in enumerate(groups):
+            select_cols = [f"s.{cname}" for cname in src_cnames]
+            joins = []
+            dst_cnames = list(src_cnames)
+            for annot_name in group:
+                table = f"{self.stage_schema}.{annot_name}"
+                joins.append(f"left join {table} on {table}._key=s.{key_col}")
+                select_cols.extend([f"{table}.{cname}" for cname in staged_cnames[annot_name]])
+                dst_cnames.extend(staged_cnames[annot_name])
+            if group_no == len(groups) - 1:
+                dst_table = self.table_name
+            else:
+                dst_table = f"{self.stage_schema}._merge_{group_no}"
+                self.cursor.execute(
+                    f"create table {dst_table} ({', '.join(dst_cnames)})"
+                )
+            q = (
+                f"insert into {dst_table} ({', '.join(dst_cnames)}) "
+                + f"select {', '.join(select_cols)} from {src_table} as s "
+                + f"{' '.join(joins)} order by s.rowid"
+            )
+            self.cursor.execute(q)
+            self.dbconn.commit()
+            src_table = dst_table
+            src_cnames = dst_cnames
+        if self.logger is not None:
+            self.logger.info(
+                f"merged {len(annot_names)} annotators in {round(time() - start_time, 3)}s"
+            )
+
+    def update_with_staged_data(self, annot_name: str, cnames: List[str]):
+        from sqlite3 import sqlite_version_info
+
+        if self.cursor is None or self.dbconn is None:
+            return
+        table = f"{self.stage_schema}.{annot_name}"
+        key_col = f"{self.base_prefix}__{self.key_name}"
+        if sqlite_version_info >= (3, 33, 0):
+            q = (
+                f"update {self.table_name} set "
+                + ", ".join([f"{cname}={table}.{cname}" for cname in cnames])
+                + f" from {table} where {self.table_name}.{key_col}={table}._key"
+            )
+            self.cursor.execute(q)
+        else:
+            q = (
+                f"update {self.table_name} set "
+                + ", ".join([f"{cname}=?" for cname in cnames])
+                + f" where {key_col}=?"
+            )
+            self.cursor.execute(f"select {', '.join(cnames)}, _key from {table}")
+            rows = self.cursor.fetchall()
+            self.cursor.executemany(q, rows)
+        self.dbconn.commit()
+
+    def create_indices(self):
+        if self.cursor is None or self.dbconn is None:
+            return
+        for q in self.index_queries:
+            self.cursor.execute(q)
+        self.index_queries = []
+        self.dbconn.commit()
+
     def make_reportsub(self):
         if self.cursor is None:
             return
@@ -248,23 +465,36 @@ class Aggregator(object):
             coldefs.append(coldef)
         for coldef in coldefs:
             col_cats = coldef.categories
+            name: str = coldef.name or ""
+            # In append mode, the table keeps values which were not written
+            # in this run, so the statistics of this run do not cover it.
+            collected = not self.append and self.column_stats.has_column(name)
+            if collected:
+                stats = self.column_stats.get_stats(name)
+                if stats is not None:
+                    coldef.set_stats(stats)
             if coldef.category in ["single", "multi"]:
-                name: str = coldef.name or ""
                 if col_cats is not None and len(col_cats) == 0:
-                    q = f"select distinct {name} from {self.level}"
-                    self.cursor.execute(q)
-                    col_set = set([])
-                    for r in self.cursor:
-                        if r[0] is None:
-                            continue
-                        col_set.update(r[0].split(";"))
-                    col_cats = list(col_set)
+                    col_cats = None
+                    if collected:
+                        col_cats = self.column_stats.get_categories(name)
+                    if col_cats is None:
+                        q = f"select distinct {name} from {self.level}"
+                        self.cursor.execute(q)
+                        col_set = set([])
+                        for r in self.cursor:
+                            if r[0] is None:
+                                continue
+                            col_set.update(r[0].split(";"))
+                        col_cats = list(col_set)
                     col_cats = self.do_reportsub_col_cats(name, col_cats)
                 else:
                     col_cats = self.do_reportsub_col_cats(name, col_cats)
                 if col_cats is not None:
                     col_cats.sort()
-                coldef.categories = col_cats
+                coldef.set_categories(col_cats)
+                self.update_col_def(coldef)
+            elif collected:
                 self.update_col_def(coldef)
         self.dbconn.commit()
 
@@ -341,11 +571,15 @@ class Aggregator(object):
                 body = fname[len_prefix:]
                 if self.level == "variant" and fname.endswith(".var"):
                     annot_name = body[:-4]
+                    if not self.should_read_annotator(annot_name):
+                        continue
                     if "." not in annot_name:
                         self.annotators.append(annot_name)
                         self.ipaths[annot_name] = join(self.input_dir, fname)
                 elif self.level == "gene" and fname.endswith(".gen"):
                     annot_name = body[:-4]
+                    if not self.should_read_annotator(annot_name):
+                        continue
                     if "." not in annot_name:
                         self.annotators.append(annot_name)
                         self.ipaths[annot_name] = join(self.input_dir, fname)
@@ -354,6 +588,9 @@ class Aggregator(object):
         self.annotators.sort()
         self._setup_table()
 
+    def should_read_annotator(self, annot_name: str) -> bool:
+        return self.annotator_names is None or annot_name in self.annotator_names
+
     def _setup_table(self):
         if self.level is None:
             return
@@ -435,6 +672,7 @@ class Aggregator(object):
             # index tables
             index_n = 0
             # index_columns is a list of columns to include in this index
+            # Created after the data is loaded.
             for index_columns in self.base_reader.get_index_columns():
                 cols = ["base__{0}".format(x) for x in index_columns]
                 q = "create index {}_idx_{} on {} ({});".format(
@@ -443,7 +681,7 @@ class Aggregator(object):
                     self.table_name,
                     ", ".join(cols),
                 )
-                self.cursor.execute(q)
+                self.index_queries.append(q)
                 index_n += 1
         else:
             q = f"pragma table_info({self.table_name})"
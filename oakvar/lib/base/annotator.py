@@ -72,6 +72,7 @@ class BaseAnnotator(object):
         GENE_LEVEL_KEY: [x["name"] for x in get_crg_def()],
     }
     required_conf_keys = ["level", "output_columns"]
+    annotate_batch_size: int = 1000
 
     def __init__(
         self,
@@ -92,6 +93,9 @@ class BaseAnnotator(object):
         output_columns: List[Dict[str, Any]] = [],
         module_conf: Dict[str, Any] = {},
         code_version: Optional[str] = None,
+        seekpos: Optional[int] = None,
+        chunksize: Optional[int] = None,
+        postfix: str = "",
     ):
         """__init__.
 
@@ -112,6 +116,9 @@ class BaseAnnotator(object):
             output_columns (List[Dict]): output_columns
             module_conf (dict): module_conf
             code_version (Optional[str]): code_version
+            seekpos (Optional[int]): seekpos
+            chunksize (Optional[int]): chunksize
+            postfix (str): postfix
         """
         import os
         import sys
@@ -133,6 +140,9 @@ class BaseAnnotator(object):
         self.secondary_inputs = secondary_inputs
         self.run_name = run_name
         self.output_dir = output_dir
+        self.seekpos: Optional[int] = seekpos
+        self.chunksize: Optional[int] = chunksize
+        self.postfix: str = postfix
         self.plain_output = plainoutput
         self.logtofile = logtofile
         self.module_type = "annotator"
@@ -563,6 +573,9 @@ class BaseAnnotator(object):
     def process_file(self):
         """process_file."""
         assert self._id_col_name, "_id_col_name should not be None."
+        if type(self).annotate_batch is not BaseAnnotator.annotate_batch:
+            self.process_file_in_batches()
+            return
         for lnum, line, input_data, secondary_data in self._get_input():
             try:
                 self.log_progress(lnum)
@@ -578,19 +591,7 @@ class BaseAnnotator(object):
                     output_dict = self.annotate(
                         input_data, secondary_data=secondary_data
                     )
-                # This enables summarizing without writing for now.
-                if output_dict is None:
-                    continue
-                # Handles empty table-format column data.
-                output_dict = self.handle_jsondata(output_dict)
-                # Preserves the first column
-                if output_dict:
-                    output_dict[self._id_col_name] = input_data[self._id_col_name]
-                # Fill absent columns with empty strings
-                output_dict = self.fill_empty_output(output_dict)
-                # Writes output.
-                if self.output_writer:
-                    self.output_writer.write_data(output_dict)
+                self.write_output(input_data, output_dict)
             except Exception as e:
                 self._log_runtime_exception(
                     lnum,
@@ -602,10 +603,141 @@ class BaseAnnotator(object):
                     else "?",
                 )
 
+    def process_file_in_batches(self):
+        """Feeds the primary input to annotate_batch in batches of
+        annotate_batch_size variants."""
+        batch = []
+        for lnum, line, input_data, secondary_data in self._get_input():
+            self.log_progress(lnum)
+            # * allele and undefined non-canonical chroms are skipped.
+            if self.is_star_allele(input_data) or self.should_skip_chrom(input_data):
+                continue
+            batch.append((lnum, line, input_data, secondary_data))
+            if len(batch) >= self.annotate_batch_size:
+                self.process_batch(batch)
+                batch = []
+        if batch:
+            self.process_batch(batch)
+
+    def process_batch(self, batch: List[Tuple[int, Any, Dict[str, Any], Dict]]):
+        """process_batch.
+
+        Args:
+            batch (List[Tuple[int, Any, Dict[str, Any], Dict]]): (lnum, line, input_data, secondary_data) of each variant
+        """
+        fn = self.primary_input_reader.path if self.primary_input_reader else "?"
+        input_data_l = [v[2] for v in batch]
+        secondary_data_l = [v[3] for v in batch]
+        try:
+            output_dicts = self.annotate_batch(
+                input_data_l, secondary_data_l=secondary_data_l
+            )
+            if len(output_dicts) != len(batch):
+                raise ValueError(
+                    f"annotate_batch returned {len(output_dicts)} results "
+                    + f"for {len(batch)} variants."
+                )
+        except Exception as e:
+            if type(self).annotate is not BaseAnnotator.annotate:
+                # Finds the variants which fail with annotate.
+                self.process_batch_per_variant(batch)
+            else:
+                lnums = f"{batch[0][0]}-{batch[-1][0]}"
+                self._log_runtime_exception(lnums, None, None, e, fn=fn)
+            return
+        for (lnum, line, input_data, _), output_dict in zip(batch, output_dicts):
+            try:
+                self.write_output(input_data, output_dict)
+            except Exception as e:
+                self._log_runtime_exception(lnum, line, input_data, e, fn=fn)
+
+    def process_batch_per_variant(
+        self, batch: List[Tuple[int, Any, Dict[str, Any], Dict]]
+    ):
+        """Annotates the variants of a batch one by one with annotate, for a
+        batch whose annotate_batch failed.
+
+        Args:
+            batch (List[Tuple[int, Any, Dict[str, Any], Dict]]): (lnum, line, input_data, secondary_data) of each variant
+        """
+        fn = self.primary_input_reader.path if self.primary_input_reader else "?"
+        for lnum, line, input_data, secondary_data in batch:
+            try:
+                if secondary_data == {}:
+                    output_dict = self.annotate(input_data)
+                else:
+                    output_dict = self.annotate(
+                        input_data, secondary_data=secondary_data
+                    )
+                self.write_output(input_data, output_dict)
+            except Exception as e:
+                self._log_runtime_exception(lnum, line, input_data, e, fn=fn)
+
+    def write_output(self, input_data: Dict[str, Any], output_dict):
+        """write_output.
+
+        Args:
+            input_data (Dict[str, Any]): input_data
+            output_dict:
+        """
+        # This enables summarizing without writing for now.
+        if output_dict is None:
+            return
+        # Handles empty table-format column data.
+        output_dict = self.handle_jsondata(output_dict)
+        # Preserves the first column
+        if output_dict:
+            output_dict[self._id_col_name] = input_data[self._id_col_name]
+        # Fill absent columns with empty strings
+        output_dict = self.fill_empty_output(output_dict)
+        # Writes output.
+        if self.output_writer:
+            self.output_writer.write_data(output_dict)
+
     def postprocess(self):
         """postprocess."""
         pass
 
+    def setup_chunk_worker(self):
+        """Prepares this annotator to process input chunks with run_chunk in a
+        worker process. Database connection, secondary inputs, and setup are
+        shared by all the chunks the worker processes, so setup should not
+        use the primary input reader or the output writer."""
+        from time import time
+
+        self._setup_secondary_inputs()
+        self.connect_db()
+        self.setup()
+        if not self.output_columns:
+            self.output_columns = self.conf["output_columns"]
+        self.make_json_colnames()
+        self.last_status_update_time = time()
+
+    def run_chunk(self, seekpos: int, chunksize: int, postfix: str) -> str:
+        """Annotates chunksize data lines of the primary input starting at
+        seekpos and writes them to the output file with postfix. Returns the
+        path of the chunk output file."""
+        self.seekpos = seekpos
+        self.chunksize = chunksize
+        self.postfix = postfix
+        self._setup_primary_input()
+        self._setup_outputs()
+        try:
+            self.process_file()
+        finally:
+            if self.output_writer:
+                self.output_writer.close()
+                self.output_writer = None
+        return str(self.output_path)
+
+    def end_chunk_worker(self):
+        """Runs cleanup once when a chunk worker exits. postprocess is not
+        run, because a chunk worker sees only part of the input. Annotators
+        which override postprocess are not run in chunks."""
+        if self.dbconn is not None:
+            self.close_db_connection()
+        self.cleanup()
+
     async def get_gene_summary_data(self, cf):
         """get_gene_summary_data.
 
@@ -689,7 +821,15 @@ class BaseAnnotator(object):
         from ..exceptions import ConfigurationError
         from ..util.inout import FileReader
 
-        self.primary_input_reader = FileReader(str(self.primary_input_path))
+        encoding = None
+        if self.primary_input_reader:
+            encoding = self.primary_input_reader.encoding
+        self.primary_input_reader = FileReader(
+            str(self.primary_input_path),
+            seekpos=self.seekpos or 0,
+            chunksize=self.chunksize,
+            encoding=encoding,
+        )
         requested_input_columns = self.conf["input_columns"]
         defined_columns = self.primary_input_reader.get_column_names()
         missing_columns = set(requested_input_columns) - set(defined_columns)
@@ -757,6 +897,7 @@ class BaseAnnotator(object):
         from os import makedirs
         from pathlib import Path
         from ..util.inout import FileWriter
+        from ..system import get_intermediate_format
         from ..exceptions import SetupError
         from ..consts import VARIANT_LEVEL_OUTPUT_SUFFIX
         from ..consts import GENE_LEVEL_OUTPUT_SUFFIX
@@ -776,7 +917,7 @@ class BaseAnnotator(object):
             makedirs(self.output_dir)
         self.output_path = (
             Path(self.output_dir)
-            / f"{self.output_basename}.{self.module_name}{output_suffix}"
+            / f"{self.output_basename}.{self.module_name}{output_suffix}{self.postfix}"
         )
         if self.plain_output:
             self.output_writer = FileWriter(
@@ -786,7 +927,9 @@ class BaseAnnotator(object):
                 titles_prefix="",
             )
         else:
-            self.output_writer = FileWriter(self.output_path)
+            self.output_writer = FileWriter(
+                self.output_path, fmt=get_intermediate_format()
+            )
             self.output_writer.write_meta_line("name", self.module_name)
             self.output_writer.write_meta_line(
                 "displayname", self.annotator_display_name
@@ -919,6 +1062,32 @@ class BaseAnnotator(object):
             "secondary_data": secondary_data,
         }
 
+    def annotate_batch(
+        self,
+        input_data_l: List[Dict[str, Any]],
+        secondary_data_l: Optional[List[Dict[str, Any]]] = None,
+    ) -> List[Union[Dict[str, Any], None]]:
+        """Annotates a batch of variants and returns the output of each variant
+        in the same order. Override this to look up a whole batch at once, for
+        example with one `IN (...)` query. When overridden, process_file feeds
+        batches of annotate_batch_size variants to this method instead of
+        calling annotate per variant.
+
+        Args:
+            input_data_l (List[Dict[str, Any]]): input_data of the variants
+            secondary_data_l (Optional[List[Dict[str, Any]]]): secondary_data of the variants
+        """
+        output_dicts = []
+        for i, input_data in enumerate(input_data_l):
+            secondary_data = secondary_data_l[i] if secondary_data_l else {}
+            if secondary_data == {}:
+                output_dicts.append(self.annotate(input_data))
+            else:
+                output_dicts.append(
+                    self.annotate(input_data, secondary_data=secondary_data)
+                )
+        return output_dicts
+
     def live_report_substitute(self, d):
         """live_report_substitute.
 
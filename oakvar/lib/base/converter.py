@@ -77,6 +77,8 @@ class BaseConverter(object):
         self.ignore_sample: bool = ignore_sample
         self.header_num_line: int = 0
         self.line_no: int = 0
+        self.input_encoding: Optional[str] = None
+        self.line_batch_reader = None
         if name:
             self.module_name = name
         self.title = title
@@ -117,28 +119,35 @@ class BaseConverter(object):
     def get_variant_lines(
         self, input_path: str, num_pool: int, start_line_no: int, batch_size: int
     ) -> Tuple[Dict[int, List[Tuple[int, Any]]], bool]:
-        import linecache
-
-        immature_exit: bool = False
-        line_no: int = start_line_no
-        end_line_no = line_no + num_pool * batch_size - 1
+        from ..util.inout import LineBatchReader
+
+        reader = getattr(self, "line_batch_reader", None)
+        if (
+            reader is None
+            or reader.path != input_path
+            or reader.batch_size != batch_size
+            or reader.next_line_no != start_line_no
+        ):
+            if reader is not None:
+                reader.close()
+            reader = LineBatchReader(
+                input_path,
+                batch_size,
+                encoding=getattr(self, "input_encoding", None),
+                start_line_no=start_line_no,
+            )
+            self.line_batch_reader = reader
+        immature_exit: bool = True
         lines: Dict[int, List[Tuple[int, Any]]] = {i: [] for i in range(num_pool)}
-        chunk_no: int = 0
-        chunk_size: int = 0
-        while True:
-            line = linecache.getline(input_path, line_no)
-            if not line:
-                break
-            line = line[:-1]
-            lines[chunk_no].append((line_no, line))
-            chunk_size += 1
-            if line_no >= end_line_no:
-                immature_exit = True
+        for chunk_no in range(num_pool):
+            batch = reader.get_batch()
+            lines[chunk_no] = batch
+            if len(batch) < batch_size:
+                immature_exit = False
                 break
-            line_no += 1
-            if chunk_size >= batch_size:
-                chunk_no += 1
-                chunk_size = 0
+        if not immature_exit:
+            reader.close()
+            self.line_batch_reader = None
         return lines, immature_exit
 
     def prepare_for_mp(self):
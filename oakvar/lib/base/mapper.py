@@ -139,11 +139,13 @@ class BaseMapper(object):
     def make_input_reader(self):
         from ..util.inout import FileReader
 
+        encoding = self.reader.encoding if self.reader else None
         if self.seekpos is not None and self.chunksize is not None:
             self.reader = FileReader(
                 self.input_path,
                 seekpos=int(self.seekpos),
                 chunksize=int(self.chunksize),
+                encoding=encoding,
             )
         else:
             self.reader = FileReader(self.input_path)
@@ -152,6 +154,7 @@ class BaseMapper(object):
     def make_crx_writer(self):
         from ..util.inout import FileWriter
         from ..util.util import get_crx_def
+        from ..system import get_intermediate_format
         from ..consts import crx_idx
         from ..consts import VARIANT_LEVEL_MAPPED_FILE_SUFFIX
 
@@ -163,7 +166,7 @@ class BaseMapper(object):
             crx_def = sys_crx_def
         crx_fname = f"{self.output_base_fname}{VARIANT_LEVEL_MAPPED_FILE_SUFFIX}"
         self.crx_path = self.output_dir / (crx_fname + self.postfix)
-        self.crx_writer = FileWriter(self.crx_path)
+        self.crx_writer = FileWriter(self.crx_path, fmt=get_intermediate_format())
         self.crx_writer.add_columns(crx_def)
         self.crx_writer.write_definition(self.conf)
         for index_columns in crx_idx:
@@ -180,6 +183,7 @@ class BaseMapper(object):
     def make_crg_writer(self):
         from ..util.util import get_crg_def
         from ..util.inout import FileWriter
+        from ..system import get_intermediate_format
         from ..consts import GENE_LEVEL_MAPPED_FILE_SUFFIX
         from ..consts import crg_idx
 
@@ -188,7 +192,7 @@ class BaseMapper(object):
         crg_def = get_crg_def()
         crg_fname = f"{self.output_base_fname}{GENE_LEVEL_MAPPED_FILE_SUFFIX}"
         self.crg_path = self.output_dir / (crg_fname + self.postfix)
-        self.crg_writer = FileWriter(self.crg_path)
+        self.crg_writer = FileWriter(self.crg_path, fmt=get_intermediate_format())
         self.crg_writer.add_columns(crg_def)
         self.crg_writer.write_definition(self.conf)
         for index_columns in crg_idx:
@@ -336,6 +340,21 @@ class BaseMapper(object):
                 d[colname] = value
         return d
 
+    def run_chunk(self, seekpos: int, chunksize: int, postfix: str):
+        """Maps one chunk of the input file with an already set-up mapper. Used
+        to map many chunks of a file in one worker process."""
+        self.seekpos = seekpos
+        self.chunksize = chunksize
+        self.postfix = postfix
+        self.gene_info = {}
+        self.setup_input_output()
+        self.process_file()
+        self.write_crg()
+        if self.crx_writer is not None:
+            self.crx_writer.close()
+        if self.crg_writer is not None:
+            self.crg_writer.close()
+
     def run(self, __pos_no__):
         from time import time, asctime, localtime
         from ..util.run import update_status
@@ -56,6 +56,7 @@ from re import compile
 from pathlib import Path
 from liftover import ChainFile
 from oakvar.lib.base.converter import BaseConverter
+from oakvar.lib.util.dedup import VariantDedupIndex
 
 chromdict = {
     "chrx": "chrX",
@@ -98,8 +99,8 @@ def _log_conversion_error(
     input_path: str,
     line_no: int,
     e,
-    unique_excs: dict,
-    err_holders: List[List[str]],
+    unique_excs: Optional[dict],
+    err_holders: List[List[Any]],
     unique_err_in_line: Set[str],
     core_num=None,
 ):
@@ -118,22 +119,54 @@ def _log_conversion_error(
         err_str = str(e)
     else:
         err_str = format_exc().rstrip()
+    if unique_excs is None:
+        # Worker process. Errors are numbered and logged by the parent process.
+        if err_str not in unique_err_in_line:
+            err_holders[core_num].append(
+                (err_str, isinstance(e, IgnoredVariant), line_no, str(e))
+            )
+            unique_err_in_line.add(err_str)
+        return
+    add_conversion_error(
+        logger,
+        input_path,
+        err_str,
+        isinstance(e, IgnoredVariant),
+        line_no,
+        str(e),
+        unique_excs,
+        err_holders[core_num],
+        unique_err_in_line,
+    )
+    flush_err_holder(err_holders, core_num, error_logger)
+
+
+def add_conversion_error(
+    logger,
+    input_path: str,
+    err_str: str,
+    ignored: bool,
+    line_no: int,
+    err_msg: str,
+    unique_excs: dict,
+    err_holder: List[str],
+    unique_err_in_line: Set[str],
+):
     if err_str not in unique_excs:
         err_no = len(unique_excs)
         unique_excs[err_str] = err_no
-        if isinstance(e, IgnoredVariant):
+        if ignored:
             header = "Ignored"
         else:
             header = "Error"
         logger.error(f"{header} [{err_no}]: {input_path}: {err_str}")
-        err_holders[core_num].append(f"{err_no}:{line_no}\t{str(e)}")
+        err_holder.append(f"{err_no}:{line_no}\t{err_msg}")
         unique_err_in_line.add(err_str)
     else:
         if err_str not in unique_err_in_line:
             err_no = unique_excs[err_str]
-            err_holders[core_num].append(f"{err_no}:{line_no}\t{str(e)}")
+            err_holder.append(f"{err_no}:{line_no}\t{err_msg}")
             unique_err_in_line.add(err_str)
-    flush_err_holder(err_holders, core_num, error_logger)
 
 
 def is_chrM(wdict):
@@ -328,8 +361,8 @@ def handle_converted_variants(
     logger,
     error_logger,
     input_path: str,
-    unique_excs: dict,
-    err_holders: List[List[str]],
+    unique_excs: Optional[dict],
+    err_holders: List[List[Any]],
     line_no: int,
     core_num: int,
     genome: str,
@@ -387,8 +420,8 @@ def gather_variantss(
     logger,
     error_logger,
     input_path: str,
-    unique_excs: dict,
-    err_holders: List[List[str]],
+    unique_excs: Optional[dict],
+    err_holders: List[List[Any]],
     num_valid_error_lines: Dict[str, int],
     genome: str,
     keep_liftover_failed: bool,
@@ -452,8 +485,84 @@ def gather_variantss_wrapper(args):
     return gather_variantss(*args)
 
 
+def load_converter(
+    module_name: str,
+    script_path: Path,
+    module_options: Dict,
+    ignore_sample: bool,
+    keep_ref: bool,
+    logger=None,
+) -> Optional[BaseConverter]:
+    from oakvar.lib.util.util import load_class
+    from oakvar.lib.module.local import get_local_module_info
+    from oakvar.lib.exceptions import ModuleLoadingError
+
+    cls = load_class(script_path)
+    if cls is None:
+        raise ModuleLoadingError(module_name=module_name)
+    module_info = get_local_module_info(script_path.parent)
+    if not module_info:
+        if logger:
+            logger.error(f"{module_name} yml file is missing or bad.")
+        return None
+    converter = cls(ignore_sample=ignore_sample, module_options=module_options)
+    # TODO: backward compatibility
+    converter.output_dir = None
+    converter.run_name = None
+    converter.module_name = module_name
+    converter.name = module_info.name
+    converter.version = module_info.version
+    converter.conf = module_info.conf
+    converter.keep_ref = keep_ref
+    # end of backward compatibility
+    if not hasattr(converter, "format_name") or converter.format_name is None:
+        format_name = module_info.conf.get("format_name")
+        if format_name:
+            converter.format_name = format_name
+        else:
+            converter.format_name = module_name.split("-")[0]
+    if not converter.format_name:
+        if logger:
+            logger.error(
+                f"{module_name} module code does not have 'format_name' variable."
+            )
+        return None
+    converter.script_path = script_path
+    return converter
+
+
+def set_converter_properties(converter, output_dir, run_name, conf: Dict):
+    from oakvar.lib.module.local import get_module_code_version
+
+    converter.output_dir = output_dir
+    converter.run_name = run_name
+    module_name = converter.module_name
+    converter.version = get_module_code_version(converter.module_name)
+    if module_name in conf:
+        if hasattr(converter, "conf") is False:
+            converter.conf = {}
+        converter.conf.update(conf[module_name])
+
+
+def is_byte_range_readable(
+    converter: BaseConverter, input_path: str, encoding: Optional[str] = None
+) -> bool:
+    """Whether the lines of input_path can be read by byte ranges, which the
+    process pool of MasterConverter needs."""
+    from oakvar.lib.util.util import is_gzip_file
+    from oakvar.lib.util.inout import is_ascii_compatible_encoding
+
+    if is_gzip_file(input_path):
+        return False
+    if not is_ascii_compatible_encoding(encoding):
+        return False
+    return type(converter).get_variant_lines is BaseConverter.get_variant_lines
+
+
 class MasterConverter(object):
     DEFAULT_MP: int = 4
+    CHUNK_BYTES: int = 1024 * 1024
+    LOG_BATCH_SIZE: int = 100000
 
     def __init__(
         self,
@@ -472,11 +581,13 @@ class MasterConverter(object):
         mp: int = DEFAULT_MP,
         keep_liftover_failed: bool = False,
         keep_ref: bool = False,
+        dedup_max_memory: Optional[int] = None,
         outer=None,
     ):
         from re import compile
         from oakvar import get_wgs_reader
         from oakvar.lib.exceptions import ExpectedException
+        from oakvar.lib.system import get_dedup_max_memory
 
         self.logger = None
         self.crv_writer = None
@@ -550,6 +661,8 @@ class MasterConverter(object):
         self.time_error_written: float = 0
         self.mp = mp or self.DEFAULT_MP
         self.keep_ref = keep_ref
+        self.dedup_max_memory: int = dedup_max_memory or get_dedup_max_memory()
+        self.dedup_index: Optional[VariantDedupIndex] = None
 
     def get_genome_assembly(self, converter) -> str:
         from oakvar.lib.system.consts import default_assembly_key
@@ -652,47 +765,14 @@ class MasterConverter(object):
         self.error_logger = getLogger("err.converter")
 
     def get_converter(self, module_name: str) -> Optional[BaseConverter]:
-        from oakvar.lib.util.util import load_class
-        from oakvar.lib.module.local import get_local_module_info
-        from oakvar.lib.exceptions import ModuleLoadingError
-
-        try:
-            script_path: Path = self.converter_paths[module_name]
-            cls = load_class(script_path)
-            if cls is None:
-                raise ModuleLoadingError(module_name=module_name)
-            module_options = self.module_options.get(module_name, {})
-            module_info = get_local_module_info(script_path.parent)
-            if not module_info:
-                if self.logger:
-                    self.logger.error(f"{module_name} yml file is missing or bad.")
-                return None
-            converter = cls(ignore_sample=self.ignore_sample, module_options=module_options)
-            # TODO: backward compatibility
-            converter.output_dir = None
-            converter.run_name = None
-            converter.module_name = module_name
-            converter.name = module_info.name
-            converter.version = module_info.version
-            converter.conf = module_info.conf
-            converter.keep_ref = self.keep_ref
-            # end of backward compatibility
-            if not hasattr(converter, "format_name") or converter.format_name is None:
-                format_name = module_info.conf.get("format_name")
-                if format_name:
-                    converter.format_name = format_name
-                else:
-                    converter.format_name = module_name.split("-")[0]
-            if not converter.format_name:
-                if self.logger:
-                    self.logger.error(
-                        f"{module_name} module code does not have 'format_name' variable."
-                    )
-                return None
-            converter.script_path = script_path
-            return converter
-        except Exception as e:
-            raise e
+        return load_converter(
+            module_name,
+            self.converter_paths[module_name],
+            self.module_options.get(module_name, {}),
+            self.ignore_sample,
+            self.keep_ref,
+            logger=self.logger,
+        )
 
     def collect_converter_paths(self):
         from pathlib import Path
@@ -779,23 +859,18 @@ class MasterConverter(object):
 
     def set_converter_properties(self, converter):
         from oakvar.lib.exceptions import SetupError
-        from oakvar.lib.module.local import get_module_code_version
 
         if self.conf is None:
             raise SetupError()
-        converter.output_dir = self.output_dir
-        converter.run_name = self.output_base_fname
-        module_name = converter.module_name
-        converter.version = get_module_code_version(converter.module_name)
-        if module_name in self.conf:
-            if hasattr(converter, "conf") is False:
-                converter.conf = {}
-            converter.conf.update(self.conf[module_name])
+        set_converter_properties(
+            converter, self.output_dir, self.output_base_fname, self.conf
+        )
 
     def setup_crv_writer(self):
         from pathlib import Path
         from oakvar.lib.util.util import get_crv_def
         from oakvar.lib.util.inout import FileWriter
+        from oakvar.lib.system import get_intermediate_format
         from oakvar.lib.consts import crv_idx
         from oakvar.lib.consts import STANDARD_INPUT_FILE_SUFFIX
 
@@ -805,7 +880,7 @@ class MasterConverter(object):
         self.wpath = Path(self.output_dir) / (
             self.output_base_fname + STANDARD_INPUT_FILE_SUFFIX
         )
-        self.crv_writer = FileWriter(self.wpath)
+        self.crv_writer = FileWriter(self.wpath, fmt=get_intermediate_format())
         self.crv_writer.add_columns(crv_def)
         self.crv_writer.write_definition()
         for index_columns in crv_idx:
@@ -816,6 +891,7 @@ class MasterConverter(object):
         from copy import deepcopy
         from oakvar.lib.util.util import get_crs_def
         from oakvar.lib.util.inout import FileWriter
+        from oakvar.lib.system import get_intermediate_format
         from oakvar.lib.consts import crs_idx
         from oakvar.lib.consts import SAMPLE_FILE_SUFFIX
 
@@ -835,7 +911,7 @@ class MasterConverter(object):
         self.crs_path = Path(self.output_dir) / (
             self.output_base_fname + SAMPLE_FILE_SUFFIX
         )
-        self.crs_writer = FileWriter(self.crs_path)
+        self.crs_writer = FileWriter(self.crs_path, fmt=get_intermediate_format())
         self.crs_writer.add_columns(crs_def)
         self.crs_writer.write_definition()
         for index_columns in crs_idx:
@@ -845,6 +921,7 @@ class MasterConverter(object):
         from pathlib import Path
         from oakvar.lib.util.util import get_crm_def
         from oakvar.lib.util.inout import FileWriter
+        from oakvar.lib.system import get_intermediate_format
         from oakvar.lib.consts import crm_idx
         from oakvar.lib.consts import MAPPING_FILE_SUFFIX
 
@@ -854,7 +931,7 @@ class MasterConverter(object):
         self.crm_path = Path(self.output_dir) / (
             self.output_base_fname + MAPPING_FILE_SUFFIX
         )
-        self.crm_writer = FileWriter(self.crm_path)
+        self.crm_writer = FileWriter(self.crm_path, fmt=get_intermediate_format())
         self.crm_writer.add_columns(crm_def)
         self.crm_writer.write_definition()
         for index_columns in crm_idx:
@@ -865,6 +942,7 @@ class MasterConverter(object):
         from pathlib import Path
         from oakvar.lib.util.util import get_crl_def
         from oakvar.lib.util.inout import FileWriter
+        from oakvar.lib.system import get_intermediate_format
         from oakvar.lib.consts import VARIANT_LEVEL_OUTPUT_SUFFIX
 
         if not self.output_dir or not self.output_base_fname:
@@ -874,7 +952,7 @@ class MasterConverter(object):
             Path(self.output_dir)
             / f"{self.output_base_fname}.original_input{VARIANT_LEVEL_OUTPUT_SUFFIX}"
         )
-        self.crl_writer = FileWriter(self.crl_path)
+        self.crl_writer = FileWriter(self.crl_path, fmt=get_intermediate_format())
         self.crl_writer.add_columns(crl_def)
         self.crl_writer.write_definition()
         self.crl_writer.write_names("original_input", "Original Input", "")
@@ -896,7 +974,9 @@ class MasterConverter(object):
         self.logger.info("input format: %s" % converter.format_name)
         self.logger.info(f"genome_assembly: {genome_assembly}")
 
-    def setup_file(self, input_path: str) -> List[BaseConverter]:
+    def setup_file(
+        self, input_path: str, num_converters: Optional[int] = None
+    ) -> List[BaseConverter]:
         from logging import getLogger
         from oakvar.lib.util.util import log_module
         from oakvar.lib.exceptions import NoConverterFound
@@ -906,7 +986,7 @@ class MasterConverter(object):
         if not converter_name:
             raise NoConverterFound(input_path)
         converters: List[BaseConverter] = []
-        for _ in range(self.mp):
+        for _ in range(num_converters or self.mp):
             converter = self.get_converter(converter_name)
             if not converter:
                 raise NoConverterFound(input_path)
@@ -920,6 +1000,7 @@ class MasterConverter(object):
             self.error_logger = getLogger("err." + converter.module_name)  # type: ignore
             converter.input_path = input_path
             converter.input_paths = self.input_paths
+            converter.input_encoding = encoding
             converter.setup(input_path, encoding=encoding)
             genome_assembly = self.get_genome_assembly(converter)
             self.genome_assemblies.append(genome_assembly)
@@ -1015,7 +1096,7 @@ class MasterConverter(object):
 
     def run(self):
         from pathlib import Path
-        from multiprocessing.pool import ThreadPool
+        from time import time
         from sys import platform as sysplatform
         from oakvar.lib.util.run import update_status
 
@@ -1037,31 +1118,99 @@ class MasterConverter(object):
         if (
             sysplatform == "win32"
         ):  # TODO: Remove after releasing Rust-based vcf-converter.
-            batch_size: int = 10000
             num_pool = 1
         else:
-            batch_size: int = 2500
             num_pool = self.mp
         self.err_holders: List[List[str]] = []
         for _ in range(num_pool):
             self.err_holders.append([])
-        pool = ThreadPool(num_pool)
-        unique_var_dict: Dict[int, Dict[str, int]] = {}
-        uid_var: int = 0
-        log_batch_size: int = 100000
+        self.dedup_index = VariantDedupIndex(
+            self.dedup_max_memory, spill_dir=self.output_dir
+        )
         for input_path in self.input_paths:
             self.input_fname = Path(input_path).name
-            fileno = self.input_path_dict2[input_path]
-            converters = self.setup_file(input_path)
-            main_converter = converters[0]
             self.file_num_unique_variants = 0
             self.file_num_dup_variants: int = 0
             self.file_error_lines = 0
             self.num_valid_error_lines = {VALID: 0, ERROR: 0, IGNORED: 0}
-            start_line_pos: int = 1
-            start_line_no: int = start_line_pos
-            round_no: int = 0
-            next_batch_log: int = log_batch_size
+            file_start_time = time()
+            converters = self.setup_file(input_path, num_converters=1)
+            if num_pool > 1 and is_byte_range_readable(
+                converters[0], input_path, self.input_file_handles[input_path]
+            ):
+                num_lines = self.run_file_with_processes(
+                    input_path, converters[0], num_pool
+                )
+            else:
+                converters.extend(
+                    self.setup_file(input_path, num_converters=num_pool - 1)
+                    if num_pool > 1
+                    else []
+                )
+                num_lines = self.run_file_with_threads(
+                    input_path, converters, num_pool
+                )
+            file_runtime = time() - file_start_time
+            if file_runtime > 0:
+                self.logger.info(
+                    f"{input_path}: {num_lines} lines converted at "
+                    + f"{num_lines / file_runtime:.0f} lines/sec with {num_pool} workers"
+                )
+            self.logger.info(
+                f"{input_path}: number of lines ignored: {self.num_valid_error_lines[IGNORED]}"
+            )
+            self.logger.info(
+                f"{input_path}: number of lines successfully processed: {self.num_valid_error_lines[VALID]}"
+            )
+            self.logger.info(
+                f"{input_path}: number of lines skipped due to errors: {self.num_valid_error_lines[ERROR]}"
+            )
+            self.logger.info(
+                f"{input_path}: number of unique variants: {self.file_num_unique_variants}"
+            )
+            self.logger.info(
+                f"{input_path}: number of duplicate variants: {self.file_num_dup_variants}"
+            )
+            self.total_num_unique_variants += self.file_num_unique_variants
+            self.total_num_duplicate_variants += self.file_num_dup_variants
+            self.total_num_valid_lines += self.num_valid_error_lines[VALID]
+            self.total_num_error_lines += self.num_valid_error_lines[ERROR]
+        for core_num in range(num_pool):
+            flush_err_holder(self.err_holders, core_num, self.error_logger, force=True)
+        if self.dedup_index.num_spills:
+            self.logger.info(
+                f"variant deduplication index spilled to disk {self.dedup_index.num_spills} times"
+            )
+        self.dedup_index.close()
+        self.close_output_files()
+        self.end()
+        self.log_ending()
+        ret = {
+            "num_unique_variants": self.total_num_unique_variants,
+            "num_duplicate_variants": self.total_duplicate_variants,
+            "num_valid_lines": self.total_num_valid_lines,
+            "num_error_lines": self.total_num_error_lines,
+            "input_formats": self.input_formats,
+            "assemblies": self.genome_assemblies,
+        }
+        return ret
+
+    def run_file_with_threads(
+        self, input_path: str, converters: List[BaseConverter], num_pool: int
+    ) -> int:
+        from multiprocessing.pool import ThreadPool
+        from sys import platform as sysplatform
+
+        if sysplatform == "win32":
+            batch_size: int = 10000
+        else:
+            batch_size: int = 2500
+        fileno = self.input_path_dict2[input_path]
+        main_converter = converters[0]
+        start_line_no: int = 1
+        num_lines: int = 0
+        next_batch_log: int = self.LOG_BATCH_SIZE
+        with ThreadPool(num_pool) as pool:
             while True:
                 lines_data, immature_exit = main_converter.get_variant_lines(
                     input_path, num_pool, start_line_no, batch_size
@@ -1083,123 +1232,179 @@ class MasterConverter(object):
                         self.num_valid_error_lines,
                         self.genome,
                         self.keep_liftover_failed,
-                        self.keep_ref
+                        self.keep_ref,
                     )
                     for core_num in range(num_pool)
                 ]
                 results = pool.map(gather_variantss_wrapper, args)
+                num_lines += sum([len(v) for v in lines_data.values()])
                 for core_num in range(num_pool):
                     flush_err_holder(
                         self.err_holders, core_num, self.error_logger, force=True
                     )
                 lines_data = None
-                for result in results:
-                    variants_l = result
-                    for i in range(len(variants_l)):
-                        variants = variants_l[i]
-                        if len(variants) == 0:
-                            continue
-                        for variant in variants:
-                            if "sample" in variant:
-                                sample = variant["sample"]
-                            else:
-                                sample = variant
-                            if "extra_info" in variant:
-                                extra_info = variant["extra_info"]
-                            else:
-                                extra_info = variant
-                            crl = variant.get("crl")
-                            variant["fileno"] = fileno
-                            if self.skip_variant_deduplication:
-                                uid_var += 1
-                                variant["uid"] = uid_var
-                                sample["uid"] = uid_var
-                                extra_info["uid"] = uid_var
-                                self.crv_writer.write_data(variant)
-                                self.crm_writer.write_data(variant)
-                                self.crs_writer.write_data(sample)
-                                main_converter.write_extra_info(extra_info)
-                                if crl:
-                                    crl["uid"] = variant["uid"]
-                                    self.crl_writer.write_data(crl)
-                                self.file_num_unique_variants += 1
-                            else:
-                                dup_found: bool = False
-                                pos: int = variant.get("pos", 0)
-                                var_str: str = f'{variant["chrom"]}:{variant["pos"]}:{variant["ref_base"]}:{variant["alt_base"]}'
-                                if pos not in unique_var_dict:
-                                    unique_var_dict[pos] = {}
-                                for comp_var_str in unique_var_dict.get(pos, {}).keys():
-                                    if var_str == comp_var_str:
-                                        # crs: uid, sample_id, genotype, zygosity, tot_reads, alt_reads, af
-                                        comp_uid: int = unique_var_dict[pos][
-                                            comp_var_str
-                                        ]
-                                        sample["uid"] = comp_uid
-                                        variant["uid"] = comp_uid
-                                        dup_found = True
-                                        break
-                                if not dup_found:
-                                    uid_var += 1
-                                    variant["uid"] = uid_var
-                                    sample["uid"] = uid_var
-                                    extra_info["uid"] = uid_var
-                                    if crl:
-                                        crl["uid"] = uid_var
-                                    self.crv_writer.write_data(variant)
-                                    self.file_num_unique_variants += 1
-                                    unique_var_dict[pos][var_str] = uid_var
-                                    main_converter.write_extra_info(extra_info)
-                                    if crl:
-                                        self.crl_writer.write_data(crl)
-                                else:
-                                    self.file_num_dup_variants += 1
-                                self.crs_writer.write_data(sample)
-                                self.crm_writer.write_data(variant)
-                    variants_l = None
+                for variants_l in results:
+                    self.write_variants_l(variants_l, fileno, main_converter)
                 if not immature_exit:
                     break
                 start_line_no += batch_size * num_pool
-                round_no += 1
                 if start_line_no >= next_batch_log:
-                    status = f"Running Converter ({self.input_fname}): line {start_line_no - 1}"
-                    update_status(
-                        status, logger=self.logger, serveradmindb=self.serveradmindb
-                    )
-                    next_batch_log = start_line_no + log_batch_size
-            self.logger.info(
-                f"{input_path}: number of lines ignored: {self.num_valid_error_lines[IGNORED]}"
-            )
-            self.logger.info(
-                f"{input_path}: number of lines successfully processed: {self.num_valid_error_lines[VALID]}"
-            )
-            self.logger.info(
-                f"{input_path}: number of lines skipped due to errors: {self.num_valid_error_lines[ERROR]}"
-            )
-            self.logger.info(
-                f"{input_path}: number of unique variants: {self.file_num_unique_variants}"
-            )
-            self.logger.info(
-                f"{input_path}: number of duplicate variants: {self.file_num_dup_variants}"
-            )
-            self.total_num_unique_variants += self.file_num_unique_variants
-            self.total_num_duplicate_variants += self.file_num_dup_variants
-            self.total_num_valid_lines += self.num_valid_error_lines[VALID]
-            self.total_num_error_lines += self.num_valid_error_lines[ERROR]
-        for core_num in range(num_pool):
-            flush_err_holder(self.err_holders, core_num, self.error_logger, force=True)
-        self.close_output_files()
-        self.end()
-        self.log_ending()
-        ret = {
-            "num_unique_variants": self.total_num_unique_variants,
-            "num_duplicate_variants": self.total_duplicate_variants,
-            "num_valid_lines": self.total_num_valid_lines,
-            "num_error_lines": self.total_num_error_lines,
-            "input_formats": self.input_formats,
-            "assemblies": self.genome_assemblies,
+                    self.log_progress(start_line_no - 1)
+                    next_batch_log = start_line_no + self.LOG_BATCH_SIZE
+        return num_lines
+
+    def run_file_with_processes(
+        self, input_path: str, main_converter: BaseConverter, num_pool: int
+    ) -> int:
+        from multiprocessing import get_context
+        from threading import BoundedSemaphore
+        from oakvar.lib.util.inout import get_byte_range_chunks
+        from oakvar.lib.base.mp_runners import init_converter_worker
+        from oakvar.lib.base.mp_runners import converter_runner
+
+        if not self.logger:
+            raise
+        fileno = self.input_path_dict2[input_path]
+        worker_spec = {
+            "module_name": main_converter.module_name,
+            "script_path": main_converter.script_path,  # type: ignore
+            "module_options": self.module_options.get(main_converter.module_name, {}),
+            "ignore_sample": self.ignore_sample,
+            "keep_ref": self.keep_ref,
+            "output_dir": self.output_dir,
+            "run_name": self.output_base_fname,
+            "conf": self.conf,
+            "input_path": input_path,
+            "input_paths": self.input_paths,
+            "encoding": self.input_file_handles[input_path],
+            "genome": self.genome,
+            "do_liftover": self.do_liftover,
+            "do_liftover_chrM": self.do_liftover_chrM,
+            "keep_liftover_failed": self.keep_liftover_failed,
         }
-        return ret
+        # Bounds the number of converted chunks waiting to be written.
+        pending = BoundedSemaphore(num_pool * 2)
+
+        def throttled_chunks():
+            for chunk in get_byte_range_chunks(input_path, self.CHUNK_BYTES):
+                pending.acquire()
+                yield chunk
+
+        last_line_no: int = 0
+        next_batch_log: int = self.LOG_BATCH_SIZE
+        err_holder = self.err_holders[0]
+        with get_context("spawn").Pool(
+            num_pool, init_converter_worker, (worker_spec,)
+        ) as pool:
+            for variants_l, errors, num_valid_error_lines, last_line_no in pool.imap(
+                converter_runner, throttled_chunks()
+            ):
+                pending.release()
+                for err_str, ignored, line_no, err_msg in errors:
+                    add_conversion_error(
+                        self.logger,
+                        input_path,
+                        err_str,
+                        ignored,
+                        line_no,
+                        err_msg,
+                        self.unique_excs,
+                        err_holder,
+                        set(),
+                    )
+                flush_err_holder(self.err_holders, 0, self.error_logger, force=True)
+                for k, v in num_valid_error_lines.items():
+                    self.num_valid_error_lines[k] += v
+                self.write_variants_l(variants_l, fileno, main_converter)
+                if last_line_no >= next_batch_log:
+                    self.log_progress(last_line_no)
+                    next_batch_log = last_line_no + self.LOG_BATCH_SIZE
+        return last_line_no
+
+    def log_progress(self, line_no: int):
+        from oakvar.lib.util.run import update_status
+
+        status = f"Running Converter ({self.input_fname}): line {line_no}"
+        update_status(status, logger=self.logger, serveradmindb=self.serveradmindb)
+
+    def write_variants_l(
+        self,
+        variants_l: List[List[Dict[str, Any]]],
+        fileno: int,
+        main_converter: BaseConverter,
+    ):
+        if (
+            not self.crv_writer
+            or not self.crs_writer
+            or not self.crm_writer
+            or not self.crl_writer
+            or not self.dedup_index
+        ):
+            raise
+        dedup_index = self.dedup_index
+        crv_rows: List[Dict[str, Any]] = []
+        crm_rows: List[Dict[str, Any]] = []
+        crs_rows: List[Dict[str, Any]] = []
+        crl_rows: List[Dict[str, Any]] = []
+        for variants in variants_l:
+            if len(variants) == 0:
+                continue
+            for variant in variants:
+                if "sample" in variant:
+                    sample = variant["sample"]
+                else:
+                    sample = variant
+                if "extra_info" in variant:
+                    extra_info = variant["extra_info"]
+                else:
+                    extra_info = variant
+                crl = variant.get("crl")
+                variant["fileno"] = fileno
+                if self.skip_variant_deduplication:
+                    self.uid += 1
+                    variant["uid"] = self.uid
+                    sample["uid"] = self.uid
+                    extra_info["uid"] = self.uid
+                    crv_rows.append(variant)
+                    crm_rows.append(variant)
+                    crs_rows.append(sample)
+                    main_converter.write_extra_info(extra_info)
+                    if crl:
+                        crl["uid"] = variant["uid"]
+                        crl_rows.append(crl)
+                    self.file_num_unique_variants += 1
+                else:
+                    key = dedup_index.get_key(
+                        variant["chrom"],
+                        variant.get("pos", 0),
+                        variant["ref_base"],
+                        variant["alt_base"],
+                    )
+                    comp_uid = dedup_index.get(key)
+                    if comp_uid is not None:
+                        # crs: uid, sample_id, genotype, zygosity, tot_reads, alt_reads, af
+                        sample["uid"] = comp_uid
+                        variant["uid"] = comp_uid
+                        self.file_num_dup_variants += 1
+                    else:
+                        self.uid += 1
+                        variant["uid"] = self.uid
+                        sample["uid"] = self.uid
+                        extra_info["uid"] = self.uid
+                        if crl:
+                            crl["uid"] = self.uid
+                        crv_rows.append(variant)
+                        self.file_num_unique_variants += 1
+                        dedup_index.add(key, self.uid)
+                        main_converter.write_extra_info(extra_info)
+                        if crl:
+                            crl_rows.append(crl)
+                    crs_rows.append(sample)
+                    crm_rows.append(variant)
+        self.crv_writer.write_many(crv_rows)
+        self.crm_writer.write_many(crm_rows)
+        self.crs_writer.write_many(crs_rows)
+        self.crl_writer.write_many(crl_rows)
 
     def set_variables_pre_run(self):
         from time import time
@@ -1242,6 +1447,8 @@ class MasterConverter(object):
             self.crm_writer.close()
         if self.crs_writer is not None:
             self.crs_writer.close()
+        if self.crl_writer is not None:
+            self.crl_writer.close()
 
     def end(self):
         pass
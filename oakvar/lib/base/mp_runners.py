@@ -46,20 +46,46 @@
 # SOFTWARE.
 
 
+converter_worker: dict = {}
+mapper_worker: dict = {}
+annotator_worker: dict = {}
+vcf2vcf_worker: dict = {}
+
+
 def init_worker():
     import signal
 
     signal.signal(signal.SIGINT, signal.SIG_IGN)
 
 
-def annot_from_queue(
-    start_queue, end_queue, queue_populated, serveradmindb, logtofile, log_path
-):
+def get_annotator_logger(module_name, logtofile, log_path):
     import sys
     from logging import getLogger
     from logging import StreamHandler
     from logging import FileHandler
     from logging import Formatter
+
+    logger = getLogger(module_name)
+    logger.setLevel("INFO")
+    if logtofile and log_path:
+        log_handler = FileHandler(log_path, "a")
+    else:
+        log_handler = StreamHandler(stream=sys.stdout)
+    formatter = Formatter("%(asctime)s %(name)-20s %(message)s", "%Y/%m/%d %H:%M:%S")
+    log_handler.setFormatter(formatter)
+    logger.addHandler(log_handler)
+    return logger
+
+
+def annot_from_queue(
+    start_queue,
+    end_queue,
+    queue_populated,
+    worker_slots,
+    serveradmindb,
+    logtofile,
+    log_path,
+):
     from queue import Empty
     from ..util.util import load_class
     from ..exceptions import ModuleLoadingError
@@ -69,24 +95,14 @@ def annot_from_queue(
         try:
             task = start_queue.get(True, 1)
         except Empty:
-            if queue_populated:
+            if queue_populated.value:
                 break
             else:
                 continue
         logger = None
         module, kwargs = task
         try:
-            logger = getLogger(module.name)
-            logger.setLevel("INFO")
-            if logtofile and log_path:
-                log_handler = FileHandler(log_path, "a")
-            else:
-                log_handler = StreamHandler(stream=sys.stdout)
-            formatter = Formatter(
-                "%(asctime)s %(name)-20s %(message)s", "%Y/%m/%d %H:%M:%S"
-            )
-            log_handler.setFormatter(formatter)
-            logger.addHandler(log_handler)
+            logger = get_annotator_logger(module.name, logtofile, log_path)
         except Exception as e:
             traceback.print_exc()
             raise e
@@ -104,6 +120,8 @@ def annot_from_queue(
                 logger.exception(err)
             raise e
         if annotator_class:
+            # Shares the worker budget with chunked annotators.
+            worker_slots.acquire()
             try:
                 annotator = annotator_class(**kwargs)
                 annotator.run()
@@ -113,6 +131,8 @@ def annot_from_queue(
                 if logger:
                     logger.exception(e)
                 raise e
+            finally:
+                worker_slots.release()
         else:
             raise ModuleLoadingError(
                 msg=f"Annotator of {module.name} could not be loaded."
@@ -157,3 +177,194 @@ def mapper_runner(
                 msg=f"Mapper of {module_name} could not be loaded."
             )
     return output
+
+
+def init_mapper_worker(
+    crv_path,
+    run_name,
+    output_dir,
+    module_name,
+    primary_transcript,
+    serveradmindb,
+):
+    from multiprocessing.util import Finalize
+    from ..util.util import load_class
+    from ..module.local import get_local_module_info
+    from ..exceptions import ModuleLoadingError
+
+    init_worker()
+    module = get_local_module_info(module_name)
+    if module is None:
+        raise ModuleLoadingError(module_name=module_name)
+    if primary_transcript:
+        primary_transcript = primary_transcript.split(";")
+    genemapper_class = load_class(module.script_path, "Mapper")
+    if not genemapper_class:
+        raise ModuleLoadingError(msg=f"Mapper of {module_name} could not be loaded.")
+    genemapper = genemapper_class(
+        input_file=crv_path,
+        run_name=run_name,
+        primary_transcript=primary_transcript,
+        serveradmindb=serveradmindb,
+        output_dir=output_dir,
+    )
+    genemapper.setup()
+    genemapper.extra_setup()
+    Finalize(None, genemapper.end, exitpriority=10)
+    mapper_worker["mapper"] = genemapper
+
+
+def mapper_chunk_runner(task):
+    from time import time
+
+    pos_no, seekpos, chunksize = task
+    start_time = time()
+    mapper_worker["mapper"].run_chunk(seekpos, chunksize, f".{pos_no:010.0f}")
+    return pos_no, chunksize, time() - start_time
+
+
+def init_annotator_worker(
+    module_name, script_path, kwargs, serveradmindb, logtofile, log_path
+):
+    from multiprocessing.util import Finalize
+    from ..util.util import load_class
+    from ..exceptions import ModuleLoadingError
+
+    init_worker()
+    logger = get_annotator_logger(module_name, logtofile, log_path)
+    annotator_class = load_class(script_path, "Annotator")
+    if not annotator_class:
+        annotator_class = load_class(script_path, "CravatAnnotator")
+    if not annotator_class:
+        raise ModuleLoadingError(
+            msg=f"Annotator of {module_name} could not be loaded."
+        )
+    annotator = annotator_class(
+        **kwargs, serveradmindb=serveradmindb, logger=logger
+    )
+    annotator.setup_chunk_worker()
+    Finalize(None, annotator.end_chunk_worker, exitpriority=10)
+    annotator_worker["annotator"] = annotator
+
+
+def annotator_chunk_runner(task):
+    from time import time
+
+    pos_no, seekpos, chunksize = task
+    start_time = time()
+    output_path = annotator_worker["annotator"].run_chunk(
+        seekpos, chunksize, f".{pos_no:010.0f}"
+    )
+    return pos_no, chunksize, time() - start_time, output_path
+
+
+def init_vcf2vcf_worker(script_path, kwargs):
+    from ..util.util import load_class
+    from ..exceptions import ModuleLoadingError
+
+    init_worker()
+    vcf2vcf_class = load_class(script_path, "VCF2VCF")
+    if not vcf2vcf_class:
+        raise ModuleLoadingError(msg="VCF2VCF module could not be loaded.")
+    vcf2vcf = vcf2vcf_class(**kwargs)
+    vcf2vcf.setup_col_infos()
+    vcf2vcf.setup_modules()
+    vcf2vcf_worker["vcf2vcf"] = vcf2vcf
+
+
+def vcf2vcf_chunk_runner(task):
+    lines, start_uid, start_lnum = task
+    return vcf2vcf_worker["vcf2vcf"].annotate_lines(lines, start_uid, start_lnum)
+
+
+def init_converter_worker(spec: dict):
+    from pathlib import Path
+    from .master_converter import load_converter
+    from .master_converter import set_converter_properties
+    from ..util.seq import get_lifter
+    from ..util.seq import get_wgs_reader
+    from ..exceptions import ModuleLoadingError
+
+    init_worker()
+    converter = load_converter(
+        spec["module_name"],
+        Path(spec["script_path"]),
+        spec["module_options"],
+        spec["ignore_sample"],
+        spec["keep_ref"],
+    )
+    if not converter:
+        raise ModuleLoadingError(module_name=spec["module_name"])
+    set_converter_properties(
+        converter, spec["output_dir"], spec["run_name"], spec["conf"]
+    )
+    converter.input_path = spec["input_path"]
+    converter.input_paths = spec["input_paths"]
+    converter.input_encoding = spec["encoding"]
+    converter.setup(spec["input_path"], encoding=spec["encoding"])
+    lifter = None
+    if spec["do_liftover"] or spec["do_liftover_chrM"]:
+        lifter = get_lifter(source_assembly=spec["genome"])
+    converter_worker.clear()
+    converter_worker.update(spec)
+    converter_worker["converter"] = converter
+    converter_worker["lifter"] = lifter
+    converter_worker["wgs_reader"] = get_wgs_reader(assembly="hg38")
+
+
+def converter_runner(chunk):
+    from io import BytesIO
+    from io import TextIOWrapper
+    from .master_converter import gather_variantss
+    from .master_converter import VALID
+    from .master_converter import ERROR
+    from .master_converter import IGNORED
+
+    start, end, line_no = chunk
+    input_path = converter_worker["input_path"]
+    encoding = converter_worker["encoding"]
+    if not encoding or encoding == "ascii":
+        encoding = "utf-8"
+    with open(input_path, "rb") as f:
+        f.seek(start)
+        data = f.read(end - start)
+    lines = []
+    for line in TextIOWrapper(BytesIO(data), encoding=encoding):
+        if line.endswith("\n"):
+            line = line[:-1]
+        lines.append((line_no, line))
+        line_no += 1
+    data = None
+    errors = [[]]
+    num_valid_error_lines = {VALID: 0, ERROR: 0, IGNORED: 0}
+    variants_l = gather_variantss(
+        converter_worker["converter"],
+        {0: lines},
+        0,
+        converter_worker["do_liftover"],
+        converter_worker["do_liftover_chrM"],
+        converter_worker["lifter"],
+        converter_worker["wgs_reader"],
+        None,
+        None,
+        input_path,
+        None,
+        errors,
+        num_valid_error_lines,
+        converter_worker["genome"],
+        converter_worker["keep_liftover_failed"],
+        converter_worker["keep_ref"],
+    )
+    return variants_l, errors[0], num_valid_error_lines, line_no - 1
+
+
+def reporter_runner(script_path, arg_dict, head_n):
+    import asyncio
+    from ..util.util import load_class
+    from ..exceptions import ModuleLoadingError
+
+    Reporter = load_class(script_path, "Reporter")
+    if not Reporter:
+        raise ModuleLoadingError(module_name=arg_dict.get("module_name"))
+    reporter = Reporter(**arg_dict)
+    return asyncio.run(reporter.run(head_n=head_n))
@@ -48,10 +48,20 @@
 from typing import Optional
 from typing import Any
 from typing import Dict
+from typing import List
+from typing import Tuple
 
 
 class BasePostAggregator(object):
     cr_type_to_sql = {"string": "text", "int": "integer", "float": "real"}
+    write_batch_size = 10000
+    staged_write = False
+    # Set to False to write staged output with correlated subqueries, as on
+    # SQLite older than 3.33.0, which has no update ... from.
+    update_from = True
+    # Set to True to have run process the level table as one DataFrame with
+    # annotate_df instead of calling annotate for each row.
+    df_mode = False
 
     def __init__(
         self,
@@ -70,6 +80,7 @@ class BasePostAggregator(object):
         from pathlib import Path
         import os
         from ..module.local import get_module_conf
+        from ..util.inout import ColumnStats
 
         self.module_type = "postaggregator"
         if self.__module__ == "__main__":
@@ -127,6 +138,9 @@ class BasePostAggregator(object):
         self.where_g: Optional[str] = None
         self.q_v: Optional[str] = None
         self.q_g: Optional[str] = None
+        self.pending_updates: Dict[Tuple[str, ...], List[List[Any]]] = {}
+        self.pending_ref_ids = set()
+        self.column_stats = ColumnStats()
         self.outer = outer
         self.should_run_annotate = self.check()
         self._close_db_connection()
@@ -285,9 +299,12 @@ class BasePostAggregator(object):
         self._close_db_connection()
 
     def setup_output_columns(self):
+        from ..util.inout import ColumnDefinition
+
         if not self.conf:
             return
         output_columns = self.conf.get("output_columns", [])
+        self.column_stats.add_columns([ColumnDefinition(col) for col in output_columns])
         for col in output_columns:
             if "table" in col and col["table"] is True:
                 self.json_colnames.append(col["name"])
@@ -315,10 +332,27 @@ class BasePostAggregator(object):
         )
         return df
 
-    def save_df(self, df, level: str):
+    def save_df(self, df, level: Optional[str] = None) -> int:
+        """Writes the output columns of a Polars DataFrame to the result database.
+
+        Args:
+            df: DataFrame with the reference column of the level
+                (base__uid, or base__hugo for gene level) and this module's
+                output columns, named with or without the module name prefix.
+            level (Optional[str]): Table to update. Defaults to the module level.
+
+        Returns:
+            Number of rows written
+        """
+        from ..exceptions import SetupError
+        from ..exceptions import ArgumentError
+
         if not self.conf:
-            return
-        assert self.dbconn is not None
+            return 0
+        if not level:
+            level = self.level
+        if not level or not self.dbconn or not self.cursor_w:
+            raise SetupError()
         ref_colnames = {
             "variant": "base__uid",
             "gene": "base__hugo",
@@ -327,19 +361,66 @@ class BasePostAggregator(object):
         }
         ref_colname = ref_colnames.get(level)
         if not ref_colname:
+            raise SetupError(msg=f"save_df cannot write to the {level} table.")
+        if ref_colname not in df.columns:
+            raise ArgumentError(msg=f"{ref_colname} is not in the DataFrame.")
+        col_names = []
+        df_col_names = []
+        for coldef in self.conf.get("output_columns", []):
+            col_name = coldef["name"]
+            shortcol_name = col_name.split("__")[1]
+            if col_name in df.columns:
+                df_col_names.append(col_name)
+            elif shortcol_name in df.columns:
+                df_col_names.append(shortcol_name)
+            else:
+                continue
+            col_names.append(col_name)
+        if not col_names:
+            return 0
+        rows = df.select(df_col_names + [ref_colname]).rows()
+        self.cursor_w.execute("begin")
+        self.write_staged_output(
+            col_names, rows, level=level, ref_col_name=ref_colname
+        )
+        self.cursor_w.execute("commit")
+        if level == self.level:
+            self.column_stats.add_rows(col_names, rows)
+        return len(rows)
+
+    def annotate_df(self, df):
+        """Returns a DataFrame of output columns for a DataFrame of the level table.
+
+        Override this instead of annotate, and set df_mode = True, to process
+        the whole table as one Polars DataFrame. The returned DataFrame is
+        saved with save_df. If None is returned, nothing is saved.
+        """
+        _ = df
+        return None
+
+    def process_df(self):
+        from time import time
+        from ..exceptions import ConfigurationError
+        from ..util.run import update_status
+
+        if self.conf is None:
+            raise ConfigurationError()
+        self._open_db_connection()
+        if not self.dbconn or not self.level:
             return
-        c = self.dbconn.cursor()
-        output_columns = self.conf.get("output_columns", [])
-        for coldef in output_columns:
-            print(coldef)
-            col_name = f"{coldef['name']}"
-            ref_ids = df[ref_colname]
-            for ref_id in ref_ids:
-                value = df[ref_colname == ref_id, col_name]
-                q = f"update {level} set {col_name}=? where {ref_colname}=?"
-                c.execute(q, (value, ref_id))
-        self.dbconn.commit()
-        c.close()
+        start_time = time()
+        df = self.get_df(level=self.level, conn=self.dbconn)
+        if df is not None:
+            df = self.annotate_df(df)
+        if df is not None:
+            num_rows = self.save_df(df)
+            rate = num_rows / max(time() - start_time, 1e-6)
+            status = (
+                f"{self.conf['title']} ({self.module_name}): "
+                + f"wrote {num_rows} rows ({rate:.0f} rows/s)"
+            )
+            update_status(status, logger=self.logger, serveradmindb=self.serveradmindb)
+        self._close_db_connection()
 
     def run(self):
         from time import time, asctime, localtime
@@ -363,7 +444,10 @@ class BasePostAggregator(object):
         self.table_headers = {}
         self.setup_input_columns()
         self.setup_output_columns()
-        self.process_file()
+        if self.df_mode:
+            self.process_df()
+        else:
+            self.process_file()
         self.fill_categories()
         if self.dbconn:
             self.dbconn.commit()
@@ -377,6 +461,7 @@ class BasePostAggregator(object):
         update_status(status, logger=self.logger, serveradmindb=self.serveradmindb)
 
     def process_file(self):
+        from time import time
         from ..exceptions import ConfigurationError
         from ..util.run import update_status
 
@@ -386,6 +471,7 @@ class BasePostAggregator(object):
         if not self.dbconn or not self.cursor_w:
             return
         lnum = 0
+        start_time = time()
         self.cursor_w.execute("begin")
         for input_data in self._get_input():
             try:
@@ -396,8 +482,11 @@ class BasePostAggregator(object):
                 self.write_output(output_dict, input_data=input_data)
                 lnum += 1
                 if lnum % 100000 == 0:
+                    self.flush_output()
+                    rate = lnum / max(time() - start_time, 1e-6)
                     status = (
-                        f"Running {self.conf['title']} ({self.module_name}): row {lnum}"
+                        f"Running {self.conf['title']} ({self.module_name}): "
+                        + f"row {lnum} ({rate:.0f} rows/s)"
                     )
                     update_status(
                         status, logger=self.logger, serveradmindb=self.serveradmindb
@@ -406,7 +495,14 @@ class BasePostAggregator(object):
                     self.cursor_w.execute("begin")
             except Exception as e:
                 self._log_runtime_exception(input_data, e)
+        self.flush_output()
         self.cursor_w.execute("commit")
+        rate = lnum / max(time() - start_time, 1e-6)
+        status = (
+            f"{self.conf['title']} ({self.module_name}): "
+            + f"wrote {lnum} rows ({rate:.0f} rows/s)"
+        )
+        update_status(status, logger=self.logger, serveradmindb=self.serveradmindb)
         self._close_db_connection()
 
     def postprocess(self):
@@ -426,19 +522,29 @@ class BasePostAggregator(object):
         self.cursor_w.execute("begin")
         for col_d in self.conf.get("output_columns", []):
             col_def = ColumnDefinition(col_d)
-            if col_def.category not in ["single", "multi"]:
-                continue
             col_name = col_def.name
-            q = "select distinct {} from {}".format(col_name, self.level)
-            self.cursor.execute(q)
-            col_cats = []
-            for r in self.cursor:
-                col_cat_str = r[0] if r[0] is not None else ""
-                for col_cat in col_cat_str.split(";"):
-                    if col_cat not in col_cats:
-                        col_cats.append(col_cat)
-            col_cats.sort()
-            col_def.categories = col_cats
+            stats = self.column_stats.get_stats(col_name)
+            # Modules which write with their own queries leave no statistics.
+            collected = stats is not None and stats["count"] > 0
+            if stats is not None and collected:
+                col_def.set_stats(stats)
+            if col_def.category in ["single", "multi"]:
+                col_cats = set()
+                if collected:
+                    col_cats.update(self.column_stats.get_categories(col_name) or [])
+                    q = f"select 1 from {self.level} where {col_name} is null limit 1"
+                    self.cursor.execute(q)
+                    if self.cursor.fetchone():
+                        col_cats.add("")
+                else:
+                    q = "select distinct {} from {}".format(col_name, self.level)
+                    self.cursor.execute(q)
+                    for r in self.cursor:
+                        col_cat_str = r[0] if r[0] is not None else ""
+                        col_cats.update(col_cat_str.split(";"))
+                col_def.set_categories(sorted(col_cats))
+            elif not collected:
+                continue
             q = "update {}_header set col_def=? where col_name=?".format(self.level)
             self.cursor_w.execute(q, [col_def.get_json(), col_def.name])
         self.cursor_w.execute("commit")
@@ -456,7 +562,7 @@ class BasePostAggregator(object):
         if self.level is None or self.cursor is None or self.cursor_w is None:
             raise SetupError()
         vals = []
-        set_strs = []
+        col_names = []
         for col_def in self.conf.get("output_columns", []):
             col_name = col_def["name"]
             shortcol_name = col_name.split("__")[1]
@@ -465,28 +571,127 @@ class BasePostAggregator(object):
                 if val is None:
                     continue
                 vals.append(val)
-                set_strs.append(f"{col_name}=?")
+                col_names.append(col_name)
         if len(vals) == 0:
             return
-        set_str = ", ".join(set_strs)
-        q = f"update {self.level} set {set_str} where "
         if self.levelno == VARIANT:
-            q += "base__uid=?"
             if input_data:
-                vals.append(input_data["base__uid"])
+                ref_id = input_data["base__uid"]
             elif base__uid:
-                vals.append(base__uid)
+                ref_id = base__uid
             else:
                 return
         elif self.levelno == GENE:
-            q += "base__hugo=?"
             if input_data:
-                vals.append(input_data["base__hugo"])
+                ref_id = input_data["base__hugo"]
             elif base__hugo:
-                vals.append(base__hugo)
+                ref_id = base__hugo
             else:
                 return
-        self.cursor_w.execute(q, vals)
+        else:
+            return
+        # A second update of the same row has to land after the first one.
+        if ref_id in self.pending_ref_ids:
+            self.flush_output()
+        vals.append(ref_id)
+        self.pending_ref_ids.add(ref_id)
+        self.pending_updates.setdefault(tuple(col_names), []).append(vals)
+        if len(self.pending_ref_ids) >= self.write_batch_size:
+            self.flush_output()
+
+    def get_ref_col_name(self) -> str:
+        from ..consts import GENE
+
+        if self.levelno == GENE:
+            return "base__hugo"
+        return "base__uid"
+
+    def flush_output(self):
+        from ..exceptions import SetupError
+
+        if not self.pending_updates:
+            return
+        if self.level is None or self.cursor_w is None:
+            raise SetupError()
+        ref_col_name = self.get_ref_col_name()
+        for col_names, rows in self.pending_updates.items():
+            set_str = ", ".join([f"{col_name}=?" for col_name in col_names])
+            q = f"update {self.level} set {set_str} where {ref_col_name}=?"
+            try:
+                if self.staged_write:
+                    self.write_staged_output(col_names, rows)
+                else:
+                    self.cursor_w.executemany(q, rows)
+            except Exception:
+                # Retry one row at a time so that only the bad rows are lost.
+                written_rows = []
+                for row in rows:
+                    try:
+                        self.cursor_w.execute(q, row)
+                        written_rows.append(row)
+                    except Exception as e:
+                        self._log_runtime_exception({ref_col_name: row[-1]}, e)
+                rows = written_rows
+            self.column_stats.add_rows(list(col_names), rows)
+        self.pending_updates = {}
+        self.pending_ref_ids = set()
+
+    def write_staged_output(
+        self,
+        col_names,
+        rows,
+        level: Optional[str] = None,
+        ref_col_name: Optional[str] = None,
+    ):
+        from sqlite3 import sqlite_version_info
+        from ..exceptions import SetupError
+
+        if not level:
+            level = self.level
+        if not ref_col_name:
+            ref_col_name = self.get_ref_col_name()
+        if level is None or self.cursor_w is None:
+            raise SetupError()
+        staging_name = "postaggregator_staging"
+        table_name = f"temp.{staging_name}"
+        self.cursor_w.execute(f"drop table if exists {table_name}")
+        # Copies the column types of the level table so that the staging
+        # columns compare with the same affinity and the index can be used.
+        self.cursor_w.execute(
+            f"create table {table_name} as select {', '.join(col_names)}, "
+            + f"{ref_col_name} as _ref_id from {level} limit 0"
+        )
+        q = (
+            f"insert into {table_name} values "
+            + f"({', '.join(['?'] * (len(col_names) + 1))})"
+        )
+        self.cursor_w.executemany(q, rows)
+        # update ... from is available from SQLite 3.33.0.
+        if self.update_from and sqlite_version_info >= (3, 33, 0):
+            set_str = ", ".join(
+                [f"{col_name}=s.{col_name}" for col_name in col_names]
+            )
+            q = (
+                f"update {level} set {set_str} from {table_name} as s"
+                + f" where {level}.{ref_col_name}=s._ref_id"
+            )
+        else:
+            self.cursor_w.execute(
+                f"create index {table_name}_idx on {staging_name} (_ref_id)"
+            )
+            set_str = ", ".join(
+                [
+                    f"{col_name}=(select s.{col_name} from {table_name} as s"
+                    + f" where s._ref_id={level}.{ref_col_name})"
+                    for col_name in col_names
+                ]
+            )
+            q = (
+                f"update {level} set {set_str} where {ref_col_name} in"
+                + f" (select _ref_id from {table_name})"
+            )
+        self.cursor_w.execute(q)
+        self.cursor_w.execute(f"drop table {table_name}")
 
     def _log_runtime_exception(self, input_data, e):
         import traceback
@@ -548,6 +753,8 @@ class BasePostAggregator(object):
         self._close_db_connection()
 
     def _close_db_connection(self):
+        if self.pending_updates and self.cursor_w is not None:
+            self.flush_output()
         if self.cursor is not None:
             try:
                 self.cursor.close()
@@ -731,6 +938,11 @@ class BasePostAggregator(object):
         column_names = [row[1] for row in c.fetchall()]
         return column_names
 
+    def get_input_column_names(self, table_name: str, columns: str) -> List[str]:
+        if columns == "*":
+            return self.get_column_names_of_table(table_name)
+        return [column_name.strip() for column_name in columns.split(",")]
+
     def _get_input(self):
         from ..exceptions import SetupError
         from ..consts import VARIANT
@@ -742,45 +954,130 @@ class BasePostAggregator(object):
         self.c_gen = self.dbconn.cursor()
         self.make_queries()
         if self.levelno == VARIANT and self.q_v:
-            self.c_var.execute(self.q_v)
             cursor = self.c_var
+            rows = self._get_variant_input(cursor)
         elif self.levelno == GENE and self.q_g:
-            self.c_gen.execute(self.q_g)
             cursor = self.c_gen
+            rows = self._get_gene_input(cursor)
         else:
             raise
-        col_names_gen = self.get_column_names_of_table("gene")
-        for row in cursor:
-            try:
-                input_data = {}
-                for i in range(len(row)):
-                    input_data[cursor.description[i][0]] = row[i]
-                if self.levelno == VARIANT and self.q_g and self.columns_g:
-                    if input_data["base__hugo"] is None:
-                        for col_name in col_names_gen:
-                            input_data[col_name] = None
-                    else:
-                        self.c_gen.execute(self.q_g, (input_data["base__hugo"],))
-                        for gen_row in self.c_gen:
-                            for i in range(len(gen_row)):
-                                input_data[self.c_gen.description[i][0]] = gen_row[i]
-                            break  # only 1 row should be returned.
-                elif self.levelno == GENE and self.q_v and self.columns_v:
-                    for column_name in self.columns_v:
-                        input_data[column_name] = []
-                    self.c_var.execute(self.q_v, (input_data["base__hugo"],))
-                    for var_row in self.c_var:
-                        for i in range(len(var_row)):
-                            input_data[self.c_var.description[i][0]].append(var_row[i])
-                yield input_data
-            except Exception as e:
-                self._log_runtime_exception(row, e)
+        for input_data in rows:
+            yield input_data
         cursor.close()
         if self.c_var:
             self.c_var.close()
         if self.c_gen:
             self.c_gen.close()
 
+    def _get_variant_input(self, cursor):
+        from ..exceptions import SetupError
+
+        if not self.from_v or not self.columns_v:
+            raise SetupError()
+        col_names_v = self.get_input_column_names(self.from_v, self.columns_v)
+        select_cols = [f"{self.from_v}.{col_name}" for col_name in col_names_v]
+        col_names_g = []
+        join_gene = False
+        if self.q_g and self.from_g and self.columns_g:
+            join_gene = True
+            col_names_g = self.get_input_column_names(self.from_g, self.columns_g)
+            select_cols.extend(
+                [f"{self.from_g}.{col_name}" for col_name in col_names_g]
+            )
+            # marks whether a gene row matched the variant.
+            select_cols.append(f"{self.from_g}.rowid")
+        q = f"select {', '.join(select_cols)} from {self.from_v}"
+        if join_gene:
+            q += (
+                f" left join {self.from_g}"
+                + f" on {self.from_g}.base__hugo={self.from_v}.base__hugo"
+            )
+        if self.where_v:
+            q += f" where {self.where_v}"
+        # Gene values override variant values of the same column name, as
+        # later keys win in dict construction. The trailing rowid is dropped
+        # by zip.
+        col_names = col_names_v + col_names_g
+        null_gene_data = dict.fromkeys(self.get_column_names_of_table("gene"))
+        cursor.execute(q)
+        for row in cursor:
+            try:
+                if not join_gene:
+                    input_data = dict(zip(col_names_v, row))
+                elif row[-1] is not None:
+                    input_data = dict(zip(col_names, row))
+                else:
+                    input_data = dict(zip(col_names_v, row))
+                    if input_data["base__hugo"] is None:
+                        input_data.update(null_gene_data)
+            except Exception as e:
+                self._log_runtime_exception(row, e)
+                continue
+            yield input_data
+
+    def _get_gene_input(self, cursor):
+        from ..exceptions import SetupError
+
+        if not self.from_g or not self.columns_g:
+            raise SetupError()
+        col_names_g = self.get_input_column_names(self.from_g, self.columns_g)
+        select_cols = [f"{self.from_g}.{col_name}" for col_name in col_names_g]
+        col_names_v = []
+        if self.q_v and self.from_v and self.columns_v:
+            # base__hugo is the grouping key and stays a single value.
+            col_names_v = [
+                col_name
+                for col_name in self.get_input_column_names(
+                    self.from_v, self.columns_v
+                )
+                if col_name != "base__hugo"
+            ]
+        join_variant = len(col_names_v) > 0
+        q = f"select {', '.join(select_cols)}"
+        if join_variant:
+            q += ", " + ", ".join(
+                [f"{self.from_v}.{col_name}" for col_name in col_names_v]
+            )
+            q += f", {self.from_g}.rowid, {self.from_v}.rowid"
+        q += f" from {self.from_g}"
+        if join_variant:
+            q += (
+                f" left join {self.from_v}"
+                + f" on {self.from_v}.base__hugo={self.from_g}.base__hugo"
+            )
+        if self.where_g:
+            q += f" where {self.where_g}"
+        if join_variant:
+            q += f" order by {self.from_g}.rowid, {self.from_v}.base__uid"
+        cursor.execute(q)
+        if not join_variant:
+            for row in cursor:
+                yield dict(zip(col_names_g, row))
+            return
+        num_cols_g = len(col_names_g)
+        num_cols_v = len(col_names_v)
+        input_data = None
+        var_lists = []
+        gene_rowid = None
+        for row in cursor:
+            try:
+                if row[-2] != gene_rowid:
+                    if input_data is not None:
+                        yield input_data
+                    gene_rowid = row[-2]
+                    input_data = dict(zip(col_names_g, row))
+                    var_lists = [[] for _ in range(num_cols_v)]
+                    input_data.update(zip(col_names_v, var_lists))
+                if row[-1] is not None:
+                    for var_list, value in zip(
+                        var_lists, row[num_cols_g : num_cols_g + num_cols_v]
+                    ):
+                        var_list.append(value)
+            except Exception as e:
+                self._log_runtime_exception(row, e)
+        if input_data is not None:
+            yield input_data
+
     def annotate(self, input_data) -> Optional[Dict[str, Any]]:
         _ = input_data
         raise NotImplementedError()
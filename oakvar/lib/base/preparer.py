@@ -135,6 +135,7 @@ class BasePreparer(object):
     def setup_io(self):
         from ..util.inout import FileReader
         from ..util.inout import FileWriter
+        from ..system import get_intermediate_format
         from ..exceptions import SetupError
 
         if (
@@ -144,7 +145,7 @@ class BasePreparer(object):
         ):
             raise SetupError()
         self.reader = FileReader(self.input_path)
-        self.writer = FileWriter(self.output_path)
+        self.writer = FileWriter(self.output_path, fmt=get_intermediate_format())
 
     def open_output_files(self):
         from ..exceptions import SetupError
@@ -48,6 +48,7 @@
 from typing import Any
 from typing import List
 from typing import Optional
+from typing import Tuple
 from pathlib import Path
 
 REPORT_FILTER_DB_NAME = "report_filter"
@@ -58,6 +59,11 @@ GENE_TO_FILTER_TABLE_NAME = "fgenegiven"
 REPORT_FILTER_IN_PROGRESS = "in_progress"
 REPORT_FILTER_READY = "ready"
 REPORT_FILTER_NOT_NEEDED = "not_needed"
+REPORT_FILTER_CONN_IDLE_TIMEOUT = 60  # seconds
+REPORT_FILTER_BUILD_TIMEOUT = 900  # seconds without progress
+REPORT_FILTER_POLL_INTERVAL = 0.5  # seconds
+REPORT_FILTER_WAIT = "wait"
+REPORT_FILTER_BUILD = "build"
 REF_COL_NAMES = {
     "variant": "base__uid",
     "gene": "base__hugo",
@@ -289,22 +295,65 @@ class ReportFilter:
                 self.filterpath = filterpath
         self.uid = uid
         self.user = self.escape_user(user)
+        self.idle_db_conns: List[Tuple[str, Any, Any, float]] = []
 
     async def exec_db(self, func, *args, **kwargs) -> Any:
-        conn_read, conn_write = await self.get_db_conns()
+        conn_read, conn_write = await self.acquire_db_conns()
         if not conn_read or not conn_write:
             return None
-        cursor_read = await conn_read.cursor()
-        cursor_write = await conn_write.cursor()
-        ret = await func(
-            *args, cursor_read=cursor_read, cursor_write=cursor_write, **kwargs
-        )
-        await cursor_read.close()
-        await cursor_write.close()
-        await conn_read.close()
-        await conn_write.close()
+        try:
+            cursor_read = await conn_read.cursor()
+            cursor_write = await conn_write.cursor()
+            ret = await func(
+                *args, cursor_read=cursor_read, cursor_write=cursor_write, **kwargs
+            )
+            await cursor_read.close()
+            await cursor_write.close()
+            if conn_write.in_transaction:
+                await conn_write.commit()
+        except BaseException:
+            await conn_read.close()
+            await conn_write.close()
+            raise
+        await self.release_db_conns(conn_read, conn_write)
         return ret
 
+    async def acquire_db_conns(self):
+        """Returns an idle pair of read and write connections to self.dbpath,
+        or a new pair if there is none. Idle pairs which were not used for
+        REPORT_FILTER_CONN_IDLE_TIMEOUT seconds are closed."""
+        from time import time
+
+        now = time()
+        conns = None
+        idle_db_conns = []
+        for dbpath, conn_read, conn_write, last_used in self.idle_db_conns:
+            if (
+                dbpath != self.dbpath
+                or now - last_used > REPORT_FILTER_CONN_IDLE_TIMEOUT
+            ):
+                await conn_read.close()
+                await conn_write.close()
+            elif conns is None:
+                conns = (conn_read, conn_write)
+            else:
+                idle_db_conns.append((dbpath, conn_read, conn_write, last_used))
+        self.idle_db_conns = idle_db_conns
+        if conns:
+            return conns
+        return await self.get_db_conns()
+
+    async def release_db_conns(self, conn_read, conn_write):
+        """Returns a pair of connections from acquire_db_conns to the idle pool.
+        Uncommitted changes are rolled back as closing the connections would."""
+        from time import time
+
+        if conn_read.in_transaction:
+            await conn_read.rollback()
+        if conn_write.in_transaction:
+            await conn_write.rollback()
+        self.idle_db_conns.append((self.dbpath, conn_read, conn_write, time()))
+
     async def second_init(self):
         if self.mode == "sub":
             if self.dbpath is not None:
@@ -421,9 +470,27 @@ class ReportFilter:
         q = (
             f"create table if not exists {REPORT_FILTER_DB_NAME}."
             + f"{REPORT_FILTER_REGISTRY_NAME} ( uid int primary key, "
-            + "user text, dbpath text, filterjson text, status text )"
+            + "user text, dbpath text, filterjson text, status text, "
+            + "variant_num_rows int, gene_num_rows int, dbsignature text, "
+            + "updated_at real )"
         )
         await cursor.execute(q)
+        # registries made by older versions do not have the later columns.
+        q = f"pragma {REPORT_FILTER_DB_NAME}.table_info({REPORT_FILTER_REGISTRY_NAME})"
+        await cursor.execute(q)
+        col_names = [row[1] for row in await cursor.fetchall()]
+        for col_name, col_type in [
+            ("variant_num_rows", "int"),
+            ("gene_num_rows", "int"),
+            ("dbsignature", "text"),
+            ("updated_at", "real"),
+        ]:
+            if col_name not in col_names:
+                q = (
+                    f"alter table {self.get_registry_table_name()} "
+                    + f"add column {col_name} {col_type}"
+                )
+                await cursor.execute(q)
         await conn.commit()
         await cursor.close()
 
@@ -464,7 +531,10 @@ class ReportFilter:
             self.dbpath = abspath(dbpath)
 
     async def close_db(self):
-        return
+        for _, conn_read, conn_write, _ in self.idle_db_conns:
+            await conn_read.close()
+            await conn_write.close()
+        self.idle_db_conns = []
 
     async def filtertable_exists(self, cursor_read=Any, cursor_write=Any):
         _ = cursor_write
@@ -669,9 +739,6 @@ class ReportFilter:
         gene_to_filter=None,
         sample_to_filter=None,
     ):
-        conn_read, conn_write = await self.get_db_conns()
-        if not conn_read or not conn_write:
-            return
         _ = cursor_read
         if sample_to_filter:
             table_name = self.get_sample_to_filter_table_name(uid=uid)
@@ -685,16 +752,10 @@ class ReportFilter:
                 return
             q = f"drop table if exists {table_name}"
             await cursor_write.execute(q)  # type: ignore
-        await conn_write.commit()
-        await conn_read.close()
-        await conn_write.close()
 
     async def make_sample_to_filter_table(
         self, uid=None, req=None, rej=None, cursor_read=Any, cursor_write=Any
     ):
-        conn_read, conn_write = await self.get_db_conns()
-        if not conn_read or not conn_write:
-            return
         _ = cursor_read
         if uid is None or (not req and not rej):
             return
@@ -703,7 +764,6 @@ class ReportFilter:
             return
         q = f"drop table if exists {table_name}"
         await cursor_write.execute(q)  # type: ignore
-        await conn_write.commit()
         q = f"create table {table_name} as select distinct base__uid from main.sample"
         if req:
             req_s = ", ".join([f'"{sid}"' for sid in req])
@@ -715,39 +775,32 @@ class ReportFilter:
                 + f"base__sample_id in ({rej_s})"
             )
         await cursor_write.execute(q)  # type: ignore
-        await conn_write.commit()
-        await conn_read.close()
-        await conn_write.close()
 
     async def get_existing_report_filter_status(
         self, cursor_read=Any, cursor_write=Any
     ):
         from json import dumps
 
-        conn_read, conn_write = await self.get_db_conns()
-        if not conn_read or not conn_write:
-            return
         _ = cursor_write
         if not self.filter or not self.dbpath or not cursor_read:
-            await conn_read.close()
-            await conn_write.close()
             return None
         filterjson = dumps(self.filter)
         tablename = self.get_registry_table_name()
         q = (
-            f"select uid, status from {tablename} where "
+            f"select uid, status, dbsignature, updated_at from {tablename} where "
             + "user=? and dbpath=? and filterjson=?"
         )
         await cursor_read.execute(q, (self.user, self.dbpath, filterjson))  # type: ignore
         ret = await cursor_read.fetchone()  # type: ignore
         if not ret:
-            await conn_read.close()
-            await conn_write.close()
             return None
-        [uid, status] = ret
-        await conn_read.close()
-        await conn_write.close()
-        return {"uid": uid, "status": status}
+        [uid, status, dbsignature, updated_at] = ret
+        return {
+            "uid": uid,
+            "status": status,
+            "dbsignature": dbsignature,
+            "updated_at": updated_at,
+        }
 
     async def get_report_filter_count(self, cursor=Any):
         tablename = self.get_registry_table_name()
@@ -845,23 +898,70 @@ class ReportFilter:
         self, uid: int, cursor_read=Any, cursor_write=Any
     ):
         from json import dumps
+        from time import time
+        from ..util.util import get_db_file_signature
 
-        conn_read, conn_write = await self.get_db_conns()
-        if not conn_read or not conn_write:
-            return
         _ = cursor_read
         filterjson = dumps(self.filter)
         q = (
             f"insert or replace into {REPORT_FILTER_DB_NAME}."
             + f"{REPORT_FILTER_REGISTRY_NAME} ( uid, user, dbpath, "
-            + "filterjson, status) values (?, ?, ?, ?, ?)"
+            + "filterjson, status, dbsignature, updated_at) "
+            + "values (?, ?, ?, ?, ?, ?, ?)"
         )
         await cursor_write.execute(  # type: ignore
-            q, (uid, self.user, self.dbpath, filterjson, REPORT_FILTER_IN_PROGRESS)
+            q,
+            (
+                uid,
+                self.user,
+                self.dbpath,
+                filterjson,
+                REPORT_FILTER_IN_PROGRESS,
+                get_db_file_signature(self.dbpath),
+                time(),
+            ),
+        )
+
+    async def claim_report_filter(self, cursor_read=Any, cursor_write=Any):
+        """Decides what to do with the filter tables of self.filter.
+
+        Returns [REPORT_FILTER_READY, uid] if tables made from the current
+        result database exist, [REPORT_FILTER_WAIT, uid] if another caller is
+        building them, and [REPORT_FILTER_BUILD, uid] if the caller should
+        build them under uid. The decision and the registration are done in
+        one write transaction, so only one caller builds a filter at a time.
+        A build which made no progress for REPORT_FILTER_BUILD_TIMEOUT seconds
+        is taken as abandoned and taken over."""
+        from time import time
+        from ..util.util import get_db_file_signature
+
+        _ = cursor_read
+        await cursor_write.execute("begin immediate")  # type: ignore
+        ret = await self.get_existing_report_filter_status(
+            cursor_read=cursor_write, cursor_write=cursor_write
+        )
+        if ret and ret["status"] == REPORT_FILTER_READY:
+            # a job rerun into the same path replaces the result database.
+            if ret["dbsignature"] == get_db_file_signature(self.dbpath):
+                return [REPORT_FILTER_READY, ret["uid"]]
+        elif ret and ret["status"] == REPORT_FILTER_IN_PROGRESS:
+            updated_at = ret["updated_at"] or 0
+            if time() - updated_at < REPORT_FILTER_BUILD_TIMEOUT:
+                return [REPORT_FILTER_WAIT, ret["uid"]]
+        if ret:
+            uid = ret["uid"]
+        else:
+            [uid, delete_uids] = await self.get_new_report_filter_uid(
+                cursor_read=cursor_write, cursor_write=cursor_write
+            )
+            if delete_uids:
+                await self.remove_ftables(
+                    delete_uids, cursor_read=cursor_write, cursor_write=cursor_write
+                )
+        await self.register_new_report_filter(
+            uid, cursor_read=cursor_write, cursor_write=cursor_write
         )
-        await conn_write.commit()
-        await conn_read.close()
-        await conn_write.close()
+        return [REPORT_FILTER_BUILD, uid]
 
     def should_bypass_filter(self):
         return (
@@ -911,9 +1011,6 @@ class ReportFilter:
         cursor_read=Any,
         cursor_write=Any,
     ):
-        conn_read, conn_write = await self.get_db_conns()
-        if not conn_read or not conn_write:
-            return
         _ = cursor_read
         if uid is None:
             return
@@ -921,16 +1018,11 @@ class ReportFilter:
         q = self.get_fvariant_sql(
             uid=uid, gene_to_filter=gene_to_filter, sample_to_filter=sample_to_filter
         )
-        q = f"create table {table_name} as {q}"
+        # rowids of the table follow base__uid, for get_level_data_iterator.
+        q = f"create table {table_name} as {q} order by v.base__uid"
         await cursor_write.execute(q)  # type: ignore
-        await conn_write.commit()
-        await conn_read.close()
-        await conn_write.close()
 
     async def populate_fgene(self, uid=None, cursor_read=Any, cursor_write=Any):
-        conn_read, conn_write = await self.get_db_conns()
-        if not conn_read or not conn_write:
-            return
         if uid is None:
             return
         _ = cursor_read
@@ -939,12 +1031,10 @@ class ReportFilter:
         q = (
             f"create table {table_name} as select distinct v.base__hugo "
             + f"from main.variant as v inner join {fvariant} as vf on "
-            + "vf.base__uid=v.base__uid where v.base__hugo is not null"
+            + "vf.base__uid=v.base__uid where v.base__hugo is not null "
+            + "order by v.base__hugo"
         )
         await cursor_write.execute(q)  # type: ignore
-        await conn_write.commit()
-        await conn_read.close()
-        await conn_write.close()
 
     async def make_fvariant(self, uid=None, sample_to_filter=None, gene_to_filter=None):
         if uid is None:
@@ -966,23 +1056,16 @@ class ReportFilter:
     async def set_registry_status(
         self, uid=None, status=None, cursor_read=Any, cursor_write=Any
     ):
-        conn_read, conn_write = await self.get_db_conns()
-        if not conn_read or not conn_write:
-            return
+        from time import time
+
         _ = cursor_read
         if uid is None or not status:
             return
         table_name = self.get_registry_table_name()
-        q = f"update {table_name} set status=?"
-        await cursor_write.execute(q, (status,))  # type: ignore
-        await conn_write.commit()
-        await conn_read.close()
-        await conn_write.close()
+        q = f"update {table_name} set status=?, updated_at=? where uid=?"
+        await cursor_write.execute(q, (status, time(), uid))  # type: ignore
 
     async def remove_ftables(self, uids, cursor_read=Any, cursor_write=Any):
-        conn_read, conn_write = await self.get_db_conns()
-        if not conn_read or not conn_write:
-            return
         _ = cursor_read
         if isinstance(uids, int):
             uids = [uids]
@@ -993,47 +1076,37 @@ class ReportFilter:
                 await cursor_write.execute(q)  # type: ignore
             q = f"delete from {tablename} where uid=?"
             await cursor_write.execute(q, (uid,))  # type: ignore
-        await conn_write.commit()
-        await conn_read.commit()
-        await conn_read.close()
-        await conn_write.close()
 
     async def drop_ftable(
         self, uid=None, ftype=None, cursor_read=Any, cursor_write=Any
     ):
-        conn_read, conn_write = await self.get_db_conns()
-        if not conn_read or not conn_write:
-            return
         if not ftype or uid is None:
             return
         _ = cursor_read
         table_name = self.get_ftable_name(uid=uid, ftype=ftype)
         q = f"drop table if exists {table_name}"
         await cursor_write.execute(q)  # type: ignore
-        await conn_write.commit()
-        await conn_read.close()
-        await conn_write.close()
 
     async def make_ftables(self):
         if self.should_bypass_filter():
             return None
         if not self.filter and not self.filtersql:
             return {"uid": None, "status": REPORT_FILTER_NOT_NEEDED}
-        ret = await self.exec_db(self.get_existing_report_filter_status)
-        if ret:
-            self.uid = ret["uid"]
-            return ret
-        ret = await self.exec_db(self.get_new_report_filter_uid)
-        if not ret:
-            return None
-        [uid, delete_uids] = ret
-        if delete_uids:
-            for delete_uid in delete_uids:
-                await self.exec_db(self.remove_ftables, delete_uid)
+        from asyncio import sleep
+
+        while True:
+            ret = await self.exec_db(self.claim_report_filter)
+            if not ret:
+                return None
+            [action, uid] = ret
+            if action == REPORT_FILTER_READY:
+                self.uid = uid
+                return {"uid": uid, "status": REPORT_FILTER_READY}
+            if action == REPORT_FILTER_BUILD:
+                break
+            await sleep(REPORT_FILTER_POLL_INTERVAL)
         self.uid = uid
         try:
-            # register
-            await self.exec_db(self.register_new_report_filter, uid=uid)
             # samples to filter
             sample_to_filter = self.get_sample_to_filter()
             if sample_to_filter:
@@ -1050,7 +1123,12 @@ class ReportFilter:
                 sample_to_filter=sample_to_filter,
                 gene_to_filter=gene_to_filter,
             )
+            # tells waiting callers that the build is still alive.
+            await self.exec_db(
+                self.set_registry_status, uid=uid, status=REPORT_FILTER_IN_PROGRESS
+            )
             await self.make_fgene(uid=uid)
+            await self.exec_db(self.store_ftable_num_rows, uid=uid)
             await self.exec_db(
                 self.remove_temporary_tables,
                 uid=uid,
@@ -1090,15 +1168,52 @@ class ReportFilter:
             ret = True
         return ret
 
+    async def store_ftable_num_rows(
+        self, uid=None, cursor_read=Any, cursor_write=Any
+    ):
+        if uid is None:
+            return
+        table_name = self.get_registry_table_name()
+        for ftype in ["variant", "gene"]:
+            ftable_name = self.get_ftable_name(uid=uid, ftype=ftype)
+            if not await self.filter_table_exists(ftable_name, cursor=cursor_read):
+                continue
+            q = f"select count(*) from {ftable_name}"
+            await cursor_read.execute(q)  # type: ignore
+            ret = await cursor_read.fetchone()  # type: ignore
+            q = f"update {table_name} set {ftype}_num_rows=? where uid=?"
+            await cursor_write.execute(q, (ret[0], uid))  # type: ignore
+
+    async def get_stored_ftable_num_rows(
+        self, uid=None, ftype=None, cursor_read=Any, cursor_write=Any
+    ) -> Optional[int]:
+        _ = cursor_write
+        if uid is None or ftype not in ["variant", "gene"]:
+            return None
+        table_name = self.get_registry_table_name()
+        q = f"select {ftype}_num_rows from {table_name} where uid=?"
+        await cursor_read.execute(q, (uid,))  # type: ignore
+        ret = await cursor_read.fetchone()  # type: ignore
+        if not ret:
+            return None
+        return ret[0]
+
     async def get_ftable_num_rows(
         self, level=None, uid=None, ftype=None, cursor_read=Any, cursor_write=Any
     ):
-        _ = cursor_write
         if not level or not ftype:
             return
         ftable_name = self.get_ftable_name(uid=uid, ftype=ftype)
         if ftable_name:
             if await self.filter_table_exists(ftable_name, cursor=cursor_read) is True:
+                num_rows = await self.get_stored_ftable_num_rows(
+                    uid=uid,
+                    ftype=ftype,
+                    cursor_read=cursor_read,
+                    cursor_write=cursor_write,
+                )
+                if num_rows is not None:
+                    return num_rows
                 q = f"select count(*) from {ftable_name}"
             else:
                 q = f"select count(*) from main.{level}"
@@ -1136,10 +1251,12 @@ class ReportFilter:
             q = f"select d.*,{','.join(gene_level_cols)} from main.{level} as d left join main.gene as g on d.base__hugo=g.base__hugo"
         else:
             q = f"select d.* from main.{level} as d"
+        keyset_paging = False
         if uid is not None:
             ftable = self.get_ftable_name(uid=uid, ftype=level)
             if await self.filter_table_exists(ftable, cursor=cursor_read):
                 q += f" join {ftable} as f on d.{ref_col_name}=f.{ref_col_name}"
+                keyset_paging = True
             if level == "sample":
                 fvariant = self.get_ftable_name(uid=uid, ftype="variant")
                 if await self.filter_table_exists(fvariant, cursor=cursor_read):
@@ -1153,7 +1270,12 @@ class ReportFilter:
                     q += f" join {fvariant} as vf on d.base__uid=vf.base__uid"
         if page and pagesize:
             offset = (page - 1) * pagesize
-            q += f" limit {pagesize} offset {offset}"
+            if keyset_paging:
+                # ftable rowids run from 1 in ref_col_name order, so a page
+                # starts with a rowid lookup instead of skipping offset rows.
+                q += f" where f.rowid>{offset} order by f.rowid limit {pagesize}"
+            else:
+                q += f" limit {pagesize} offset {offset}"
         elif head_n is not None:
             q += f" limit {head_n}"
         await cursor_read.execute(q)
@@ -52,6 +52,25 @@ from typing import Dict
 from typing import List
 from pathlib import Path
 
+# Attributes made by make_col_infos
+COL_INFO_ATTRS = [
+    "colinfo",
+    "columns",
+    "colnos",
+    "colcount",
+    "columngroups",
+    "colnames_to_display",
+    "cols_to_display",
+    "colnos_to_display",
+    "display_select_columns",
+    "column_subs",
+    "var_added_cols",
+    "mapper_name",
+    "modules_to_add_to_base",
+    "gene_summary_datas",
+    "summarizing_modules",
+]
+
 
 class BaseReporter:
     def __init__(
@@ -184,6 +203,9 @@ class BaseReporter:
         self.conns = []
         self.logtofile = logtofile
         self.dictrow: bool = True
+        self.fetch_size: int = 10000
+        self.row_transforms: Dict[str, Any] = {}
+        self.custom_row_processing = self.has_custom_row_processing()
         self.gene_summary_datas = {}
         self.total_norows: Optional[int] = None
         self.legacy_samples_col = False
@@ -367,20 +389,10 @@ class BaseReporter:
                 and sub.col == "all_mappings"
             ):
                 mappings = loads(value)
-                for gene in mappings:
-                    for i in range(len(mappings[gene])):
-                        sos = mappings[gene][i][2].split(",")
-                        sos = [sub.subs.get(so, so) for so in sos]
-                        mappings[gene][i][2] = ",".join(sos)
+                self.substitute_mapping_so(mappings, sub.subs)
                 value = dumps(mappings)
             elif level == "gene" and sub.module == "base" and sub.col == "all_so":
-                vals = []
-                for i, so_count in enumerate(value.split(",")):
-                    so = so_count[:3]
-                    so = sub.subs.get(so, so)
-                    so_count = so + so_count[3:]
-                    vals.append(so_count)
-                value = ",".join(vals)
+                value = self.substitute_so_counts(value, sub.subs)
             else:
                 value = sub.subs.get(value, value)
             if self.dictrow:
@@ -389,6 +401,126 @@ class BaseReporter:
                 row[idx] = value
         return row
 
+    def substitute_mapping_so(self, mappings, subs):
+        for gene in mappings:
+            for i in range(len(mappings[gene])):
+                sos = mappings[gene][i][2].split(",")
+                sos = [subs.get(so, so) for so in sos]
+                mappings[gene][i][2] = ",".join(sos)
+
+    def substitute_so_counts(self, value, subs):
+        vals = []
+        for so_count in value.split(","):
+            so = so_count[:3]
+            so = subs.get(so, so)
+            vals.append(so + so_count[3:])
+        return ",".join(vals)
+
+    def make_row_transform(self, level: str, datarow):
+        """Builds the post-processing of the rows of a level (report
+        substitutions, all_mappings stringification and newline escaping)
+        once, with column positions, substitution maps, and the columns to
+        escape resolved in advance.
+
+        Args:
+            level (str): Level of reporting
+            datarow: The first row of the level. Its keys are used as the
+                columns of every row if `self.dictrow` is `True`.
+
+        Returns:
+            A function which transforms a row in place.
+        """
+        from json import loads
+        from json import dumps
+
+        if self.dictrow:
+            col_keys = {col_name: col_name for col_name in datarow.keys()}
+        else:
+            col_keys = {
+                col_name: i
+                for i, col_name in enumerate(self.retrieved_col_names[level])
+            }
+        plain_subs = []
+        so_count_subs = []
+        mapping_subs = None
+        for sub in self.column_subs.get(level, []):
+            key = col_keys.get(f"{sub.module}__{sub.col}")
+            if key is None:
+                continue
+            if (
+                level == "variant"
+                and sub.module == "base"
+                and sub.col == "all_mappings"
+            ):
+                mapping_subs = sub.subs
+            elif level == "gene" and sub.module == "base" and sub.col == "all_so":
+                so_count_subs.append((key, sub.subs))
+            else:
+                plain_subs.append((key, sub.subs))
+        mapping_key = None
+        stringify = False
+        if level == "variant":
+            mapping_key = col_keys.get("base__all_mappings")
+            stringify = not hasattr(self, "keep_json_all_mapping")
+        numeric_col_names = {
+            col["col_name"]
+            for col in self.colinfo.get(level, {}).get("columns", [])
+            if col.get("col_type") in ["int", "float"]
+        }
+        escape_keys = [
+            key
+            for col_name, key in col_keys.items()
+            if col_name not in numeric_col_names
+        ]
+        empty_values = [None, "", "{}"]
+
+        def transform(row):
+            for key, subs in plain_subs:
+                value = row[key]
+                if value in empty_values:
+                    continue
+                row[key] = subs.get(value, value)
+            for key, subs in so_count_subs:
+                value = row[key]
+                if value in empty_values:
+                    continue
+                row[key] = self.substitute_so_counts(value, subs)
+            if mapping_key is not None and (stringify or mapping_subs is not None):
+                value = row[mapping_key]
+                if value not in empty_values:
+                    mappings = loads(value)
+                    if mapping_subs is not None:
+                        self.substitute_mapping_so(mappings, mapping_subs)
+                    if stringify:
+                        row[mapping_key] = self.stringify_mappings(mappings)
+                    else:
+                        row[mapping_key] = dumps(mappings)
+                elif stringify and value == "{}":
+                    row[mapping_key] = ""
+            for key in escape_keys:
+                value = row[key]
+                if isinstance(value, str) and "\n" in value:
+                    row[key] = value.replace("\n", "%0A")
+            return row
+
+        return transform
+
+    def has_custom_row_processing(self) -> bool:
+        cls = type(self)
+        return (
+            cls.substitute_val is not BaseReporter.substitute_val
+            or cls.stringify_all_mapping is not BaseReporter.stringify_all_mapping
+            or cls.escape_characters is not BaseReporter.escape_characters
+        )
+
+    async def iter_data_rows(self, cursor_read):
+        while True:
+            datarows = await cursor_read.fetchmany(self.fetch_size)
+            if not datarows:
+                break
+            for datarow in datarows:
+                yield datarow
+
     def get_extracted_header_columns(self, level):
         cols = []
         if level in self.colinfo:
@@ -502,11 +634,6 @@ class BaseReporter:
         make_col_categories: bool = False,
         user=None,
     ):
-        from ..exceptions import SetupError
-        from time import time
-        from time import asctime
-        from time import localtime
-        from ..util.run import update_status
         from ..system.consts import DEFAULT_SERVER_DEFAULT_USERNAME
 
         if user is None:
@@ -516,20 +643,7 @@ class BaseReporter:
             add_summary = False
             if add_summary is None:
                 add_summary = self.add_summary
-            await self.prep()
-            if not self.cf:
-                raise SetupError(self.module_name)
-            self.start_time = time()
-            ret = None
-            tab = tab or self.level or "all"
-            self.log_run_start()
-            if self.setup() is False:
-                await self.close_db()
-                raise SetupError(self.module_name)
-            self.ftable_uid = await self.cf.make_ftables_and_ftable_uid(
-                make_filtered_table=make_filtered_table
-            )
-            self.levels = await self.get_levels_to_run(tab)
+            await self.start_run(tab=tab, make_filtered_table=make_filtered_table)
             for level in self.levels:
                 self.level = level
                 await self.make_col_infos(
@@ -544,18 +658,7 @@ class BaseReporter:
                     head_n=head_n,
                 )
             await self.close_db()
-            if self.module_conf:
-                status = f"finished {self.module_conf['title']} ({self.module_name})"
-                update_status(
-                    status, logger=self.logger, serveradmindb=self.serveradmindb
-                )
-            end_time = time()
-            if not (hasattr(self, "no_log") and self.no_log) and self.logger:
-                self.logger.info("finished: {0}".format(asctime(localtime(end_time))))
-                run_time = end_time - self.start_time
-                self.logger.info("runtime: {0:0.3f}".format(run_time))
-            ret = self.end()
-            return ret
+            return self.finish_run()
         except Exception as e:
             await self.close_db()
             import traceback
@@ -563,6 +666,77 @@ class BaseReporter:
             traceback.print_exc()
             raise e
 
+    async def start_run(self, tab="all", make_filtered_table=True):
+        from ..exceptions import SetupError
+        from time import time
+
+        await self.prep()
+        if not self.cf:
+            raise SetupError(self.module_name)
+        self.start_time = time()
+        tab = tab or self.level or "all"
+        self.log_run_start()
+        if self.setup() is False:
+            await self.close_db()
+            raise SetupError(self.module_name)
+        self.ftable_uid = await self.cf.make_ftables_and_ftable_uid(
+            make_filtered_table=make_filtered_table
+        )
+        self.levels = await self.get_levels_to_run(tab)
+
+    def finish_run(self):
+        from time import time
+        from time import asctime
+        from time import localtime
+        from ..util.run import update_status
+
+        if self.module_conf:
+            status = f"finished {self.module_conf['title']} ({self.module_name})"
+            update_status(status, logger=self.logger, serveradmindb=self.serveradmindb)
+        end_time = time()
+        if not (hasattr(self, "no_log") and self.no_log) and self.logger:
+            self.logger.info("finished: {0}".format(asctime(localtime(end_time))))
+            run_time = end_time - self.start_time
+            self.logger.info("runtime: {0:0.3f}".format(run_time))
+        return self.end()
+
+    @classmethod
+    def shares_level_scan(cls) -> bool:
+        """Whether this reporter can be fed rows from a level scan shared with
+        other reporters (see `run_reporters`). Reporters which override `run`
+        or `write_data` read their own data and cannot.
+        """
+        return (
+            cls.run is BaseReporter.run and cls.write_data is BaseReporter.write_data
+        )
+
+    def get_col_info_key(self) -> Optional[str]:
+        from json import dumps
+
+        cls = type(self)
+        if (
+            cls.make_col_info is not BaseReporter.make_col_info
+            or cls.make_col_infos is not BaseReporter.make_col_infos
+        ):
+            return None
+        return dumps(
+            [
+                self.extract_columns_multilevel,
+                self.nogenelevelonvariantlevel,
+                self.levels_to_write,
+                self.levels,
+            ],
+            sort_keys=True,
+            default=str,
+        )
+
+    def copy_col_infos_from(self, other: "BaseReporter"):
+        from copy import deepcopy
+
+        col_infos = deepcopy({name: getattr(other, name) for name in COL_INFO_ATTRS})
+        for name, value in col_infos.items():
+            setattr(self, name, value)
+
     async def write_data(
         self,
         level: str,
@@ -575,29 +749,10 @@ class BaseReporter:
         from ..exceptions import SetupError
 
         _ = make_filtered_table
-        if self.should_write_level(level) is False:
-            return
-        if not await self.exec_db(self.table_exists, level):
+        if not await self.prepare_level_data(level, add_summary=add_summary):
             return
         if not self.cf:
             raise SetupError(self.module_name)
-        if add_summary and self.level == "gene":
-            await self.do_gene_level_summary(add_summary=add_summary)
-        self.extracted_cols[level] = self.get_extracted_header_columns(level)
-        self.extracted_col_names[level] = [
-            col_def.get("col_name") for col_def in self.extracted_cols[level]
-        ]
-        self.hugo_colno = self.colnos[level].get("base__hugo", None)
-        #datacols = await self.cf.exec_db(self.cf.get_variant_data_cols)
-        #self.total_norows = await self.cf.exec_db(
-        #    self.cf.get_ftable_num_rows, level=level, uid=self.ftable_uid, ftype=level
-        #)  # type: ignore
-        #if datacols is None or self.total_norows is None:
-        #    return
-        if level == "variant" and self.separatesample:
-            self.write_variant_sample_separately = True
-        else:
-            self.write_variant_sample_separately = False
         row_count = 0
         conn_read, conn_write = await self.cf.get_db_conns()
         if not conn_read or not conn_write:
@@ -612,32 +767,13 @@ class BaseReporter:
             var_added_cols=self.var_added_cols,
             head_n=head_n,
         )
-        self.retrieved_col_names[level] = [d[0] for d in cursor_read.description]
-        self.extracted_col_nos[level] = [
-            self.retrieved_col_names[level].index(col_name)
-            for col_name in self.extracted_col_names[level]
-        ]
-        self.num_retrieved_cols = len(self.retrieved_col_names[level])
-        self.colnos_to_display[level] = [
-            self.retrieved_col_names[level].index(c)
-            for c in self.colnames_to_display[level]
-        ]
-        self.extracted_colnos_in_retrieved = [
-            self.retrieved_col_names[level].index(c)
-            for c in self.extracted_col_names[level]
-        ]
+        self.set_retrieved_col_names(level, cursor_read.description)
         self.write_preface(level)
         self.write_header(level)
-        async for datarow in cursor_read:
-            if self.dictrow:
-                datarow = dict(datarow)
-            else:
-                datarow = list(datarow)
-            if level == "gene" and add_summary:
-                await self.add_gene_summary_data_to_gene_level(datarow)
-            datarow = self.substitute_val(level, datarow)
-            self.stringify_all_mapping(level, datarow)
-            self.escape_characters(datarow)
+        async for datarow in self.iter_data_rows(cursor_read):
+            datarow = await self.transform_data_row(
+                level, datarow, add_summary=add_summary
+            )
             try:
                 self.write_row_with_samples_separate_or_not(datarow)
             except Exception:
@@ -651,11 +787,7 @@ class BaseReporter:
                     await self.cf.close_db()
             row_count += 1
             if row_count % 10000 == 0:
-                msg = f"Wrote {row_count} rows."
-                if self.logger is not None:
-                    self.logger.info(msg)
-                elif self.outer is not None:
-                    self.outer.write(msg)
+                self.write_row_count(row_count)
             if pagesize and row_count == pagesize:
                 break
         #datacols = await self.cf.exec_db(self.cf.get_variant_data_cols)
@@ -668,6 +800,70 @@ class BaseReporter:
         await conn_read.close()
         await conn_write.close()
 
+    async def prepare_level_data(self, level: str, add_summary=True) -> bool:
+        from ..exceptions import SetupError
+
+        if self.should_write_level(level) is False:
+            return False
+        if not await self.exec_db(self.table_exists, level):
+            return False
+        if not self.cf:
+            raise SetupError(self.module_name)
+        if add_summary and self.level == "gene":
+            await self.do_gene_level_summary(add_summary=add_summary)
+        self.extracted_cols[level] = self.get_extracted_header_columns(level)
+        self.extracted_col_names[level] = [
+            col_def.get("col_name") for col_def in self.extracted_cols[level]
+        ]
+        self.hugo_colno = self.colnos[level].get("base__hugo", None)
+        if level == "variant" and self.separatesample:
+            self.write_variant_sample_separately = True
+        else:
+            self.write_variant_sample_separately = False
+        return True
+
+    def set_retrieved_col_names(self, level: str, description):
+        self.retrieved_col_names[level] = [d[0] for d in description]
+        self.extracted_col_nos[level] = [
+            self.retrieved_col_names[level].index(col_name)
+            for col_name in self.extracted_col_names[level]
+        ]
+        self.num_retrieved_cols = len(self.retrieved_col_names[level])
+        self.colnos_to_display[level] = [
+            self.retrieved_col_names[level].index(c)
+            for c in self.colnames_to_display[level]
+        ]
+        self.extracted_colnos_in_retrieved = [
+            self.retrieved_col_names[level].index(c)
+            for c in self.extracted_col_names[level]
+        ]
+        self.row_transforms.pop(level, None)
+
+    async def transform_data_row(self, level: str, datarow, add_summary=True):
+        if self.dictrow:
+            datarow = dict(datarow)
+        else:
+            datarow = list(datarow)
+        if level == "gene" and add_summary:
+            await self.add_gene_summary_data_to_gene_level(datarow)
+        if self.custom_row_processing:
+            datarow = self.substitute_val(level, datarow)
+            self.stringify_all_mapping(level, datarow)
+            self.escape_characters(datarow)
+            return datarow
+        transform_row = self.row_transforms.get(level)
+        if transform_row is None:
+            transform_row = self.make_row_transform(level, datarow)
+            self.row_transforms[level] = transform_row
+        return transform_row(datarow)
+
+    def write_row_count(self, row_count: int):
+        msg = f"Wrote {row_count} rows."
+        if self.logger is not None:
+            self.logger.info(msg)
+        elif self.outer is not None:
+            self.outer.write(msg)
+
     def write_row_with_samples_separate_or_not(self, datarow):
         if self.legacy_samples_col:
             col_name = "base__samples"
@@ -711,6 +907,13 @@ class BaseReporter:
                 return
             idx = self.retrieved_col_names[level].index(col_name)
             all_map = loads(datarow[idx])
+        newcell = self.stringify_mappings(all_map)
+        if self.dictrow:
+            datarow[col_name] = newcell
+        elif idx is not None:
+            datarow[idx] = newcell
+
+    def stringify_mappings(self, all_map) -> str:
         newvals = []
         for hugo in all_map:
             for maprow in all_map[hugo]:
@@ -742,11 +945,7 @@ class BaseReporter:
                 )
                 newvals.append(newval)
         newvals.sort()
-        newcell = "; ".join(newvals)
-        if self.dictrow:
-            datarow[col_name] = newcell
-        elif idx is not None:
-            datarow[idx] = newcell
+        return "; ".join(newvals)
 
     async def add_gene_summary_data_to_gene_level(self, datarow):
         hugo = datarow["base__hugo"]
@@ -926,6 +1125,9 @@ class BaseReporter:
         cursor = await conn.cursor()
         if coldef.category not in ["single", "multi"] or len(coldef.categories) > 0:
             return coldef
+        # Categories were collected when the column was written, even if empty.
+        if coldef.stats is not None:
+            return coldef
         sql = f"select distinct {coldef.name} from {level}"
         await cursor.execute(sql)
         rs = await cursor.fetchall()
@@ -1221,6 +1423,7 @@ class BaseReporter:
             else:
                 await conn.close()
         self.conns = []
+        self.conn = None
         if self.cf is not None:
             await self.cf.close_db()
             self.cf = None
@@ -1270,4 +1473,122 @@ class BaseReporter:
         return get_standardized_module_option(v)
 
 
+async def run_reporters(
+    reporters: List[BaseReporter],
+    head_n: Optional[int] = None,
+    make_col_categories: bool = False,
+) -> List[Any]:
+    """Runs reporters together, reading each result level once.
+
+    Column information is made once for each set of reporters with the same
+    column options and copied to the rest. Rows of each level are read once
+    for reporters using the same filtered tables and handed to each of them.
+    The reporters should pass `shares_level_scan`.
+
+    Args:
+        reporters (List[BaseReporter]): Reporters to run
+        head_n (Optional[int]): Only the first head_n rows of each level are
+            reported.
+        make_col_categories (bool): Whether to collect column categories from
+            result tables.
+
+    Returns:
+        Return values of the reporters' `end` methods, in the order of
+        `reporters`.
+    """
+    from ..exceptions import SetupError
+
+    # TODO: disabling gene level summary for now. Enable later.
+    add_summary = False
+    try:
+        for reporter in reporters:
+            await reporter.start_run()
+        levels: List[str] = []
+        col_info_reporters: Dict[str, BaseReporter] = {}
+        for reporter in reporters:
+            for level in reporter.levels:
+                if level not in levels:
+                    levels.append(level)
+            key = reporter.get_col_info_key()
+            if key is not None and key in col_info_reporters:
+                reporter.copy_col_infos_from(col_info_reporters[key])
+                continue
+            reporter.level = reporter.levels[0] if reporter.levels else None
+            await reporter.make_col_infos(
+                add_summary=add_summary, make_col_categories=make_col_categories
+            )
+            if key is not None:
+                col_info_reporters[key] = reporter
+        for level in levels:
+            scan_groups: Dict[Any, List[BaseReporter]] = {}
+            for reporter in reporters:
+                if level not in reporter.levels:
+                    continue
+                reporter.level = level
+                if not await reporter.prepare_level_data(
+                    level, add_summary=add_summary
+                ):
+                    continue
+                scan_groups.setdefault(reporter.ftable_uid, []).append(reporter)
+            for uid, scan_reporters in scan_groups.items():
+                cf = scan_reporters[0].cf
+                if not cf:
+                    raise SetupError(scan_reporters[0].module_name)
+                var_added_cols = []
+                for reporter in scan_reporters:
+                    for col_name in reporter.var_added_cols:
+                        if col_name not in var_added_cols:
+                            var_added_cols.append(col_name)
+                conn_read, conn_write = await cf.get_db_conns()
+                if not conn_read or not conn_write:
+                    continue
+                cursor_read = await conn_read.cursor()
+                await cf.get_level_data_iterator(
+                    level,
+                    uid=uid,
+                    cursor_read=cursor_read,
+                    var_added_cols=var_added_cols,
+                    head_n=head_n,
+                )
+                for reporter in scan_reporters:
+                    reporter.set_retrieved_col_names(level, cursor_read.description)
+                    reporter.write_preface(level)
+                    reporter.write_header(level)
+                row_count = 0
+                async for datarow in scan_reporters[0].iter_data_rows(cursor_read):
+                    for reporter in scan_reporters:
+                        reporter_row = await reporter.transform_data_row(
+                            level, datarow, add_summary=add_summary
+                        )
+                        reporter.write_row_with_samples_separate_or_not(reporter_row)
+                    row_count += 1
+                    if row_count % 10000 == 0:
+                        for reporter in scan_reporters:
+                            reporter.write_row_count(row_count)
+                await cursor_read.close()
+                await conn_read.close()
+                await conn_write.close()
+                for reporter in scan_reporters:
+                    if not reporter.cf:
+                        continue
+                    reporter.total_norows = await reporter.cf.exec_db(
+                        reporter.cf.get_ftable_num_rows,
+                        level=level,
+                        uid=reporter.ftable_uid,
+                        ftype=level,
+                    )  # type: ignore
+        rets = []
+        for reporter in reporters:
+            await reporter.close_db()
+            rets.append(reporter.finish_run())
+        return rets
+    except Exception as e:
+        for reporter in reporters:
+            await reporter.close_db()
+        import traceback
+
+        traceback.print_exc()
+        raise e
+
+
 CravatReport = BaseReporter
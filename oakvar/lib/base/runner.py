@@ -56,6 +56,22 @@ from typing import Dict
 
 
 class Runner(object):
+    MAPPER_CHUNKS_PER_WORKER: int = 8
+    ANNOTATOR_CHUNKS_PER_WORKER: int = 8
+    WORKER_SLOT_WAIT: float = 0.1  # seconds
+    # Arguments which change converter output, for the run manifest
+    CONVERTER_ARG_KEYS: List[str] = [
+        "genome",
+        "input_format",
+        "converter_module",
+        "input_encoding",
+        "ignore_sample",
+        "skip_variant_deduplication",
+        "keep_liftover_failed",
+        "keep_ref",
+        "combine_input",
+    ]
+
     def __init__(self, **kwargs):
         from pathlib import Path
         from ..module.local import LocalModule
@@ -73,7 +89,15 @@ class Runner(object):
         self.annotator_ran = False
         self.aggregator_ran = False
         self.annotators_to_run = {}
+        self.chunked_annotator_threads = []
+        self.chunked_annotator_errors = []
         self.done_annotators = {}
+        self.run_manifest = None
+        self.stage_fingerprints: Dict[str, str] = {}
+        self.incremental_db = False
+        self.annotators_to_merge: Optional[List[str]] = None
+        self.done_postaggregators: Dict[str, str] = {}
+        self.converter_ran = False
         self.info_json = None
         self.pkg_ver = None
         self.logger = None
@@ -124,6 +148,7 @@ class Runner(object):
         self.genome_assemblies: List[List[str]] = []
         self.inkwargs = kwargs
         self.serveradmindb = None
+        self.status_writer = None
         self.report_response = None
         self.filtersql = None
         self.filterpath = None
@@ -327,13 +352,253 @@ class Runner(object):
             self.logger.info("conf file: {}".format(self.conf_path))
 
     async def process_file(self, run_no: int):
+        self.load_run_manifest(run_no)
         await self.do_step_converter(run_no)
         await self.do_step_preparer(run_no)
         await self.do_step_mapper(run_no)
         await self.do_step_annotator(run_no)
         await self.do_step_aggregator(run_no)
         await self.do_step_postaggregator(run_no)
+        self.save_run_manifest(run_no)
         await self.do_step_reporter(run_no)
+        await self.do_step_parquet(run_no)
+
+    def get_run_manifest_path(self, run_no: int) -> Path:
+        from ..consts import RUN_MANIFEST_SUFFIX
+
+        run_name, output_dir = self.get_run_name_output_dir_by_run_no(run_no)
+        return Path(output_dir) / (run_name + RUN_MANIFEST_SUFFIX)
+
+    def load_run_manifest(self, run_no: int):
+        from ..util.manifest import RunManifest
+        from ..util.run import update_status
+
+        self.run_manifest = None
+        self.stage_fingerprints = {}
+        self.incremental_db = False
+        self.annotators_to_merge = None
+        self.done_postaggregators = {}
+        self.converter_ran = False
+        if not self.args or not getattr(self.args, "incremental", False):
+            return
+        # An existing result database given as input is handled by append mode.
+        if self.append_mode[run_no]:
+            return
+        self.run_manifest = RunManifest(self.get_run_manifest_path(run_no))
+        self.run_manifest.load()
+        self.make_stage_fingerprints(run_no)
+        self.incremental_db = self.is_result_db_reusable(run_no)
+        if self.incremental_db:
+            self.append_mode[run_no] = True
+            update_status(
+                "reusing the result database of the previous run",
+                logger=self.logger,
+                serveradmindb=self.serveradmindb,
+            )
+
+    def make_stage_fingerprints(self, run_no: int):
+        from ..util.manifest import get_file_hash
+        from ..util.manifest import get_fingerprint
+        from ..util.manifest import get_module_fingerprint
+
+        if not self.args:
+            raise
+        if self.args.combine_input:
+            input_paths = self.inputs
+        else:
+            input_paths = [self.inputs[run_no]]
+        input_hashes = [get_file_hash(input_path) for input_path in input_paths]
+        module_names = (
+            set(self.preparers)
+            | set(self.annotators)
+            | set(self.postaggregators)
+            | set(self.reporters)
+        )
+        converter_options = {
+            k: v
+            for k, v in self.run_conf.items()
+            if isinstance(v, dict) and k not in module_names and k != self.mapper_name
+        }
+        self.stage_fingerprints["converter"] = get_fingerprint(
+            self.pkg_ver,
+            input_hashes,
+            {key: getattr(self.args, key, None) for key in self.CONVERTER_ARG_KEYS},
+            converter_options,
+            [
+                get_module_fingerprint(module, self.run_conf.get(module_name, {}))
+                for module_name, module in self.preparers.items()
+            ],
+        )
+        self.stage_fingerprints["mapper"] = get_fingerprint(
+            self.stage_fingerprints["converter"],
+            get_module_fingerprint(
+                self.mapper, self.run_conf.get(self.mapper_name or "", {})
+            ),
+            self.args.primary_transcript,
+        )
+
+    def get_annotator_fingerprint(self, module) -> str:
+        from ..util.manifest import get_fingerprint
+        from ..util.manifest import get_module_fingerprint
+
+        stage = f"annotator:{module.name}"
+        if stage not in self.stage_fingerprints:
+            secondary_fingerprints = {
+                secondary_module.name: self.get_annotator_fingerprint(secondary_module)
+                for secondary_module in self.get_secondary_modules(module)
+            }
+            self.stage_fingerprints[stage] = get_fingerprint(
+                self.stage_fingerprints["mapper"],
+                get_module_fingerprint(module, self.run_conf.get(module.name, {})),
+                secondary_fingerprints,
+            )
+        return self.stage_fingerprints[stage]
+
+    def get_postaggregator_fingerprint(self, module, annotator_fingerprints) -> str:
+        from ..util.manifest import get_fingerprint
+        from ..util.manifest import get_module_fingerprint
+
+        return get_fingerprint(
+            self.stage_fingerprints["mapper"],
+            get_module_fingerprint(module, self.run_conf.get(module.name, {})),
+            annotator_fingerprints,
+        )
+
+    def can_reuse_stage(self, stage: str) -> bool:
+        if not self.run_manifest or stage not in self.stage_fingerprints:
+            return False
+        return self.run_manifest.is_fresh(stage, self.stage_fingerprints[stage])
+
+    def get_result_db_token(self, run_no: int) -> Optional[str]:
+        import sqlite3
+        from ..consts import RUN_MANIFEST_TOKEN_KEY
+
+        dbpath = self.get_dbpath(run_no)
+        if not Path(dbpath).exists():
+            return None
+        try:
+            conn = sqlite3.connect(dbpath)
+            try:
+                q = "select colval from info where colkey=?"
+                r = conn.execute(q, (RUN_MANIFEST_TOKEN_KEY,)).fetchone()
+            finally:
+                conn.close()
+        except sqlite3.Error:
+            return None
+        if r is None:
+            return None
+        return r[0]
+
+    def set_result_db_token(self, run_no: int, token: Optional[str]):
+        import sqlite3
+        from ..consts import RUN_MANIFEST_TOKEN_KEY
+
+        conn = sqlite3.connect(self.get_dbpath(run_no))
+        try:
+            if token is None:
+                q = "delete from info where colkey=?"
+                conn.execute(q, (RUN_MANIFEST_TOKEN_KEY,))
+            else:
+                q = "insert or replace into info values (?, ?)"
+                conn.execute(q, (RUN_MANIFEST_TOKEN_KEY, token))
+            conn.commit()
+        finally:
+            conn.close()
+
+    def is_result_db_reusable(self, run_no: int) -> bool:
+        """The result database is reusable if it was made from the same
+        converter and mapper outputs, and has not been remade or changed by
+        a run without the run manifest since. The token in its info table
+        identifies the run which last recorded it in the manifest."""
+        if not self.run_manifest:
+            return False
+        entry = self.run_manifest.get_stage("aggregator")
+        if not entry or entry.get("fingerprint") != self.stage_fingerprints["mapper"]:
+            return False
+        token = self.get_result_db_token(run_no)
+        return token is not None and token == entry.get("token")
+
+    def invalidate_result_db(self, run_no: int):
+        # A run which fails while changing the database should not leave it
+        # looking reusable.
+        if self.incremental_db:
+            self.set_result_db_token(run_no, None)
+
+    def save_run_manifest(self, run_no: int):
+        from uuid import uuid4
+        from ..consts import STANDARD_INPUT_FILE_SUFFIX
+        from ..consts import VARIANT_LEVEL_MAPPED_FILE_SUFFIX
+        from ..consts import GENE_LEVEL_MAPPED_FILE_SUFFIX
+        from ..consts import SAMPLE_FILE_SUFFIX
+        from ..consts import MAPPING_FILE_SUFFIX
+
+        if not self.run_manifest:
+            return
+        run_name, output_dir = self.get_run_name_output_dir_by_run_no(run_no)
+        base_path = Path(output_dir) / run_name
+        if self.converter_ran:
+            self.run_manifest.record(
+                "converter",
+                self.stage_fingerprints["converter"],
+                [
+                    Path(str(base_path) + suffix)
+                    for suffix in [
+                        STANDARD_INPUT_FILE_SUFFIX,
+                        SAMPLE_FILE_SUFFIX,
+                        MAPPING_FILE_SUFFIX,
+                    ]
+                ],
+                total_num_unique_variants=self.total_num_unique_variants,
+                converter_format=self.converter_format,
+                genome_assemblies=self.genome_assemblies[run_no],
+            )
+        if self.mapper_ran:
+            self.run_manifest.record(
+                "mapper",
+                self.stage_fingerprints["mapper"],
+                [
+                    Path(str(base_path) + suffix)
+                    for suffix in [
+                        VARIANT_LEVEL_MAPPED_FILE_SUFFIX,
+                        GENE_LEVEL_MAPPED_FILE_SUFFIX,
+                    ]
+                ],
+            )
+        if self.annotator_ran:
+            for module in self.annotators_to_run.values():
+                output_path = self.get_module_output_path(module, run_no)
+                self.run_manifest.record(
+                    f"annotator:{module.name}",
+                    self.get_annotator_fingerprint(module),
+                    [Path(output_path)] if output_path else [],
+                )
+        if self.aggregator_ran or self.incremental_db:
+            annotator_fingerprints = {}
+            postaggregator_fingerprints = {}
+            entry = self.run_manifest.get_stage("aggregator")
+            if self.incremental_db and entry:
+                annotator_fingerprints.update(entry.get("annotators", {}))
+                postaggregator_fingerprints.update(entry.get("postaggregators", {}))
+            if self.aggregator_ran:
+                if self.incremental_db:
+                    merged_names = self.annotators_to_merge or []
+                else:
+                    merged_names = list(self.annotators)
+                for module_name in merged_names:
+                    annotator_fingerprints[module_name] = (
+                        self.get_annotator_fingerprint(self.annotators[module_name])
+                    )
+            postaggregator_fingerprints.update(self.done_postaggregators)
+            token = uuid4().hex
+            self.set_result_db_token(run_no, token)
+            self.run_manifest.record(
+                "aggregator",
+                self.stage_fingerprints["mapper"],
+                annotators=annotator_fingerprints,
+                postaggregators=postaggregator_fingerprints,
+                token=token,
+            )
+        self.run_manifest.save()
 
     async def main(self) -> Optional[Dict[str, Any]]:
         from time import time, asctime, localtime
@@ -387,6 +652,7 @@ class Runner(object):
                     if self.logger:
                         self.logger.error(s)
             finally:
+                self.stop_status_writer()
                 if not self.exception:
                     update_status(JOB_STATUS_FINISHED, serveradmindb=self.serveradmindb)
                 else:
@@ -525,6 +791,28 @@ class Runner(object):
             self.serveradmindb = ServerAdminDb(
                 job_dir=self.output_dir[run_no], job_name=self.job_name[run_no]
             )
+            self.start_status_writer()
+
+    def start_status_writer(self):
+        from ...gui.serveradmindb import JobStatusWriter
+        from ..consts import JOB_STATUS_WRITE_INTERVAL
+
+        if not self.serveradmindb or not self.manager:
+            return
+        queue = self.manager.Queue()
+        self.status_writer = JobStatusWriter(
+            self.serveradmindb, queue, JOB_STATUS_WRITE_INTERVAL
+        )
+        self.status_writer.start()
+        self.serveradmindb.status_queue = queue
+
+    def stop_status_writer(self):
+        if not self.status_writer:
+            return
+        self.status_writer.stop()
+        self.status_writer = None
+        if self.serveradmindb:
+            self.serveradmindb.status_queue = None
 
     def make_self_conf(self, args):
         from ..exceptions import SetupError
@@ -597,29 +885,32 @@ class Runner(object):
         else:
             self.inputs = []
 
-    def regenerate_from_db(self, run_no: int):
+    def regenerate_from_db(self, run_no: int, dbpath=None):
         import sqlite3
         from ..util.inout import FileWriter
+        from ..system import get_intermediate_format
         from ..util.util import get_crv_def
         from ..util.util import get_crx_def
         from ..util.util import get_crg_def
 
         if not self.inputs:
             raise
-        dbpath = self.inputs[run_no]
+        if dbpath is None:
+            dbpath = self.inputs[run_no]
         db = sqlite3.connect(dbpath)
         c = db.cursor()
         crv_def = get_crv_def()
         crx_def = get_crx_def()
         crg_def = get_crg_def()
+        fmt = get_intermediate_format()
         # Variant
         if not self.crv_present:
-            crv = FileWriter(self.crvinput, columns=crv_def)
+            crv = FileWriter(self.crvinput, columns=crv_def, fmt=fmt)
             crv.write_definition()
         else:
             crv = None
         if not self.crx_present:
-            crx = FileWriter(self.crxinput, columns=crx_def)
+            crx = FileWriter(self.crxinput, columns=crx_def, fmt=fmt)
             crx.write_definition()
         else:
             crx = None
@@ -642,7 +933,7 @@ class Runner(object):
             self.crx_present = True
         # Gene
         if not self.crg_present:
-            crg = FileWriter(self.crginput, columns=crg_def)
+            crg = FileWriter(self.crginput, columns=crg_def, fmt=fmt)
             crg.write_definition()
             colnames = [x["name"] for x in crg_def]
             sel_cols = ", ".join(["base__" + x for x in colnames])
@@ -716,7 +1007,9 @@ class Runner(object):
                 ]
             else:
                 if len(self.args.output_dir) == 1:
-                    self.output_dir = [self.args.output_dir[0]] * len(self.inputs)
+                    self.output_dir = [
+                        str(Path(self.args.output_dir[0]).absolute())
+                    ] * len(self.inputs)
                 else:
                     if len(self.args.output_dir) != len(self.inputs):
                         raise ArgumentError(
@@ -1272,6 +1565,7 @@ class Runner(object):
 
     def collect_crxs(self, run_no: int):
         from ..util.util import escape_glob_pattern
+        from ..util.inout import concatenate_files
         from os import remove
         from pathlib import Path
 
@@ -1279,46 +1573,38 @@ class Runner(object):
         if not output_dir:
             return
         crx_path = Path(output_dir) / f"{run_name}.crx"
-        wf = open(str(crx_path), "w")
         fns = sorted(
             [
                 str(v)
                 for v in Path(output_dir).glob(escape_glob_pattern(run_name) + ".crx.*")
             ]
         )
-        fn = fns[0]
-        f = open(fn)
-        for line in f:
-            wf.write(line)
-        f.close()
-        remove(fn)
-        for fn in fns[1:]:
-            f = open(fn)
-            for line in f:
-                if line[0] != "#":
-                    wf.write(line)
-            f.close()
+        concatenate_files(fns, crx_path)
+        for fn in fns:
             remove(fn)
-        wf.close()
 
     def collect_crgs(self, run_no: int):
         from os import remove
         from pathlib import Path
         from ..util.util import escape_glob_pattern
+        from ..util.inout import get_file_format
         from ..consts import GENE_LEVEL_MAPPED_FILE_SUFFIX
 
         run_name, output_dir = self.get_run_name_output_dir_by_run_no(run_no)
         if not output_dir:
             return
         crg_path = Path(output_dir) / f"{run_name}{GENE_LEVEL_MAPPED_FILE_SUFFIX}"
-        wf = open(str(crg_path), "w")
-        unique_hugos = {}
         fns = sorted(
             [
                 str(v)
                 for v in crg_path.parent.glob(escape_glob_pattern(crg_path.name) + ".*")
             ]
         )
+        if get_file_format(fns[0]) == "arrow":
+            self.collect_arrow_crgs(fns, crg_path)
+            return
+        wf = open(str(crg_path), "w")
+        unique_hugos = {}
         fn = fns[0]
         f = open(fn)
         for line in f:
@@ -1348,6 +1634,22 @@ class Runner(object):
         del unique_hugos
         del hugos
 
+    def collect_arrow_crgs(self, fns: List[str], crg_path):
+        from os import remove
+        from ..util.inout import FileReader
+        from ..util.inout import write_arrow_file
+
+        unique_hugos = {}
+        for fn in fns:
+            reader = FileReader(fn)
+            for _, _, row in reader.loop_data(as_tuple=True):
+                if row[0] not in unique_hugos:
+                    unique_hugos[row[0]] = row
+        hugos = sorted(unique_hugos.keys())
+        write_arrow_file(crg_path, fns[0], [unique_hugos[hugo] for hugo in hugos])
+        for fn in fns:
+            remove(fn)
+
     def table_exists(self, cursor, table):
         sql = (
             'select name from sqlite_master where type="table" and '
@@ -1365,26 +1667,16 @@ class Runner(object):
         self, run_no: int
     ) -> Tuple[Optional[str], Optional[str], Optional[str]]:
         from pathlib import Path
+        from ..util.inout import FileReader
         from ..consts import VARIANT_LEVEL_MAPPED_FILE_SUFFIX
 
         run_name, output_dir = self.get_run_name_output_dir_by_run_no(run_no)
-        title = None
-        version = None
-        modulename = None
         fn = Path(output_dir) / (run_name + VARIANT_LEVEL_MAPPED_FILE_SUFFIX)
-        if fn.exists():
-            f = open(fn)
-            for line in f:
-                if line.startswith("#title="):
-                    title = line.strip().split("=")[1]
-                elif line.startswith("#version="):
-                    version = line.strip().split("=")[1]
-                elif line.startswith("#modulename="):
-                    modulename = line.strip().split("=")[1]
-                elif line.startswith("#") is False:
-                    break
-            f.close()
-        return title, version, modulename
+        if not fn.exists():
+            return None, None, None
+        # The file can be in arrow format, which only FileReader can read.
+        meta = FileReader(fn).get_meta()
+        return meta.get("title"), meta.get("version"), meta.get("modulename")
 
     def get_run_name_output_dir_by_run_no(self, run_no: int) -> Tuple[str, str]:
         if not self.output_dir or not self.run_name:
@@ -1411,15 +1703,13 @@ class Runner(object):
     def get_input_paths_from_mapping_file(self, run_no: int) -> Optional[dict]:
         from pathlib import Path
         import json
+        from ..util.inout import FileReader
         from ..consts import MAPPING_FILE_SUFFIX
 
         run_name, output_dir = self.get_run_name_output_dir_by_run_no(run_no)
-        f = open(Path(output_dir) / (run_name + MAPPING_FILE_SUFFIX))
-        for line in f:
-            if line.startswith("#input_paths="):
-                new_line = "=".join(line.strip().split("=")[1:])
-                input_paths = json.loads(new_line)
-                return input_paths
+        meta = FileReader(Path(output_dir) / (run_name + MAPPING_FILE_SUFFIX)).get_meta()
+        if "input_paths" in meta:
+            return json.loads(meta["input_paths"])
 
     async def create_info_table_if_needed(self, run_no: int, cursor):
         if not self.append_mode[run_no]:
@@ -1747,7 +2037,8 @@ class Runner(object):
 
     async def run_mapper(self, run_no: int):
         import multiprocessing as mp
-        from ..base.mp_runners import init_worker, mapper_runner
+        from time import time
+        from ..base.mp_runners import init_mapper_worker, mapper_chunk_runner
         from ..util.inout import FileReader
 
         if not self.args or not self.run_name or not self.output_dir:
@@ -1756,57 +2047,56 @@ class Runner(object):
         output_dir = self.output_dir[run_no]
         num_workers = self.get_num_workers()
         reader = FileReader(self.crvinput)
-        num_lines, chunksize, poss, len_poss, max_num_lines = reader.get_chunksize(
-            num_workers
-        )
+        poss = reader.get_chunk_poss(num_workers * self.MAPPER_CHUNKS_PER_WORKER)
+        tasks = [
+            (pos_no, seekpos, chunksize)
+            for pos_no, (seekpos, chunksize) in enumerate(poss)
+        ]
+        num_lines = sum([chunksize for _, chunksize in poss])
         if self.logger:
             self.logger.info(
-                f"input line chunksize={chunksize} total number of "
-                + f"input lines={num_lines} number of chunks={len_poss}"
+                f"input line chunksize={poss[0][1]} total number of "
+                + f"input lines={num_lines} number of chunks={len(poss)}"
             )
-        pool = mp.get_context("spawn").Pool(num_workers, init_worker)
-        pos_no = 0
-        while pos_no < len_poss:
-            jobs = []
-            for _ in range(num_workers):
-                if pos_no == len_poss:
-                    break
-                (seekpos, num_lines) = poss[pos_no]
-                if pos_no == len_poss - 1:
-                    job = pool.apply_async(
-                        mapper_runner,
-                        (
-                            self.crvinput,
-                            seekpos,
-                            max_num_lines - num_lines,
-                            run_name,
-                            output_dir,
-                            self.mapper_name,
-                            pos_no,
-                            ";".join(self.args.primary_transcript),
-                            self.serveradmindb,
-                        ),
-                    )
-                else:
-                    job = pool.apply_async(
-                        mapper_runner,
-                        (
-                            self.crvinput,
-                            seekpos,
-                            chunksize,
-                            run_name,
-                            output_dir,
-                            self.mapper_name,
-                            pos_no,
-                            ";".join(self.args.primary_transcript),
-                            self.serveradmindb,
-                        ),
+        pool = mp.get_context("spawn").Pool(
+            num_workers,
+            init_mapper_worker,
+            (
+                self.crvinput,
+                run_name,
+                output_dir,
+                self.mapper_name,
+                ";".join(self.args.primary_transcript),
+                self.serveradmindb,
+            ),
+        )
+        start_time = time()
+        chunk_rates: List[float] = []
+        try:
+            for pos_no, chunksize, runtime in pool.imap_unordered(
+                mapper_chunk_runner, tasks
+            ):
+                rate = chunksize / runtime if runtime > 0 else 0.0
+                chunk_rates.append(rate)
+                if self.logger:
+                    self.logger.debug(
+                        f"mapper chunk {pos_no}: {chunksize} lines in "
+                        + f"{runtime:.3f}s ({rate:.0f} lines/sec)"
                     )
-                jobs.append(job)
-                pos_no += 1
-            for job in jobs:
-                job.get()
-        pool.close()
+            pool.close()
+            pool.join()
+        except BaseException:
+            pool.terminate()
+            raise
+        runtime = time() - start_time
+        if self.logger and chunk_rates and runtime > 0:
+            chunk_rates.sort()
+            self.logger.info(
+                f"mapper: {num_lines / runtime:.0f} lines/sec with {num_workers} "
+                + f"workers. chunk lines/sec min={chunk_rates[0]:.0f} "
+                + f"median={chunk_rates[len(chunk_rates) // 2]:.0f} "
+                + f"max={chunk_rates[-1]:.0f}"
+            )
         self.collect_crxs(run_no)
         self.collect_crgs(run_no)
 
@@ -1887,14 +2177,19 @@ class Runner(object):
         start_queue = self.manager.Queue()
         end_queue = self.manager.Queue()
         all_mnames = set(self.annotators_to_run)
+        self.chunked_annotator_errors = []
         assigned_mnames = set()
         done_mnames = set(self.done_annotators)
         queue_populated = self.manager.Value("c_bool", False)
+        # Module runs and chunk pool processes together stay within
+        # num_workers.
+        worker_slots = self.manager.BoundedSemaphore(num_workers)
         pool_args = [
             [
                 start_queue,
                 end_queue,
                 queue_populated,
+                worker_slots,
                 self.serveradmindb,
                 self.args.logtofile,
                 self.log_path,
@@ -1912,7 +2207,13 @@ class Runner(object):
                     mname not in assigned_mnames
                     and set(module.secondary_module_names) <= done_mnames
                 ):
-                    start_queue.put(run_args[mname])
+                    self.start_annotator(
+                        run_args[mname],
+                        start_queue,
+                        end_queue,
+                        worker_slots,
+                        num_workers,
+                    )
                     assigned_mnames.add(mname)
             while (
                 assigned_mnames != all_mnames
@@ -1924,13 +2225,156 @@ class Runner(object):
                         mname not in assigned_mnames
                         and set(module.secondary_module_names) <= done_mnames
                     ):
-                        start_queue.put(run_args[mname])
+                        self.start_annotator(
+                            run_args[mname],
+                            start_queue,
+                            end_queue,
+                            worker_slots,
+                            num_workers,
+                        )
                         assigned_mnames.add(mname)
-            queue_populated = True
+            queue_populated.value = True
             pool.join()
+        for thread in self.chunked_annotator_threads:
+            thread.join()
+        self.chunked_annotator_threads = []
+        if self.chunked_annotator_errors:
+            raise self.chunked_annotator_errors[0]
         if len(self.annotators_to_run) > 0:
             self.annotator_ran = True
 
+    def start_annotator(
+        self, run_arg, start_queue, end_queue, worker_slots, num_workers: int
+    ):
+        from threading import Thread
+
+        module, _ = run_arg
+        if not self.can_run_in_chunks(module):
+            start_queue.put(run_arg)
+            return
+        thread = Thread(
+            target=self.run_chunked_annotator,
+            args=(run_arg, end_queue, worker_slots, num_workers),
+            daemon=True,
+        )
+        thread.start()
+        self.chunked_annotator_threads.append(thread)
+
+    def can_run_in_chunks(self, module) -> bool:
+        from ..util.util import load_class
+        from .annotator import BaseAnnotator
+
+        if not module.chunked_run:
+            return False
+        annotator_class = load_class(module.script_path, "Annotator")
+        if not annotator_class:
+            annotator_class = load_class(module.script_path, "CravatAnnotator")
+        if not annotator_class:
+            return False
+        # postprocess needs the whole input, which chunk workers do not see.
+        if annotator_class.postprocess is not BaseAnnotator.postprocess:
+            if self.logger:
+                self.logger.info(
+                    f"{module.name}: running without chunks because it "
+                    + "overrides postprocess"
+                )
+            return False
+        return True
+
+    def acquire_worker_slots(self, worker_slots, num_workers: int) -> int:
+        """Waits for one free worker slot and takes as many more free slots
+        as there are, up to num_workers. Returns the number of slots taken.
+        Slots being released together, as when another chunked annotator
+        finishes, are waited for briefly so that they are all taken."""
+        worker_slots.acquire()
+        num_slots = 1
+        while num_slots < num_workers and worker_slots.acquire(
+            True, self.WORKER_SLOT_WAIT
+        ):
+            num_slots += 1
+        return num_slots
+
+    def run_chunked_annotator(
+        self, run_arg, end_queue, worker_slots, num_workers: int
+    ):
+        import multiprocessing as mp
+        from time import time
+        from ..base.mp_runners import init_annotator_worker
+        from ..base.mp_runners import annotator_chunk_runner
+        from ..util.inout import FileReader
+
+        module, kwargs = run_arg
+        num_slots = 0
+        try:
+            if not self.args:
+                raise
+            num_slots = self.acquire_worker_slots(worker_slots, num_workers)
+            num_workers = num_slots
+            reader = FileReader(kwargs["input_file"])
+            poss = reader.get_chunk_poss(
+                num_workers * self.ANNOTATOR_CHUNKS_PER_WORKER
+            )
+            tasks = [
+                (pos_no, seekpos, chunksize)
+                for pos_no, (seekpos, chunksize) in enumerate(poss)
+            ]
+            if self.logger:
+                self.logger.info(
+                    f"{module.name}: running in {len(tasks)} chunks with "
+                    + f"{num_workers} workers"
+                )
+            pool = mp.get_context("spawn").Pool(
+                num_workers,
+                init_annotator_worker,
+                (
+                    module.name,
+                    str(module.script_path),
+                    kwargs,
+                    self.serveradmindb,
+                    self.args.logtofile,
+                    self.log_path,
+                ),
+            )
+            start_time = time()
+            chunk_paths = {}
+            try:
+                for pos_no, _, _, chunk_path in pool.imap_unordered(
+                    annotator_chunk_runner, tasks
+                ):
+                    chunk_paths[pos_no] = chunk_path
+                pool.close()
+                pool.join()
+            except BaseException:
+                pool.terminate()
+                raise
+            self.collect_annotator_chunks(
+                [chunk_paths[pos_no] for pos_no in sorted(chunk_paths)]
+            )
+            if self.logger:
+                self.logger.info(
+                    f"{module.name}: {sum([v[1] for v in poss])} lines in "
+                    + f"{time() - start_time:.3f}s"
+                )
+        except BaseException as e:
+            if self.logger:
+                self.logger.exception(e)
+            self.chunked_annotator_errors.append(e)
+        finally:
+            for _ in range(num_slots):
+                worker_slots.release()
+            end_queue.put(module.name)
+
+    def collect_annotator_chunks(self, chunk_paths: List[str]):
+        from os import remove
+        from pathlib import Path
+        from ..util.inout import concatenate_files
+
+        # Chunks are in input order, which is uid order for .crv and .crx.
+        output_path = Path(chunk_paths[0]).with_suffix("")
+        concatenate_files(chunk_paths, output_path)
+        for chunk_path in chunk_paths:
+            remove(chunk_path)
+
     async def run_aggregator(self, run_no: int):
         db_path = await self.run_aggregator_level("variant", run_no)
         await self.run_aggregator_level("gene", run_no)
@@ -1966,6 +2410,8 @@ class Runner(object):
             arg_dict["delete"] = True
         if self.append_mode[run_no]:
             arg_dict["append"] = True
+        if self.annotators_to_merge is not None:
+            arg_dict["annotator_names"] = self.annotators_to_merge
         v_aggregator = Aggregator(**arg_dict)
         v_aggregator.run()
         rtime = time() - stime
@@ -1988,9 +2434,31 @@ class Runner(object):
             raise
         run_name = self.run_name[run_no]
         output_dir = self.output_dir[run_no]
+        annotator_fingerprints = {}
+        db_postaggregators = {}
+        if self.run_manifest:
+            annotator_fingerprints = {
+                mname: self.get_annotator_fingerprint(module)
+                for mname, module in self.annotators.items()
+            }
+            if self.incremental_db:
+                entry = self.run_manifest.get_stage("aggregator") or {}
+                db_postaggregators = entry.get("postaggregators", {})
         for module_name, module in self.postaggregators.items():
             if self.append_mode[run_no] and module_name in default_postaggregator_names:
                 continue
+            if self.run_manifest:
+                fingerprint = self.get_postaggregator_fingerprint(
+                    module, annotator_fingerprints
+                )
+                self.done_postaggregators[module_name] = fingerprint
+                if db_postaggregators.get(module_name) == fingerprint:
+                    update_status(
+                        f"reusing output of {module_name}",
+                        logger=self.logger,
+                        serveradmindb=self.serveradmindb,
+                    )
+                    continue
             arg_dict = {
                 "module_name": module_name,
                 "run_name": run_name,
@@ -2047,6 +2515,7 @@ class Runner(object):
         arg_dict["mapper_name"] = self.mapper_name
         arg_dict["annotator_names"] = self.annotator_names
         arg_dict["run_name"] = self.run_name[run_no]
+        arg_dict["num_workers"] = self.get_num_workers()
         Module = load_class(module.script_path, "VCF2VCF")
         if not Module:
             raise ModuleNotExist("vcf2vcf", "VCF2VCF module does not exist.")
@@ -2078,7 +2547,6 @@ class Runner(object):
     async def run_reporter(self, run_no: int, head_n: Optional[int] = None):
         from pathlib import Path
         from ..util.util import load_class
-        from ..util.run import update_status
         from ..exceptions import ModuleNotExist
         from ..util.run import announce_module
         from ..consts import MODULE_OPTIONS_KEY
@@ -2089,8 +2557,8 @@ class Runner(object):
         run_name = self.run_name[run_no]
         output_dir = Path(self.output_dir[run_no])
         response = {}
+        reporter_args = {}
         for module_name, module in self.reporters.items():
-            reporter = None
             announce_module(module, serveradmindb=self.serveradmindb)
             if module is None:
                 raise ModuleNotExist(module_name)
@@ -2103,26 +2571,121 @@ class Runner(object):
             arg_dict["filtersql"] = self.filtersql
             arg_dict["filterpath"] = self.filterpath
             arg_dict[MODULE_OPTIONS_KEY] = self.run_conf.get(module_name, {})
-            Reporter: Type[BaseReporter] = load_class(module.script_path, "Reporter")  # type: ignore
-            reporter = Reporter(**arg_dict)
-            response_t = await self.log_time_of_func(
-                reporter.run, head_n=head_n, work=module_name
-            )
-            output_fns = None
-            if isinstance(response_t, list):
-                output_fns = " ".join(response_t)
-            elif isinstance(response_t, str):
-                output_fns = response_t
-            if output_fns is not None:
-                update_status(
-                    f"report created: {output_fns} ",
-                    logger=self.logger,
-                    serveradmindb=self.serveradmindb,
+            reporter_args[module_name] = arg_dict
+        if len(reporter_args) < 2:
+            for module_name, arg_dict in reporter_args.items():
+                module = self.reporters[module_name]
+                Reporter: Type[BaseReporter] = load_class(module.script_path, "Reporter")  # type: ignore
+                reporter = Reporter(**arg_dict)
+                response_t = await self.log_time_of_func(
+                    reporter.run, head_n=head_n, work=module_name
                 )
-            report_type: str = module_name.replace("reporter", "")
-            response[report_type] = response_t
+                self.add_reporter_response(response, module_name, response_t)
+            return response
+        await self.log_time_of_func(
+            self.run_reporters_together,
+            reporter_args,
+            response,
+            head_n=head_n,
+            work="reporters",
+        )
         return response
 
+    async def run_reporters_together(
+        self,
+        reporter_args: Dict[str, Dict[str, Any]],
+        response: Dict[str, Any],
+        head_n: Optional[int] = None,
+    ):
+        """Reporters which can share level scans run together in this process,
+        with each level read once for all of them. The others run at the same
+        time, each in its own process.
+        """
+        import multiprocessing as mp
+        from ..util.util import load_class
+        from .reporter import BaseReporter
+        from .reporter import run_reporters
+        from .mp_runners import init_worker
+        from .mp_runners import reporter_runner
+
+        shared_reporters: Dict[str, BaseReporter] = {}
+        separate_module_names: List[str] = []
+        for module_name, arg_dict in reporter_args.items():
+            module = self.reporters[module_name]
+            Reporter: Type[BaseReporter] = load_class(module.script_path, "Reporter")  # type: ignore
+            if Reporter.shares_level_scan():
+                shared_reporters[module_name] = Reporter(**arg_dict)
+            else:
+                separate_module_names.append(module_name)
+        pool = None
+        results = {}
+        if separate_module_names:
+            # Filtered tables are made before other processes read them.
+            await self.make_report_filter_tables(list(reporter_args.values())[0])
+            num_workers = min(len(separate_module_names), self.get_num_workers())
+            pool = mp.get_context("spawn").Pool(num_workers, init_worker)
+        try:
+            for module_name in separate_module_names:
+                results[module_name] = pool.apply_async(  # type: ignore
+                    reporter_runner,
+                    (
+                        self.reporters[module_name].script_path,
+                        reporter_args[module_name],
+                        head_n,
+                    ),
+                )
+            if shared_reporters:
+                rets = await run_reporters(
+                    list(shared_reporters.values()), head_n=head_n
+                )
+                for module_name, response_t in zip(shared_reporters.keys(), rets):
+                    self.add_reporter_response(response, module_name, response_t)
+            for module_name, result in results.items():
+                self.add_reporter_response(response, module_name, result.get())
+            if pool:
+                pool.close()
+                pool.join()
+        except BaseException:
+            if pool:
+                pool.terminate()
+            raise
+
+    async def make_report_filter_tables(self, arg_dict: Dict[str, Any]):
+        from .report_filter import ReportFilter
+
+        if not arg_dict.get("filtersql") and not arg_dict.get("filterpath"):
+            return
+        cf = await ReportFilter.create(dbpath=arg_dict["dbpath"], strict=False)
+        try:
+            await cf.exec_db(
+                cf.loadfilter,
+                filterpath=arg_dict.get("filterpath"),
+                filtersql=arg_dict.get("filtersql"),
+                includesample=[],
+            )
+            await cf.make_ftables_and_ftable_uid()
+        finally:
+            await cf.close_db()
+
+    def add_reporter_response(
+        self, response: Dict[str, Any], module_name: str, response_t: Any
+    ):
+        from ..util.run import update_status
+
+        output_fns = None
+        if isinstance(response_t, list):
+            output_fns = " ".join(response_t)
+        elif isinstance(response_t, str):
+            output_fns = response_t
+        if output_fns is not None:
+            update_status(
+                f"report created: {output_fns} ",
+                logger=self.logger,
+                serveradmindb=self.serveradmindb,
+            )
+        report_type: str = module_name.replace("reporter", "")
+        response[report_type] = response_t
+
     def should_run_step(self, step: str):
         return (
             self.endlevel >= self.runlevels[step]
@@ -2138,34 +2701,84 @@ class Runner(object):
         step = "converter"
         if not self.should_run_step("converter"):
             return
+        if self.reuse_converter_output(run_no):
+            return
         await self.log_time_of_func(self.run_converter, run_no, work=f"{step} step")
+        self.converter_ran = True
         if self.total_num_unique_variants == 0:
             msg = "No variant found in input"
             update_status(msg, logger=self.logger, serveradmindb=self.serveradmindb)
             if self.logger:
                 self.logger.info(msg)
 
+    def reuse_converter_output(self, run_no: int) -> bool:
+        from ..util.run import update_status
+
+        if not self.run_manifest:
+            return False
+        if self.can_reuse_stage("converter"):
+            entry = self.run_manifest.get_stage("converter") or {}
+            self.total_num_unique_variants = entry.get("total_num_unique_variants", 0)
+            self.converter_format = entry.get("converter_format") or []
+            self.genome_assemblies[run_no] = entry.get("genome_assemblies") or []
+            update_status(
+                "reusing converter output",
+                logger=self.logger,
+                serveradmindb=self.serveradmindb,
+            )
+            return True
+        # Inputs for the annotators and the aggregator are made from the
+        # result database if needed.
+        return self.incremental_db
+
     async def do_step_preparer(self, run_no: int):
         step = "preparer"
         if not self.should_run_step(step):
             return
+        if (
+            self.run_manifest
+            and not self.converter_ran
+            and self.should_run_step("converter")
+        ):
+            return
         await self.log_time_of_func(self.run_preparers, run_no, work=f"{step} step")
 
     async def do_step_mapper(self, run_no: int):
         step = "mapper"
         self.mapper_ran = False
+        if self.reuse_mapper_output():
+            return
         if self.should_run_step("mapper"):
             await self.log_time_of_func(self.run_mapper, run_no, work=f"{step} step")
             self.mapper_ran = True
 
+    def reuse_mapper_output(self) -> bool:
+        from ..util.run import update_status
+
+        if not self.run_manifest or not self.should_run_step("mapper"):
+            return False
+        if self.incremental_db:
+            return True
+        if self.can_reuse_stage("mapper"):
+            update_status(
+                "reusing mapper output",
+                logger=self.logger,
+                serveradmindb=self.serveradmindb,
+            )
+            return True
+        return False
+
     async def do_step_annotator(self, run_no: int):
         step = "annotator"
         self.annotator_ran = False
         self.done_annotators = {}
         self.populate_secondary_annotators(run_no)
-        for mname, module in self.annotators.items():
-            if self.check_module_output(module, run_no) is not None:
-                self.done_annotators[mname] = module
+        if self.run_manifest:
+            self.set_done_annotators_from_manifest(run_no)
+        else:
+            for mname, module in self.annotators.items():
+                if self.check_module_output(module, run_no) is not None:
+                    self.done_annotators[mname] = module
         self.annotators_to_run = {
             aname: self.annotators[aname]
             for aname in set(self.annotators) - set(self.done_annotators)
@@ -2178,14 +2791,71 @@ class Runner(object):
             )
             self.annotator_ran = True
 
+    def set_done_annotators_from_manifest(self, run_no: int):
+        """Annotators are done if their outputs were made with the same
+        fingerprints, or, if the result database is reused, if it has their
+        outputs with the same fingerprints. The others run and, if the result
+        database is reused, are merged into it."""
+        from ..util.run import update_status
+
+        if not self.run_manifest:
+            return
+        db_annotators = {}
+        if self.incremental_db:
+            entry = self.run_manifest.get_stage("aggregator") or {}
+            db_annotators = entry.get("annotators", {})
+            self.annotators_to_merge = []
+        for mname, module in self.annotators.items():
+            fingerprint = self.get_annotator_fingerprint(module)
+            in_db = db_annotators.get(mname) == fingerprint
+            if self.incremental_db and not in_db:
+                self.annotators_to_merge.append(mname)  # type: ignore
+            if in_db or self.can_reuse_stage(f"annotator:{mname}"):
+                self.done_annotators[mname] = module
+        self.undo_secondaries_without_output(run_no)
+        if self.done_annotators:
+            update_status(
+                "reusing outputs of " + ", ".join(sorted(self.done_annotators)),
+                logger=self.logger,
+                serveradmindb=self.serveradmindb,
+            )
+        if self.annotators_to_merge:
+            self.regenerate_from_db(run_no, dbpath=self.get_dbpath(run_no))
+
+    def undo_secondaries_without_output(self, run_no: int):
+        """An annotator which is done only because its columns are in the
+        result database has no output file unless temporary files were kept.
+        Annotators which run again read the output files of their secondary
+        annotators, so such secondary annotators run again as well."""
+        rerun_mnames = [
+            mname for mname in self.annotators if mname not in self.done_annotators
+        ]
+        while rerun_mnames:
+            module = self.annotators[rerun_mnames.pop()]
+            for sname in module.secondary_module_names:
+                if sname not in self.done_annotators:
+                    continue
+                if self.check_module_output(self.annotators[sname], run_no):
+                    continue
+                del self.done_annotators[sname]
+                if self.annotators_to_merge is not None:
+                    if sname not in self.annotators_to_merge:
+                        self.annotators_to_merge.append(sname)
+                rerun_mnames.append(sname)
+
     async def do_step_aggregator(self, run_no: int):
         step = "aggregator"
         self.aggregator_ran = False
-        if self.should_run_step(step) and (
-            self.mapper_ran
-            or self.annotator_ran
-            or self.startlevel == self.runlevels["aggregator"]
-        ):
+        if self.incremental_db:
+            should_aggregate = bool(self.annotators_to_merge)
+        else:
+            should_aggregate = (
+                self.mapper_ran
+                or self.annotator_ran
+                or self.startlevel == self.runlevels["aggregator"]
+            )
+        if self.should_run_step(step) and should_aggregate:
+            self.invalidate_result_db(run_no)
             self.result_path = await self.log_time_of_func(
                 self.run_aggregator, run_no, work=f"{step} step"
             )
@@ -2195,6 +2865,7 @@ class Runner(object):
     async def do_step_postaggregator(self, run_no: int):
         step = "postaggregator"
         if self.should_run_step(step):
+            self.invalidate_result_db(run_no)
             await self.log_time_of_func(
                 self.run_postaggregators, run_no, work=f"{step} step"
             )
@@ -2206,6 +2877,28 @@ class Runner(object):
                 self.run_reporter, run_no, work=f"{step} step"
             )
 
+    async def do_step_parquet(self, run_no: int):
+        if not self.args or not getattr(self.args, "write_parquet", False):
+            return
+        await self.log_time_of_func(
+            self.write_parquet_sidecars, run_no, work="parquet step"
+        )
+
+    async def write_parquet_sidecars(self, run_no: int):
+        from ..util.util import write_parquet_sidecar
+        from ..consts import PARQUET_SIDECAR_TABLES
+
+        dbpath = self.get_dbpath(run_no)
+        if not Path(dbpath).exists():
+            return
+        num_workers = self.get_num_workers()
+        for table_name in PARQUET_SIDECAR_TABLES:
+            parquet_path = write_parquet_sidecar(
+                dbpath, table_name=table_name, num_cores=num_workers
+            )
+            if parquet_path and self.logger:
+                self.logger.info(f"wrote {parquet_path}")
+
     async def log_time_of_func(self, func, *args, work="", **kwargs):
         from time import time
         from ..util.run import update_status
@@ -51,6 +51,7 @@ from typing import List
 
 class VCF2VCF:
     OV_PREFIX: str = "OV_"
+    LINES_PER_CHUNK: int = 10000
 
     def __init__(
         self,
@@ -61,6 +62,8 @@ class VCF2VCF:
         annotator_names: List[str] = [],
         genome: Optional[str] = None,
         mapper_name: Optional[str] = None,
+        num_workers: int = 1,
+        bgzip: bool = False,
         serveradmindb=None,
         outer=None,
         **kwargs,
@@ -73,6 +76,7 @@ class VCF2VCF:
         fp = sys.modules[self.__module__].__file__
         if fp is None:
             raise ModuleLoadingError(module_name=self.__module__)
+        self.script_path = fp
         self.primary_input_path = None
         self.logger = None
         self.error_logger = None
@@ -96,6 +100,8 @@ class VCF2VCF:
         self.annotator_names = annotator_names
         self.mapper_name = mapper_name
         self.run_name = run_name
+        self.num_workers = num_workers or 1
+        self.bgzip = bgzip
         self.setup_logger()
         self.setup_liftover()
         self.serveradmindb = serveradmindb
@@ -219,180 +225,337 @@ class VCF2VCF:
             return
         cur_time = time()
         if lnum % 100000 == 0 or cur_time - self.last_status_update_time > 10:
-            status = "Running {self.conf['title']} ({self.module_name}): line {lnum}"
+            status = f"Running {self.module_name}: line {lnum}"
             update_status(status, logger=self.logger, serveradmindb=self.serveradmindb)
             self.last_status_update_time = cur_time
 
-    def run(self):
+    def setup_col_infos(self):
+        self.col_infos = self.load_col_infos(self.annotator_names, self.mapper_name)
+        self.all_col_names = self.get_all_col_names(self.col_infos, self.mapper_name)
+
+    def setup_modules(self):
         from re import compile
+        from oakvar.lib.module.local import load_modules
+
+        self.base_re = compile("^[*]|[ATGC]+|[-]+$")
+        self.modules = load_modules(
+            annotators=self.annotator_names, mapper=self.mapper_name
+        )
+        self.mapper = self.modules[self.mapper_name]
+
+    def get_output_path(self, p):
+        output_suffix = ".vcf.gz" if self.bgzip else ".vcf"
+        if self.run_name:
+            if len(self.inputs) == 1:
+                return self.output_dir / (self.run_name + output_suffix)
+            return self.output_dir / (p.name + "." + self.run_name + output_suffix)
+        return p.with_name(p.name + output_suffix)
+
+    def write_header(self, f, wf):
+        f.seek(0)
+        for line in f:
+            if line.startswith("##"):
+                wf.write(line)
+            else:
+                break
+        for module_name in [self.mapper_name] + self.annotator_names:
+            prefix = "base" if module_name == self.mapper_name else module_name
+            col_info = self.col_infos[module_name]
+            for col in col_info:
+                wf.write(
+                    f"##INFO=<ID={self.OV_PREFIX}{prefix}__{col['name']},Number=A,Type={col['type'].capitalize()},Description=\"{col['title']}\">\n"
+                )
+        f.seek(0)
+        for line in f:
+            if line.startswith("#CHROM"):
+                wf.write(line)
+                break
+
+    def get_num_line_uids(self, line: str) -> int:
+        toks = line.split("\t", 5)
+        if len(toks) < 5:
+            return 0
+        return len([alt for alt in toks[4].split(",") if "<" not in alt])
+
+    def get_chunks(self, f):
+        """Yields lists of VCF body lines with the uid before the first
+        variant and the line number before the first line of each list, so
+        that chunks can be annotated independently with the same uids as a
+        sequential run."""
+        read_lnum = 0
+        uid = 0
+        lines = []
+        start_uid = 0
+        start_lnum = 0
+        for line in f:
+            lines.append(line)
+            uid += self.get_num_line_uids(line)
+            read_lnum += 1
+            if len(lines) == self.LINES_PER_CHUNK:
+                yield lines, start_uid, start_lnum
+                lines = []
+                start_uid = uid
+                start_lnum = read_lnum
+        if lines:
+            yield lines, start_uid, start_lnum
+
+    def add_line_error(self, errors: list, lnum: int, line: str, e: Exception):
+        import traceback
+
+        err_str = traceback.format_exc().rstrip()
+        if err_str.endswith("None"):
+            err_str = str(e)
+        errors.append((lnum, line, err_str, str(e)))
+
+    def log_line_errors(self, errors: list):
+        for lnum, line, err_str, e_str in errors:
+            if self.logger and err_str not in self.unique_excs:
+                self.unique_excs.append(err_str)
+                self.logger.error(err_str)
+            if self.error_logger:
+                self.error_logger.error(
+                    "\n[{:d}]{}\n({})\n#".format(lnum, line.rstrip(), e_str)
+                )
+
+    def get_index_record(self, vcf_toks: List[str]):
+        beg = int(vcf_toks[1]) - 1
+        end = beg + len(vcf_toks[3])
+        if "END=" in vcf_toks[7]:
+            for tok in vcf_toks[7].split(";"):
+                if tok.startswith("END="):
+                    try:
+                        end = int(tok[4:])
+                    except ValueError:
+                        pass
+                    break
+        return vcf_toks[0], beg, end
+
+    def annotate_lines(self, lines: List[str], start_uid: int, start_lnum: int):
+        """Annotates a chunk of VCF body lines. Returns the output text, the
+        index records (sequence name, begin, end, and byte length) of the
+        output lines if bgzip output is made, the errors, and whether an
+        error halted the run."""
         from oakvar.lib.util.seq import normalize_variant_dict_left
         from oakvar.lib.util.seq import liftover
-        from oakvar.lib.module.local import load_modules
-        from oakvar.lib.util.run import log_variant_exception
         from oakvar.lib.exceptions import IgnoredVariant
 
+        out_lines = []
+        index_records = []
+        errors = []
+        halt = False
+        uid = start_uid
+        read_lnum = start_lnum
+        for line in lines:
+            read_lnum += 1
+            line_uid = uid
+            try:
+                vcf_toks = line[:-1].split("\t")
+                chrom = vcf_toks[0]
+                if not chrom.startswith("chr"):
+                    chrom = "chr" + chrom
+                pos = int(vcf_toks[1])
+                ref = vcf_toks[3]
+                alts = vcf_toks[4].split(",")
+                variants = []
+                for alt in alts:
+                    if "<" in alt:
+                        continue
+                    pos, ref, alt = self.trim_variant(pos, ref, alt)
+                    if self.do_liftover:
+                        _, pos, ref, alt = liftover(
+                            chrom, pos, ref, alt, lifter=self.lifter
+                        )
+                    uid += 1
+                    variant = {"uid": uid}
+                    if ref == alt:
+                        pass
+                    elif alt == "*":
+                        pass
+                    else:
+                        if not self.base_re.fullmatch(alt):
+                            self.add_line_error(
+                                errors,
+                                read_lnum,
+                                line,
+                                IgnoredVariant("Invalid alternate base"),
+                            )
+                        else:
+                            variant = {
+                                "uid": uid,
+                                "chrom": chrom,
+                                "pos": pos,
+                                "strand": "+",
+                                "ref_base": ref,
+                                "alt_base": alt,
+                            }
+                            variant = normalize_variant_dict_left(variant)
+                            res = self.mapper.map(variant)
+                            res = self.mapper.live_report_substitute(res)
+                            if res:
+                                variant.update(res)
+                            for module_name in self.annotator_names:
+                                res = self.modules[module_name].annotate(variant)
+                                if res:
+                                    variant.update(
+                                        {
+                                            module_name + "__" + k: v
+                                            for k, v in res.items()
+                                        }
+                                    )
+                    variants.append(variant)
+                out_line = self.get_output_line(vcf_toks, variants)
+                out_lines.append(out_line)
+                if self.bgzip:
+                    index_records.append(
+                        self.get_index_record(vcf_toks) + (len(out_line.encode()),)
+                    )
+            except Exception as e:
+                # Skips the uids of the whole line, as get_chunks does.
+                uid = line_uid + self.get_num_line_uids(line)
+                self.add_line_error(errors, read_lnum, line, e)
+                if hasattr(e, "halt") and getattr(e, "halt"):
+                    halt = True
+                    break
+        return "".join(out_lines), index_records, errors, halt
+
+    def get_output_line(self, vcf_toks: List[str], variants: List[dict]) -> str:
+        out = ["\t".join(vcf_toks[:7])]
+        if vcf_toks[7] == ".":
+            out.append("\t")
+        else:
+            out.append("\t")
+            out.append(vcf_toks[7])
+            out.append(";")
+        for col_name in self.all_col_names:
+            if col_name in [
+                "chrom",
+                "pos",
+                "strand",
+                "ref_base",
+                "alt_base",
+                "sample_id",
+            ]:
+                continue
+            values = []
+            has_value: bool = False
+            for variant in variants:
+                value = variant.get(col_name)
+                if value is None:
+                    value = ""
+                else:
+                    vt = type(value)
+                    if vt == int or vt == float:
+                        value = str(value)
+                    else:
+                        if vt != str:
+                            value = str(value)
+                        value = self.escape_vcf_value(value)
+                values.append(value)
+                if value and value != "{}":
+                    has_value = True
+            if not has_value:
+                continue
+            if "__" not in col_name:
+                col_name = "base__" + col_name
+            out.append(self.OV_PREFIX + col_name + "=" + ",".join(values))
+            if col_name != self.all_col_names[-1]:
+                out.append(";")
+        out.append("\t" + "\t".join(vcf_toks[8:]) + "\n")
+        return "".join(out)
+
+    def get_worker_kwargs(self) -> dict:
+        return {
+            "inputs": [str(p) for p in self.inputs],
+            "run_name": self.run_name,
+            "output_dir": str(self.output_dir),
+            "module_options": self.module_options,
+            "annotator_names": self.annotator_names,
+            "genome": self.genome,
+            "mapper_name": self.mapper_name,
+            "bgzip": self.bgzip,
+        }
+
+    def annotate_chunks_with_processes(self, f):
+        from multiprocessing import get_context
+        from threading import BoundedSemaphore
+        from oakvar.lib.base.mp_runners import init_vcf2vcf_worker
+        from oakvar.lib.base.mp_runners import vcf2vcf_chunk_runner
+
+        # Bounds the number of annotated chunks waiting to be written.
+        pending = BoundedSemaphore(self.num_workers * 2)
+
+        def throttled_chunks():
+            for chunk in self.get_chunks(f):
+                pending.acquire()
+                yield chunk
+
+        with get_context("spawn").Pool(
+            self.num_workers,
+            init_vcf2vcf_worker,
+            (self.script_path, self.get_worker_kwargs()),
+        ) as pool:
+            for result in pool.imap(vcf2vcf_chunk_runner, throttled_chunks()):
+                pending.release()
+                yield result
+
+    def annotate_chunks(self, f):
+        if self.num_workers > 1:
+            yield from self.annotate_chunks_with_processes(f)
+            return
+        for lines, start_uid, start_lnum in self.get_chunks(f):
+            yield self.annotate_lines(lines, start_uid, start_lnum)
+
+    def run(self):
+        from time import time
+        from oakvar.lib.util.bgzf import BgzfWriter
+        from oakvar.lib.util.bgzf import TabixIndexer
+
         if not self.mapper_name or not self.inputs:
             return False
-        base_re = compile("^[*]|[ATGC]+|[-]+$")
-        modules = load_modules(annotators=self.annotator_names, mapper=self.mapper_name)
-        col_infos = self.load_col_infos(self.annotator_names, self.mapper_name)
-        all_col_names = self.get_all_col_names(col_infos, self.mapper_name)
-        mapper = modules[self.mapper_name]
-        output_suffix = ".vcf"
+        self.setup_col_infos()
+        # With worker processes, modules are loaded only in the workers.
+        if self.num_workers == 1:
+            self.setup_modules()
         for p in self.inputs:
             if self.logger:
                 self.logger.info(f"processing {p}")
-            if self.run_name:
-                if len(self.inputs) == 1:
-                    outpath = self.output_dir / (self.run_name + output_suffix)
-                else:
-                    outpath = self.output_dir / (
-                        p.name + "." + self.run_name + output_suffix
-                    )
-            else:
-                outpath = p.with_name(p.name + output_suffix)
+            outpath = self.get_output_path(p)
             f = open(p)
-            wf = open(outpath, "w", 1024 * 128)
-            f.seek(0)
-            for line in f:
-                if line.startswith("##"):
-                    wf.write(line)
+            if self.bgzip:
+                wf = BgzfWriter(outpath)
+                indexer = TabixIndexer()
+            else:
+                wf = open(outpath, "w", 1024 * 128)
+                indexer = None
+            self.write_header(f, wf)
+            self.last_status_update_time = time()
+            read_lnum = 0
+            for text, index_records, errors, halt in self.annotate_chunks(f):
+                if isinstance(wf, BgzfWriter) and indexer:
+                    upos = wf.uncompressed_size
+                    wf.write(text)
+                    for name, beg, end, num_bytes in index_records:
+                        voff_beg = wf.get_virtual_offset(upos)
+                        upos += num_bytes
+                        indexer.add(
+                            name, beg, end, voff_beg, wf.get_virtual_offset(upos)
+                        )
                 else:
+                    wf.write(text)
+                self.log_line_errors(errors)
+                if halt:
                     break
-            for module_name in [self.mapper_name] + self.annotator_names:
-                prefix = "base" if module_name == self.mapper_name else module_name
-                col_info = col_infos[module_name]
-                for col in col_info:
-                    wf.write(
-                        f"##INFO=<ID={self.OV_PREFIX}{prefix}__{col['name']},Number=A,Type={col['type'].capitalize()},Description=\"{col['title']}\">\n"
-                    )
-            f.seek(0)
-            for line in f:
-                if line.startswith("#CHROM"):
-                    wf.write(line)
-                    break
-            read_lnum = 0
-            uid = 0
-            for line in f:
-                try:
-                    read_lnum += 1
-                    vcf_toks = line[:-1].split("\t")
-                    chrom = vcf_toks[0]
-                    if not chrom.startswith("chr"):
-                        chrom = "chr" + chrom
-                    pos = int(vcf_toks[1])
-                    ref = vcf_toks[3]
-                    alts = vcf_toks[4].split(",")
-                    if read_lnum % 100000 == 0:
-                        if self.logger:
-                            self.logger.info(
-                                f"{read_lnum}: {chrom} {pos} {ref} {vcf_toks[4]}"
-                            )
-                    variants = []
-                    for alt in alts:
-                        if "<" in alt:
-                            continue
-                        pos, ref, alt = self.trim_variant(pos, ref, alt)
-                        if self.do_liftover:
-                            _, pos, ref, alt = liftover(
-                                chrom, pos, ref, alt, lifter=self.lifter
-                            )
-                        uid += 1
-                        variant = {"uid": uid}
-                        if ref == alt:
-                            pass
-                        elif alt == "*":
-                            pass
-                        else:
-                            if not base_re.fullmatch(alt):
-                                log_variant_exception(
-                                    lnum=read_lnum,
-                                    line=line,
-                                    unique_excs=self.unique_excs,
-                                    logger=self.logger,
-                                    error_logger=self.error_logger,
-                                    e=IgnoredVariant("Invalid alternate base"),
-                                )
-                            else:
-                                variant = {
-                                    "uid": uid,
-                                    "chrom": chrom,
-                                    "pos": pos,
-                                    "strand": "+",
-                                    "ref_base": ref,
-                                    "alt_base": alt,
-                                }
-                                variant = normalize_variant_dict_left(variant)
-                                res = mapper.map(variant)
-                                res = mapper.live_report_substitute(res)
-                                if res:
-                                    variant.update(res)
-                                for module_name in self.annotator_names:
-                                    res = modules[module_name].annotate(variant)
-                                    if res:
-                                        variant.update(
-                                            {
-                                                module_name + "__" + k: v
-                                                for k, v in res.items()
-                                            }
-                                        )
-                        variants.append(variant)
-                    wf.write("\t".join(vcf_toks[:7]))
-                    if vcf_toks[7] == ".":
-                        wf.write("\t")
-                    else:
-                        wf.write("\t")
-                        wf.write(vcf_toks[7])
-                        wf.write(";")
-                    for col_name in all_col_names:
-                        if col_name in [
-                            "chrom",
-                            "pos",
-                            "strand",
-                            "ref_base",
-                            "alt_base",
-                            "sample_id",
-                        ]:
-                            continue
-                        values = []
-                        has_value: bool = False
-                        for variant in variants:
-                            value = variant.get(col_name)
-                            if value is None:
-                                value = ""
-                            else:
-                                vt = type(value)
-                                if vt == int or vt == float:
-                                    value = str(value)
-                                else:
-                                    if vt != str:
-                                        value = str(value)
-                                    value = self.escape_vcf_value(value)
-                            values.append(value)
-                            if value and value != "{}":
-                                has_value = True
-                        if not has_value:
-                            continue
-                        if "__" not in col_name:
-                            col_name = "base__" + col_name
-                        wf.write(self.OV_PREFIX + col_name + "=" + ",".join(values))
-                        if col_name != all_col_names[-1]:
-                            wf.write(";")
-                    wf.write("\t" + "\t".join(vcf_toks[8:]) + "\n")
-                except Exception as e:
-                    print(e)
-                    log_variant_exception(
-                        lnum=read_lnum,
-                        line=line,
-                        unique_excs=self.unique_excs,
-                        logger=self.logger,
-                        error_logger=self.error_logger,
-                        e=e,
-                    )
-                    if hasattr(e, "halt") and getattr(e, "halt"):
-                        break
+                read_lnum += self.LINES_PER_CHUNK
+                self.log_progress(read_lnum)
             f.close()
             wf.close()
+            if indexer:
+                if indexer.sorted:
+                    indexer.write(str(outpath) + ".tbi")
+                elif self.logger:
+                    self.logger.warning(
+                        f"{outpath} was not indexed because {p} is not sorted by position."
+                    )
 
     def setup_logger(self):
         import logging
@@ -444,6 +607,19 @@ if __name__ == "__main__":
         nargs=1,
         help="mapper module name",
     )
+    parser.add_argument(
+        "--mp",
+        dest="num_workers",
+        type=int,
+        default=1,
+        help="number of worker processes",
+    )
+    parser.add_argument(
+        "--bgzip",
+        action="store_true",
+        default=False,
+        help="write bgzip-compressed output with a tabix index",
+    )
     parser.add_argument(
         "--quiet",
         action="store_true",
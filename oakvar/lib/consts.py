@@ -108,10 +108,18 @@ for g in ["hg18", "hg19"]:
 result_db_suffix = ".sqlite"
 LOG_SUFFIX = ".log"
 ERROR_LOG_SUFFIX = ".err"
+RUN_MANIFEST_SUFFIX = ".manifest.json"
+RUN_MANIFEST_TOKEN_KEY = "run_manifest_token"
+PARQUET_DB_SIGNATURE_KEY = "oakvar_db_signature"
+PARQUET_SIDECAR_TABLES = ["variant", "gene", "sample"]
+MODULE_INDEX_FNAME = "module_index.json"
+MODULE_INDEX_VERSION = 1
 
 JOB_STATUS_UPDATE_INTERVAL = 10  # seconds
+JOB_STATUS_WRITE_INTERVAL = 2  # seconds
 JOB_STATUS_FINISHED = "Finished"
 JOB_STATUS_ERROR = "Error"
 
 MODULE_OPTIONS_KEY = "module_options"
+CHUNKED_RUN_KEY = "chunked_run"
 SYSTEM_GENOME_ASSEMBLY = "hg38"
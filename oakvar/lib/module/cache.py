@@ -45,6 +45,9 @@
 # OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 # SOFTWARE.
 
+from typing import Any
+from typing import Optional
+from typing import List
 from typing import Dict
 from typing import Union
 from pathlib import Path
@@ -119,6 +122,7 @@ class ModuleCache(object):
 
     def update_local(self):
         import os
+        from pathlib import Path
         from ..consts import install_tempdir_name
         from ..system import get_modules_dir
         from ..exceptions import SystemMissingException
@@ -129,6 +133,13 @@ class ModuleCache(object):
             raise SystemMissingException(msg="Modules directory is not set")
         if not (os.path.exists(self._modules_dir)):
             return None
+        index = load_module_index(self._modules_dir)
+        new_index = {
+            "modules_dir": str(self._modules_dir),
+            "groups": {},
+            "modules": {},
+        }
+        changed: bool = False
         for mg in os.listdir(self._modules_dir):
             if mg == install_tempdir_name:
                 continue
@@ -140,18 +151,42 @@ class ModuleCache(object):
                 or basename.startswith("_")
             ):
                 continue
-            for module_name in os.listdir(mg_path):
-                if module_name == "hgvs":  # deprecate hgvs
-                    continue
+            # Module directories of a group are listed again only if the
+            # group directory changed, which adding or removing one does.
+            mg_mtime = os.stat(mg_path).st_mtime_ns
+            group_entry = index["groups"].get(mg_path)
+            if group_entry and group_entry["mtime_ns"] == mg_mtime:
+                module_names = group_entry["module_names"]
+            else:
+                module_names = get_module_dir_names(mg_path)
+                changed = True
+            new_index["groups"][mg_path] = {
+                "mtime_ns": mg_mtime,
+                "module_names": module_names,
+            }
+            for module_name in module_names:
                 module_dir = os.path.join(mg_path, module_name)
-                if (
-                    module_dir.startswith(".") is False
-                    and os.path.isdir(module_dir)
-                    and not module_name.startswith(".")
-                    and not module_name.startswith("_")
-                    and os.path.exists(os.path.join(module_dir, module_name + ".yml"))
-                ):
-                    self.local[module_name] = module_dir
+                signature = get_module_dir_signature(module_dir, module_name)
+                if signature is None:
+                    continue
+                module_entry = index["modules"].get(module_dir)
+                if module_entry and module_entry["signature"] == signature:
+                    module = LocalModule(
+                        Path(module_dir), index_state=module_entry["state"]
+                    )
+                    state = module_entry["state"]
+                else:
+                    module = LocalModule(Path(module_dir))
+                    state = module.get_index_state()
+                    changed = True
+                self.local[module_name] = module
+                if state is not None:
+                    new_index["modules"][module_dir] = {
+                        "signature": signature,
+                        "state": state,
+                    }
+        if changed or new_index["modules"].keys() != index["modules"].keys():
+            save_module_index(new_index)
 
     def get_remote_readme(self, module_name, version=None):
         from .remote import get_readme
@@ -165,6 +200,89 @@ class ModuleCache(object):
         return readme
 
 
+def get_module_dir_names(mg_path: str) -> List[str]:
+    import os
+
+    module_names = []
+    for module_name in os.listdir(mg_path):
+        if module_name == "hgvs":  # deprecate hgvs
+            continue
+        if module_name.startswith(".") or module_name.startswith("_"):
+            continue
+        if os.path.isdir(os.path.join(mg_path, module_name)):
+            module_names.append(module_name)
+    return module_names
+
+
+def get_module_dir_signature(module_dir: str, module_name: str) -> Optional[list]:
+    """Returns the modification times of a module directory and its yml
+    file and the size of the yml file, or None if it has no yml file. The
+    directory's modification time changes when files are added to or
+    removed from it, and the yml file's when it is edited in place."""
+    import os
+
+    try:
+        dir_stat = os.stat(module_dir)
+        yml_stat = os.stat(os.path.join(module_dir, module_name + ".yml"))
+    except OSError:
+        return None
+    return [dir_stat.st_mtime_ns, yml_stat.st_mtime_ns, yml_stat.st_size]
+
+
+def get_module_index_path() -> Optional[Path]:
+    from ..system import get_conf_dir
+    from ..consts import MODULE_INDEX_FNAME
+
+    conf_dir = get_conf_dir()
+    if not conf_dir:
+        return None
+    return conf_dir / MODULE_INDEX_FNAME
+
+
+def load_module_index(modules_dir: Path) -> Dict[str, Any]:
+    """Loads the index of installed modules saved in the conf directory by
+    an earlier update_local. An empty index is returned if there is none
+    or it is for another modules directory or index version."""
+    from json import load
+    from ..consts import MODULE_INDEX_VERSION
+
+    empty_index = {"groups": {}, "modules": {}}
+    index_path = get_module_index_path()
+    if not index_path or not index_path.exists():
+        return empty_index
+    try:
+        with open(index_path) as f:
+            index = load(f)
+    except (OSError, ValueError):
+        return empty_index
+    if (
+        not isinstance(index, dict)
+        or index.get("version") != MODULE_INDEX_VERSION
+        or index.get("modules_dir") != str(modules_dir)
+    ):
+        return empty_index
+    return index
+
+
+def save_module_index(index: Dict[str, Any]):
+    import os
+    from json import dump
+    from ..consts import MODULE_INDEX_VERSION
+
+    index_path = get_module_index_path()
+    if not index_path or not index_path.parent.exists():
+        return
+    index["version"] = MODULE_INDEX_VERSION
+    tmp_path = index_path.with_name(f"{index_path.name}.{os.getpid()}.tmp")
+    try:
+        with open(tmp_path, "w") as wf:
+            dump(index, wf)
+        os.replace(tmp_path, index_path)
+    except OSError:
+        if tmp_path.exists():
+            tmp_path.unlink()
+
+
 def get_module_cache(fresh=False) -> ModuleCache:
     global module_cache
     if not module_cache or fresh:
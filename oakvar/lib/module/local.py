@@ -55,9 +55,28 @@ from pathlib import Path
 
 
 class LocalModule(object):
-    def __init__(self, dir_path: Path, __module_type__=None, name=None):
+    # Read from the module directory on first access.
+    LAZY_FIELDS: List[str] = [
+        "test_dir_exists",
+        "tests",
+        "readme_exists",
+        "readme",
+        "has_logo",
+    ]
+
+    def __init__(
+        self,
+        dir_path: Path,
+        __module_type__=None,
+        name=None,
+        index_state: Optional[Dict[str, Any]] = None,
+    ):
+        """index_state is the output of get_index_state for the same
+        module directory, unchanged since. It is used instead of reading
+        the module's yml file and checking its files."""
         from ..util.util import load_yml_conf
         from ..store import get_developer_dict
+        from ..consts import CHUNKED_RUN_KEY
 
         self.directory = Path(dir_path).absolute()
         if not name:
@@ -65,33 +84,37 @@ class LocalModule(object):
         else:
             self.name = name
         self.script_path = self.directory / (self.name + ".py")
-        self.script_exists = self.script_path.exists()
         self.conf_path = self.directory / (self.name + ".yml")
-        self.conf_exists = self.conf_path.exists()
-        self.exists = self.conf_exists
-        startofinstall_path = self.directory / "startofinstall"
-        if startofinstall_path.exists():
-            endofinstall_path = self.directory / "endofinstall"
-            if endofinstall_path.exists():
-                self.exists = True
-            else:
-                self.exists = False
         self.data_dir = dir_path / "data"
         self.test_dir = dir_path / "test"
-        self.test_dir_exists = self.test_dir.is_dir()
-        self.tests = self.get_tests()
         self.readme_path = self.directory / (self.name + ".md")
-        self.readme_exists = self.readme_path.exists()
-        if self.readme_exists:
-            with open(self.readme_path, encoding="utf-8") as f:
-                self.readme = f.read()
-        else:
-            self.readme = ""
         self.helphtml_path = self.directory / "help.html"
-        self.helphtml_exists = self.helphtml_path.exists()
+        self._test_dir_exists: Optional[bool] = None
+        self._tests: Optional[List[str]] = None
+        self._readme_exists: Optional[bool] = None
+        self._readme: Optional[str] = None
+        self._has_logo: Optional[bool] = None
         self.conf: dict = {}
-        if self.conf_exists:
-            self.conf = load_yml_conf(self.conf_path)
+        if index_state:
+            self.script_exists = index_state["script_exists"]
+            self.conf_exists = index_state["conf_exists"]
+            self.exists = index_state["exists"]
+            self.helphtml_exists = index_state["helphtml_exists"]
+            self.conf = index_state["conf"]
+        else:
+            self.script_exists = self.script_path.exists()
+            self.conf_exists = self.conf_path.exists()
+            self.exists = self.conf_exists
+            startofinstall_path = self.directory / "startofinstall"
+            if startofinstall_path.exists():
+                endofinstall_path = self.directory / "endofinstall"
+                if endofinstall_path.exists():
+                    self.exists = True
+                else:
+                    self.exists = False
+            self.helphtml_exists = self.helphtml_path.exists()
+            if self.conf_exists:
+                self.conf = load_yml_conf(self.conf_path)
         self.type = self.conf.get("type")
         self.code_version: Optional[str] = self.conf.get("code_version")
         if not self.code_version:
@@ -108,6 +131,11 @@ class LocalModule(object):
         self.level = self.conf.get("level")
         self.input_format = self.conf.get("input_format")
         self.secondary_module_names = list(self.conf.get("secondary_inputs", {}))
+        self.chunked_run: bool = (
+            self.type == "annotator"
+            and self.level == "variant"
+            and bool(self.conf.get(CHUNKED_RUN_KEY))
+        )
         if self.type == "annotator":
             if self.level == "variant":
                 self.output_suffix = self.name + ".var"
@@ -125,11 +153,65 @@ class LocalModule(object):
         self.installed = True
         self.local_code_version = self.code_version
         self.local_data_source = self.data_source
-        self.has_logo = (
-            get_logo_path(self.name, self.type, module_dir=self.directory) is not None
-        )
         self.publish_time = ""
 
+    @property
+    def test_dir_exists(self) -> bool:
+        if self._test_dir_exists is None:
+            self._test_dir_exists = self.test_dir.is_dir()
+        return self._test_dir_exists
+
+    @property
+    def tests(self) -> List[str]:
+        if self._tests is None:
+            self._tests = self.get_tests()
+        return self._tests
+
+    @property
+    def readme_exists(self) -> bool:
+        if self._readme_exists is None:
+            self._readme_exists = self.readme_path.exists()
+        return self._readme_exists
+
+    @property
+    def readme(self) -> str:
+        if self._readme is None:
+            if self.readme_exists:
+                with open(self.readme_path, encoding="utf-8") as f:
+                    self._readme = f.read()
+            else:
+                self._readme = ""
+        return self._readme
+
+    @property
+    def has_logo(self) -> bool:
+        if self._has_logo is None:
+            self._has_logo = (
+                get_logo_path(self.name, self.type, module_dir=self.directory)
+                is not None
+            )
+        return self._has_logo
+
+    def get_index_state(self) -> Optional[Dict[str, Any]]:
+        """Returns what is needed to make this LocalModule again without
+        reading its directory, or None if its conf cannot be stored in JSON
+        as is."""
+        from json import dumps
+        from json import loads
+
+        try:
+            if loads(dumps(self.conf)) != self.conf:
+                return None
+        except (TypeError, ValueError):
+            return None
+        return {
+            "script_exists": self.script_exists,
+            "conf_exists": self.conf_exists,
+            "exists": self.exists,
+            "helphtml_exists": self.helphtml_exists,
+            "conf": self.conf,
+        }
+
     def get_size(self):
         """
         Gets the total installed size of a module
@@ -175,9 +257,13 @@ class LocalModule(object):
     def serialize(self):
         d = {}
         for k, v in self.__dict__.items():
+            if k.startswith("_"):
+                continue
             if isinstance(v, Path):
                 v = str(v)
             d[k] = v
+        for k in self.LAZY_FIELDS:
+            d[k] = getattr(self, k)
         return d
 
 
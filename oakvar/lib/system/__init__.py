@@ -794,6 +794,30 @@ def get_max_num_concurrent_modules_per_job() -> int:
     return value
 
 
+def get_dedup_max_memory() -> int:
+    """Memory budget in bytes of the variant deduplication index of converter.
+    Configured in MB with `ov config system dedup_max_memory <value>`."""
+    from .consts import dedup_max_memory_key
+    from .consts import DEFAULT_DEDUP_MAX_MEMORY_MB
+
+    value = get_sys_conf_int_value(dedup_max_memory_key)
+    if not value:
+        value = DEFAULT_DEDUP_MAX_MEMORY_MB
+    return value * 1024 * 1024
+
+
+def get_intermediate_format() -> str:
+    """Format of the intermediate files of a job, "csv" or "arrow".
+    Configured with `ov config system intermediate_format <value>`."""
+    from .consts import intermediate_format_key
+    from .consts import DEFAULT_INTERMEDIATE_FORMAT
+
+    value = get_sys_conf_value(intermediate_format_key)
+    if value not in ["csv", "arrow"]:
+        value = DEFAULT_INTERMEDIATE_FORMAT
+    return str(value)
+
+
 def save_system_conf(conf: Dict):
     from .consts import sys_conf_path_key
     from oyaml import dump
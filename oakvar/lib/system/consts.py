@@ -84,6 +84,8 @@ max_num_concurrent_annotators_per_job_key = "max_num_concurrent_annotators_per_j
 max_num_concurrent_modules_per_job_key = "max_num_concurrent_modules_per_job"
 default_assembly_key = "default_assembly"
 report_filter_max_num_cache_per_user_key = "report_filter_max_num_cache_per_user"
+dedup_max_memory_key = "dedup_max_memory"
+intermediate_format_key = "intermediate_format"
 
 #
 # default system conf values
@@ -94,6 +96,8 @@ default_gui_port_ssl = 8443
 default_assembly = "hg38"
 default_postaggregator_names = ["tagsampler", "vcfinfo"]
 DEFAULT_REPORT_FILTER_MAX_NUM_CACHE_PER_USER = 20
+DEFAULT_DEDUP_MAX_MEMORY_MB = 4096
+DEFAULT_INTERMEDIATE_FORMAT = "csv"
 
 #
 # Server
@@ -0,0 +1,225 @@
+# OakVar
+#
+# Copyright (c) 2024 Oak Bioinformatics, LLC
+#
+# All rights reserved.
+#
+# Do not distribute or use this software without obtaining
+# a license from Oak Bioinformatics, LLC.
+#
+# Do not use this software to develop another software
+# which competes with the products by Oak Bioinformatics, LLC,
+# without obtaining a license for such use from Oak Bioinformatics, LLC.
+#
+# For personal use of non-commercial nature, you may use this software
+# after registering with `ov store account create`.
+#
+# For research use of non-commercial nature, you may use this software
+# after registering with `ov store account create`.
+#
+# For use by commercial entities, you must obtain a commercial license
+# from Oak Bioinformatics, LLC. Please write to info@oakbioinformatics.com
+# to obtain the commercial license.
+# ================
+# OpenCRAVAT
+#
+# MIT License
+#
+# Copyright (c) 2021 KarchinLab
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of
+# this software and associated documentation files (the "Software"), to deal in
+# the Software without restriction, including without limitation the rights to
+# use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies
+# of the Software, and to permit persons to whom the Software is furnished to do
+# so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+from typing import Optional
+from typing import List
+from typing import Dict
+from typing import Union
+from pathlib import Path
+
+BGZF_BLOCK_SIZE: int = 0xFF00
+BGZF_EOF: bytes = bytes.fromhex(
+    "1f8b08040000000000ff0600424302001b0003000000000000000000"
+)
+TABIX_FORMAT_VCF: int = 2
+TABIX_LINEAR_SHIFT: int = 14
+
+
+class BgzfWriter:
+    """Writes a BGZF file, the blocked gzip format of bgzip, which can be
+    read with any gzip reader and indexed with tabix.
+
+    Every block but the last holds exactly BGZF_BLOCK_SIZE uncompressed
+    bytes, so the virtual offset of any uncompressed position already
+    written can be looked up with get_virtual_offset.
+    """
+
+    def __init__(self, path: Union[Path, str], level: int = 6):
+        self.f = open(path, "wb")
+        self.level = level
+        self.buf = bytearray()
+        self.block_offsets: List[int] = []
+        self.compressed_size: int = 0
+        self.uncompressed_size: int = 0
+
+    def write(self, data: Union[str, bytes]):
+        if isinstance(data, str):
+            data = data.encode()
+        self.uncompressed_size += len(data)
+        start = 0
+        while start < len(data):
+            end = start + BGZF_BLOCK_SIZE - len(self.buf)
+            self.buf += data[start:end]
+            start = end
+            if len(self.buf) == BGZF_BLOCK_SIZE:
+                self.flush_block()
+
+    def flush_block(self):
+        from struct import pack
+        from zlib import compressobj
+        from zlib import crc32
+        from zlib import DEFLATED
+
+        if not self.buf:
+            return
+        compressor = compressobj(self.level, DEFLATED, -15)
+        cdata = compressor.compress(self.buf) + compressor.flush()
+        block_size = len(cdata) + 26
+        header = pack(
+            "<4BI2BH2BHH", 31, 139, 8, 4, 0, 0, 255, 6, 66, 67, 2, block_size - 1
+        )
+        footer = pack("<II", crc32(self.buf), len(self.buf))
+        self.f.write(header + cdata + footer)
+        self.block_offsets.append(self.compressed_size)
+        self.compressed_size += block_size
+        self.buf = bytearray()
+
+    def get_virtual_offset(self, pos: int) -> int:
+        block_no, within = divmod(pos, BGZF_BLOCK_SIZE)
+        if block_no < len(self.block_offsets):
+            block_offset = self.block_offsets[block_no]
+        else:
+            block_offset = self.compressed_size
+        return (block_offset << 16) | within
+
+    def tell(self) -> int:
+        return self.get_virtual_offset(self.uncompressed_size)
+
+    def close(self):
+        self.flush_block()
+        self.f.write(BGZF_EOF)
+        self.f.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_):
+        self.close()
+
+
+def reg2bin(beg: int, end: int) -> int:
+    end -= 1
+    if beg >> 14 == end >> 14:
+        return 4681 + (beg >> 14)
+    if beg >> 17 == end >> 17:
+        return 585 + (beg >> 17)
+    if beg >> 20 == end >> 20:
+        return 73 + (beg >> 20)
+    if beg >> 23 == end >> 23:
+        return 9 + (beg >> 23)
+    if beg >> 26 == end >> 26:
+        return 1 + (beg >> 26)
+    return 0
+
+
+class TabixIndexer:
+    """Builds a tabix index (.tbi) of a BGZF-compressed VCF file from the
+    sequence name, 0-based begin and end, and the virtual offsets of each
+    data line, added in file order. The file must be sorted by position
+    within each sequence, and each sequence must be contiguous. If it is not,
+    sorted becomes False and the index should not be written."""
+
+    def __init__(self):
+        self.names: List[str] = []
+        self.name_ids: Dict[str, int] = {}
+        self.bins: List[Dict[int, List[List[int]]]] = []
+        self.linear: List[List[Optional[int]]] = []
+        self.last_tid: int = -1
+        self.last_beg: int = -1
+        self.last_bin: int = -1
+        self.sorted: bool = True
+
+    def add(self, name: str, beg: int, end: int, voff_beg: int, voff_end: int):
+        if not self.sorted:
+            return
+        tid = self.name_ids.get(name)
+        if tid is None:
+            tid = len(self.names)
+            self.name_ids[name] = tid
+            self.names.append(name)
+            self.bins.append({})
+            self.linear.append([])
+        elif tid != self.last_tid or beg < self.last_beg:
+            self.sorted = False
+            return
+        if end <= beg:
+            end = beg + 1
+        bin_no = reg2bin(beg, end)
+        chunks = self.bins[tid].setdefault(bin_no, [])
+        if (
+            chunks
+            and tid == self.last_tid
+            and bin_no == self.last_bin
+            and chunks[-1][1] == voff_beg
+        ):
+            chunks[-1][1] = voff_end
+        else:
+            chunks.append([voff_beg, voff_end])
+        linear = self.linear[tid]
+        last_window = (end - 1) >> TABIX_LINEAR_SHIFT
+        if len(linear) <= last_window:
+            linear.extend([None] * (last_window + 1 - len(linear)))
+        for window in range(beg >> TABIX_LINEAR_SHIFT, last_window + 1):
+            if linear[window] is None:
+                linear[window] = voff_beg
+        self.last_tid = tid
+        self.last_beg = beg
+        self.last_bin = bin_no
+
+    def write(self, path: Union[Path, str]):
+        from struct import pack
+
+        names = b"".join([name.encode() + b"\0" for name in self.names])
+        data = [b"TBI\1", pack("<i", len(self.names))]
+        data.append(pack("<6i", TABIX_FORMAT_VCF, 1, 2, 0, ord("#"), 0))
+        data.append(pack("<i", len(names)) + names)
+        for bins, linear in zip(self.bins, self.linear):
+            data.append(pack("<i", len(bins)))
+            for bin_no, chunks in bins.items():
+                data.append(pack("<Ii", bin_no, len(chunks)))
+                for voff_beg, voff_end in chunks:
+                    data.append(pack("<QQ", voff_beg, voff_end))
+            offsets: List[int] = []
+            last_offset = 0
+            for offset in linear:
+                if offset is not None:
+                    last_offset = offset
+                offsets.append(last_offset)
+            data.append(pack(f"<i{len(offsets)}Q", len(offsets), *offsets))
+        data.append(pack("<Q", 0))
+        with BgzfWriter(path) as wf:
+            wf.write(b"".join(data))
@@ -0,0 +1,162 @@
+# OakVar
+#
+# Copyright (c) 2024 Oak Bioinformatics, LLC
+#
+# All rights reserved.
+#
+# Do not distribute or use this software without obtaining
+# a license from Oak Bioinformatics, LLC.
+#
+# Do not use this software to develop another software
+# which competes with the products by Oak Bioinformatics, LLC,
+# without obtaining a license for such use from Oak Bioinformatics, LLC.
+#
+# For personal use of non-commercial nature, you may use this software
+# after registering with `ov store account create`.
+#
+# For research use of non-commercial nature, you may use this software
+# after registering with `ov store account create`.
+#
+# For use by commercial entities, you must obtain a commercial license
+# from Oak Bioinformatics, LLC. Please write to info@oakbioinformatics.com
+# to obtain the commercial license.
+# ================
+# OpenCRAVAT
+#
+# MIT License
+#
+# Copyright (c) 2021 KarchinLab
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of
+# this software and associated documentation files (the "Software"), to deal in
+# the Software without restriction, including without limitation the rights to
+# use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies
+# of the Software, and to permit persons to whom the Software is furnished to do
+# so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+from typing import Optional
+from typing import Dict
+from pathlib import Path
+
+POS_BITS: int = 32
+CHROM_BITS: int = 32
+# Approximate bytes of a dict slot and its int value, not counting the key.
+ENTRY_OVERHEAD: int = 100
+
+
+class VariantDedupIndex:
+    """Maps chrom/pos/ref/alt of variants to their uids.
+
+    Keys are single ints made of an integer chromosome code, the position, and
+    the bytes of ref and alt, so lookups are exact and O(1). If the index grows
+    beyond max_memory bytes, its entries are spilled as a sorted run into a
+    SQLite file in spill_dir, and a bitmap filter of spilled keys keeps most
+    lookups of new variants off the disk.
+    """
+
+    def __init__(
+        self,
+        max_memory: int,
+        spill_dir: Optional[str] = None,
+        filter_bits: int = 1 << 27,
+    ):
+        self.max_memory = max_memory
+        self.spill_dir = spill_dir
+        self.filter_bits = filter_bits
+        self.chrom_codes: Dict[str, int] = {}
+        self.uids: Dict[int, int] = {}
+        self.memory: int = 0
+        self.spill_path: Optional[Path] = None
+        self.spill_conn = None
+        self.spill_filter: Optional[bytearray] = None
+        self.num_spills: int = 0
+
+    def get_key(self, chrom: str, pos: int, ref_base: str, alt_base: str) -> int:
+        chrom_code = self.chrom_codes.get(chrom)
+        if chrom_code is None:
+            chrom_code = len(self.chrom_codes)
+            self.chrom_codes[chrom] = chrom_code
+        alleles = int.from_bytes(f"{ref_base}:{alt_base}".encode(), "big")
+        return (alleles << (POS_BITS + CHROM_BITS)) | (chrom_code << POS_BITS) | pos
+
+    def get(self, key: int) -> Optional[int]:
+        uid = self.uids.get(key)
+        if uid is not None or self.spill_conn is None or self.spill_filter is None:
+            return uid
+        bit = hash(key) % self.filter_bits
+        if not self.spill_filter[bit >> 3] & (1 << (bit & 7)):
+            return None
+        row = self.spill_conn.execute(
+            "select uid from dedup where k=?", (self.key_to_bytes(key),)
+        ).fetchone()
+        if row:
+            return row[0]
+        return None
+
+    def add(self, key: int, uid: int):
+        from sys import getsizeof
+
+        self.uids[key] = uid
+        self.memory += getsizeof(key) + ENTRY_OVERHEAD
+        if self.memory > self.max_memory:
+            self.spill()
+
+    def key_to_bytes(self, key: int) -> bytes:
+        return key.to_bytes((key.bit_length() + 7) // 8, "big")
+
+    def open_spill(self):
+        import sqlite3
+        from tempfile import mkstemp
+        from os import close
+
+        fd, path = mkstemp(suffix=".dedup.sqlite", dir=self.spill_dir)
+        close(fd)
+        self.spill_path = Path(path)
+        self.spill_conn = sqlite3.connect(path)
+        self.spill_conn.execute("pragma journal_mode=off")
+        self.spill_conn.execute("pragma synchronous=off")
+        self.spill_conn.execute(
+            "create table dedup (k blob primary key, uid integer) without rowid"
+        )
+        self.spill_filter = bytearray(self.filter_bits >> 3)
+
+    def spill(self):
+        if not self.uids:
+            return
+        if self.spill_conn is None:
+            self.open_spill()
+        if self.spill_conn is None or self.spill_filter is None:
+            raise
+        spill_filter = self.spill_filter
+        filter_bits = self.filter_bits
+        for key in self.uids.keys():
+            bit = hash(key) % filter_bits
+            spill_filter[bit >> 3] |= 1 << (bit & 7)
+        key_to_bytes = self.key_to_bytes
+        self.spill_conn.executemany(
+            "insert into dedup values (?, ?)",
+            ((key_to_bytes(key), uid) for key, uid in sorted(self.uids.items())),
+        )
+        self.spill_conn.commit()
+        self.uids = {}
+        self.memory = 0
+        self.num_spills += 1
+
+    def close(self):
+        if self.spill_conn is not None:
+            self.spill_conn.close()
+            self.spill_conn = None
+        if self.spill_path is not None:
+            self.spill_path.unlink(missing_ok=True)
+            self.spill_path = None
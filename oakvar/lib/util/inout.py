@@ -49,7 +49,19 @@ from typing import Union
 from typing import Optional
 from typing import Dict
 from typing import Any
+from typing import List
+from typing import Tuple
 from pathlib import Path
+from re import compile
+
+# Tokens which json.loads reads as a number. float accepts more, such as
+# "inf", "1_0", and ".5", which json.loads rejects.
+JSON_NUMBER_RE = compile(r"-?(?:0|[1-9][0-9]*)(?:\.[0-9]+)?(?:[eE][-+]?[0-9]+)?")
+
+# marker byte (never "#"), number of bytes, and number of rows
+ARROW_BLOCK_HEADER_FMT = "<BQQ"
+ARROW_BLOCK_HEADER_SIZE = 17
+ARROW_BLOCK_SIZE = 8192
 
 
 class BaseFile(object):
@@ -78,21 +90,31 @@ class BaseFile(object):
 
 class FileReader(BaseFile):
     def __init__(
-        self, path, seekpos: int = 0, chunksize: Optional[int] = None, logger=None
+        self,
+        path,
+        seekpos: int = 0,
+        chunksize: Optional[int] = None,
+        logger=None,
+        encoding: Optional[str] = None,
     ):
         from .util import detect_encoding
 
         super().__init__(path)
         self.seekpos = seekpos
         self.chunksize = chunksize
-        self.encoding = detect_encoding(self.path)
+        self.fmt: str = get_file_format(self.path)
+        if not encoding and self.fmt:
+            # FileWriter writes utf-8.
+            encoding = "utf-8"
+        self.encoding = encoding or detect_encoding(self.path)
         self.annotator_name = ""
         self.annotator_displayname = ""
         self.annotator_version = ""
         self.index_columns = []
         self.report_substitution = None
         self.f = None
-        self.csvfmt: bool = False
+        self.csvfmt: bool = self.fmt == "csv"
+        self.arrowfmt: bool = self.fmt == "arrow"
         self.logger = logger
         self._setup_definition()
 
@@ -100,10 +122,6 @@ class FileReader(BaseFile):
         from json import loads
         from json.decoder import JSONDecodeError
 
-        with open(self.path, encoding=self.encoding) as f:
-            line = f.readline()[:-1]
-            if line.startswith("#fmt=csv"):
-                self.csvfmt = True
         for line in self._loop_definition():
             if line.startswith("#name="):
                 self.annotator_name = line.split("=")[1]
@@ -133,6 +151,16 @@ class FileReader(BaseFile):
     def get_index_columns(self):
         return self.index_columns
 
+    def get_meta(self) -> Dict[str, str]:
+        """Returns the values of the #key=value meta lines by key."""
+        meta = {}
+        for line in self._loop_definition():
+            if "=" not in line:
+                continue
+            key, value = line[1:].split("=", 1)
+            meta[key] = value
+        return meta
+
     def override_column(
         self, index, name, title=None, data_type="string", cats=[], category=None
     ):
@@ -186,53 +214,118 @@ class FileReader(BaseFile):
         len_poss = len(poss)
         return max_line_no, chunksize, poss, len_poss, max_data_line_no
 
-    def loop_data(self):
+    def get_chunk_poss(
+        self, num_chunks: int, min_chunksize: int = 1000
+    ) -> List[Tuple[int, int]]:
+        """Splits data lines into about num_chunks chunks of (seekpos, number of
+        data lines) with one scan of the file. Chunk sizes are multiples of
+        min_chunksize, except the last chunk."""
+        if self.arrowfmt:
+            return self.get_arrow_chunk_poss(num_chunks)
+        marks: List[int] = []
+        num_data_lines: int = 0
+        with open(self.path, "rb") as f:
+            pos = 0
+            for line in f:
+                if not line.startswith(b"#"):
+                    if num_data_lines % min_chunksize == 0:
+                        marks.append(pos)
+                    num_data_lines += 1
+                pos += len(line)
+        if not marks:
+            return [(0, 0)]
+        stride = max(1, round(num_data_lines / max(num_chunks, 1) / min_chunksize))
+        poss: List[Tuple[int, int]] = []
+        for i in range(0, len(marks), stride):
+            chunksize = min(stride * min_chunksize, num_data_lines - i * min_chunksize)
+            poss.append((marks[i], chunksize))
+        return poss
+
+    def get_row_decoder(self, as_tuple: bool = False):
+        """Returns a function which converts the tokens of a data line into a
+        dict of typed values, or a tuple in column order if as_tuple is True.
+        The function is compiled once from the column definitions, as
+        namedtuple does, so that rows are decoded without per-cell type
+        dispatch."""
+        exprs = []
+        for col_index, col_def in self.columns.items():
+            if col_def.type == "int":
+                expr = f"decode_int_tok(toks[{col_index}])"
+            elif col_def.type == "float":
+                expr = f"decode_float_tok(toks[{col_index}])"
+            else:
+                expr = f"toks[{col_index}] or None"
+            if as_tuple:
+                exprs.append(expr)
+            else:
+                exprs.append(f"{col_def.name!r}: {expr}")
+        if as_tuple:
+            src = f"lambda toks: ({', '.join(exprs)}{',' if len(exprs) == 1 else ''})"
+        else:
+            src = f"lambda toks: {{{', '.join(exprs)}}}"
+        return eval(
+            src,
+            {"decode_int_tok": decode_int_tok, "decode_float_tok": decode_float_tok},
+        )
+
+    def get_arrow_chunk_poss(self, num_chunks: int) -> List[Tuple[int, int]]:
+        """get_chunk_poss of arrow format files. Chunks start at block
+        boundaries."""
+        blocks = [(pos, num_rows) for pos, num_rows, _ in self._loop_arrow_blocks()]
+        if not blocks:
+            return [(0, 0)]
+        num_data_lines = sum([num_rows for _, num_rows in blocks])
+        target_chunksize = -(-num_data_lines // max(num_chunks, 1))
+        poss: List[Tuple[int, int]] = []
+        for pos, num_rows in blocks:
+            if poss and poss[-1][1] < target_chunksize:
+                poss[-1] = (poss[-1][0], poss[-1][1] + num_rows)
+            else:
+                poss.append((pos, num_rows))
+        return poss
+
+    def loop_data(self, as_tuple: bool = False):
         from ..exceptions import BadFormatError
-        from json import loads
 
+        if self.arrowfmt:
+            yield from self._loop_arrow_data(as_tuple=as_tuple)
+            return
+        num_cols = len(self.columns)
+        decode = self.get_row_decoder(as_tuple=as_tuple)
         for lnum, toks in self._loop_data():
-            out = {}
-            if len(toks) < len(self.columns):
+            if len(toks) < num_cols:
                 err_msg = "Too few columns. Received %s. Expected %s." % (
                     len(toks),
-                    len(self.columns),
+                    num_cols,
                 )
                 return BadFormatError(err_msg)
-            for col_index, col_def in self.columns.items():
-                col_name = col_def.name
-                col_type = col_def.type
-                tok = toks[col_index]
-                if tok == "":
-                    out[col_name] = None
-                else:
-                    if col_type == "string":
-                        out[col_name] = tok
-                    elif col_type == "int":
-                        try:
-                            out[col_name] = int(tok)
-                        except ValueError:
-                            try:
-                                out[col_name] = int(float(tok))
-                            except Exception:
-                                out[col_name] = None
-                        except Exception:
-                            out[col_name] = None
-                    elif col_type == "float":
-                        try:
-                            tok = loads(tok)
-                            if type(tok) == list:
-                                out[col_name] = ",".join([str(v) for v in tok])
-                            else:
-                                out[col_name] = float(tok)
-                        except Exception:
-                            tok = None
-            yield lnum, toks, out
+            yield lnum, toks, decode(toks)
+
+    def loop_column_batches(self, batch_size: int = 65536):
+        """Yields pyarrow.RecordBatch of up to batch_size data lines with int64,
+        float64, and string columns. Float columns with list values are
+        returned as string columns."""
+        names, types = get_arrow_names_types(self.columns.values())
+        rows = []
+        for _, _, row in self.loop_data(as_tuple=True):
+            rows.append(row)
+            if len(rows) == batch_size:
+                yield make_record_batch(rows, names, types)
+                rows = []
+        if rows:
+            yield make_record_batch(rows, names, types)
 
     def get_data(self):
         all_data = [d for _, _, d in self.loop_data()]
         return all_data
 
     def _loop_definition(self):
+        if self.arrowfmt:
+            with open(self.path, "rb") as f:
+                while f.read(1) == b"#":
+                    f.seek(-1, 1)
+                    yield f.readline().decode(self.encoding).strip()
+            return
         if self.csvfmt:
             f = open(self.path, newline="", encoding=self.encoding)
         else:
@@ -282,6 +375,191 @@ class FileReader(BaseFile):
                     if self.chunksize is not None and lnum == self.chunksize:
                         break
 
+    def _loop_arrow_blocks(self, read: bool = False):
+        """Yields (position, number of rows, data) of the blocks of an arrow
+        format file, starting at seekpos. data is None unless read is True."""
+        from struct import unpack
+
+        with open(self.path, "rb") as f:
+            if self.seekpos:
+                f.seek(self.seekpos)
+            else:
+                skip_header(f)
+            while True:
+                pos = f.tell()
+                block_header = f.read(ARROW_BLOCK_HEADER_SIZE)
+                if len(block_header) < ARROW_BLOCK_HEADER_SIZE:
+                    break
+                _, num_bytes, num_rows = unpack(ARROW_BLOCK_HEADER_FMT, block_header)
+                if read:
+                    data = f.read(num_bytes)
+                else:
+                    data = None
+                    f.seek(num_bytes, 1)
+                yield pos, num_rows, data
+
+    def _loop_arrow_data(self, as_tuple: bool = False):
+        import pyarrow as pa
+
+        col_defs = list(self.columns.items())
+        names = [col_def.name for _, col_def in col_defs]
+        lnum = 0
+        for _, _, data in self._loop_arrow_blocks(read=True):
+            batch = pa.ipc.open_stream(data).read_next_batch()
+            cols = []
+            for col_index, col_def in col_defs:
+                arrow_type = batch.schema.field(col_index).type
+                values = batch.column(col_index).to_pylist()
+                cols.append(decode_arrow_values(values, arrow_type, col_def.type))
+            for row in zip(*cols):
+                lnum += 1
+                if as_tuple:
+                    yield lnum, row, row
+                else:
+                    yield lnum, row, dict(zip(names, row))
+                if self.chunksize and lnum >= self.chunksize:
+                    return
+
+
+def decode_int_tok(tok: str) -> Optional[int]:
+    if tok == "":
+        return None
+    try:
+        return int(tok)
+    except ValueError:
+        try:
+            return int(float(tok))
+        except Exception:
+            return None
+
+
+def decode_float_tok(tok: str) -> Union[float, str, None]:
+    if tok == "":
+        return None
+    if JSON_NUMBER_RE.fullmatch(tok):
+        return float(tok)
+    from json import loads
+
+    try:
+        value = loads(tok)
+        if type(value) == list:
+            return ",".join([str(v) for v in value])
+        return float(value)
+    except Exception:
+        return None
+
+
+def decode_arrow_values(values: List[Any], arrow_type, col_type: str) -> List[Any]:
+    """Converts the values of a column of an arrow format file into the
+    values which the same column of a csv format file would be read as."""
+    import pyarrow as pa
+
+    if col_type == "int":
+        if pa.types.is_integer(arrow_type):
+            return values
+        return [None if v is None else decode_int_tok(str(v)) for v in values]
+    elif col_type == "float":
+        if pa.types.is_floating(arrow_type):
+            return values
+        return [None if v is None else decode_float_tok(str(v)) for v in values]
+    elif pa.types.is_string(arrow_type):
+        return [v or None for v in values]
+    else:
+        return [None if v is None else str(v) for v in values]
+
+
+def get_file_format(path) -> str:
+    """Returns "csv" or "arrow" for files written by FileWriter, and "" for
+    other files."""
+    with open(path, "rb") as f:
+        line = f.readline(64)
+    if line.startswith(b"#fmt=csv"):
+        return "csv"
+    elif line.startswith(b"#fmt=arrow"):
+        return "arrow"
+    return ""
+
+
+def skip_header(f):
+    """Positions binary file f at the first byte after the meta lines."""
+    while True:
+        pos = f.tell()
+        if f.read(1) != b"#":
+            break
+        f.readline()
+    f.seek(pos)
+
+
+def concatenate_files(in_paths: List[str], out_path):
+    """Concatenates files of the same format and columns into out_path, keeping
+    the meta lines of the first file only."""
+    from shutil import copyfileobj
+
+    with open(out_path, "wb") as wf:
+        for file_no, in_path in enumerate(in_paths):
+            with open(in_path, "rb") as f:
+                if file_no > 0:
+                    skip_header(f)
+                copyfileobj(f, wf)
+
+
+def get_arrow_names_types(col_defs) -> Tuple[List[str], List[Any]]:
+    import pyarrow as pa
+
+    col_types = {"int": pa.int64(), "float": pa.float64()}
+    names = [col_def.name for col_def in col_defs]
+    types = [col_types.get(col_def.type, pa.string()) for col_def in col_defs]
+    return names, types
+
+
+def write_arrow_file(out_path, template_path, rows: List[tuple]):
+    """Writes rows to an arrow format file with the meta lines of the arrow
+    format file at template_path."""
+    template_reader = FileReader(template_path)
+    names, types = get_arrow_names_types(template_reader.columns.values())
+    with open(template_path, "rb") as f:
+        skip_header(f)
+        header_size = f.tell()
+        f.seek(0)
+        header = f.read(header_size)
+    with open(out_path, "wb") as wf:
+        wf.write(header)
+        for i in range(0, len(rows), ARROW_BLOCK_SIZE):
+            write_arrow_block(wf, rows[i : i + ARROW_BLOCK_SIZE], names, types)
+
+
+def write_arrow_block(wf, rows: List[tuple], names: List[str], types: List[Any]):
+    """Writes rows to binary file wf as one block of an arrow format file. A
+    block is a block header of a marker byte, the number of bytes, and the
+    number of rows, followed by an Arrow IPC stream of one record batch."""
+    from struct import pack
+    import pyarrow as pa
+
+    batch = make_record_batch(rows, names, types)
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, batch.schema) as writer:
+        writer.write_batch(batch)
+    data = sink.getvalue()
+    wf.write(pack(ARROW_BLOCK_HEADER_FMT, 0, data.size, len(rows)))
+    wf.write(data)
+
+
+def make_record_batch(rows: List[tuple], names: List[str], types: List[Any]):
+    import pyarrow as pa
+
+    arrays = []
+    for col_values, col_type in zip(zip(*rows), types):
+        try:
+            arrays.append(pa.array(col_values, type=col_type))
+        except (pa.ArrowInvalid, pa.ArrowTypeError, OverflowError):
+            arrays.append(
+                pa.array(
+                    [None if v is None else str(v) for v in col_values],
+                    type=pa.string(),
+                )
+            )
+    return pa.RecordBatch.from_arrays(arrays, names=names)
+
 
 class FileWriter(BaseFile):
     def __init__(
@@ -300,6 +578,8 @@ class FileWriter(BaseFile):
         self.csvfmt: bool = False
         if fmt == "csv":
             self.csvfmt = True
+        self.arrowfmt: bool = fmt == "arrow"
+        self.arrow_rows: List[tuple] = []
         self.csvwriter = None
         if fmt == "csv":
             self.wf = open(self.path, mode, newline="", encoding="utf-8")
@@ -312,6 +592,10 @@ class FileWriter(BaseFile):
             self.csvwriter = writer(self.wf, lineterminator=lineterminator)
             if mode == "w":
                 self.wf.write("#fmt=csv\n")
+        elif fmt == "arrow":
+            self.wf = open(self.path, mode, encoding="utf-8")
+            if mode == "w":
+                self.wf.write("#fmt=arrow\n")
         else:
             self.wf = open(self.path, mode, encoding="utf-8")
         self.mode: str = mode
@@ -405,6 +689,13 @@ class FileWriter(BaseFile):
         if not data:
             return
         self.prep_for_write()
+        if self.arrowfmt:
+            self.arrow_rows.append(
+                tuple([data.get(col.name, None) for col in self.columns.values()])
+            )
+            if len(self.arrow_rows) >= ARROW_BLOCK_SIZE:
+                self.write_arrow_rows()
+            return
         wtoks = [data.get(col.name, None) for col in self.columns.values()]
         if self.csvfmt:
             if self.csvwriter is not None:
@@ -417,7 +708,50 @@ class FileWriter(BaseFile):
         else:
             self.wf.write("\t".join(wtoks) + "\n")
 
+    def write_many(self, datas: List[Dict[str, Any]]):
+        """Writes the rows of datas at once. Empty rows are skipped as in
+        write_data."""
+        self.prep_for_write()
+        cols = list(self.columns.values())
+        if self.arrowfmt:
+            self.arrow_rows.extend(
+                [tuple([data.get(col.name) for col in cols]) for data in datas if data]
+            )
+            if len(self.arrow_rows) >= ARROW_BLOCK_SIZE:
+                self.write_arrow_rows()
+            return
+        rows = [[data.get(col.name) for col in cols] for data in datas if data]
+        if self.csvfmt:
+            if self.csvwriter is not None:
+                writerow = self.csvwriter.writerow
+                for wtoks in rows:
+                    try:
+                        writerow(wtoks)
+                    except Exception:
+                        import traceback
+
+                        traceback.print_exc()
+        else:
+            self.wf.write("".join(["\t".join(wtoks) + "\n" for wtoks in rows]))
+
+    def write_arrow_rows(self):
+        if not self.arrow_rows:
+            return
+        names, types = get_arrow_names_types(self.columns.values())
+        self.wf.flush()
+        for i in range(0, len(self.arrow_rows), ARROW_BLOCK_SIZE):
+            write_arrow_block(
+                self.wf.buffer,
+                self.arrow_rows[i : i + ARROW_BLOCK_SIZE],
+                names,
+                types,
+            )
+        self.wf.buffer.flush()
+        self.arrow_rows = []
+
     def close(self):
+        if self.arrowfmt:
+            self.write_arrow_rows()
         self.wf.close()
 
 
@@ -634,11 +968,22 @@ class ColumnDefinition(object):
         self.table = d.get("table", False)
         self.level = d.get("level")
         self.fhir = d.get("fhir")
+        if "stats" in d:
+            self.d["stats"] = d["stats"]
+        self.stats = d.get("stats")
 
     def change_name(self, name: str):
         self.name = name
         self.d["name"] = name
 
+    def set_categories(self, categories: Optional[List[str]]):
+        self.categories = categories
+        self.d["categories"] = categories
+
+    def set_stats(self, stats: Dict[str, Any]):
+        self.stats = stats
+        self.d["stats"] = stats
+
     def from_row(self, row, order=None):
         from json import loads
 
@@ -701,6 +1046,7 @@ class ColumnDefinition(object):
             "table": self.table,
             "level": self.level,
             "fhir": self.d.get("fhir"),
+            "col_stats": self.stats,
         }
 
     def __iter__(self):  # Allows casting to dict
@@ -708,21 +1054,248 @@ class ColumnDefinition(object):
             yield k, v
 
 
+class ColumnStats(object):
+    """Collects column statistics from batches of rows as they are written to a
+    result database. For each tracked column, it keeps the number of values.
+    For single and multi category columns, it keeps the distinct categories,
+    splitting values by ';'. For int and float columns, it keeps the minimum
+    and maximum.
+    """
+
+    def __init__(self):
+        self.counts: Dict[str, int] = {}
+        self.categories: Dict[str, set] = {}
+        self.mins: Dict[str, Any] = {}
+        self.maxs: Dict[str, Any] = {}
+        self.numeric_col_names: set = set()
+
+    def add_columns(self, col_defs):
+        for col_def in col_defs:
+            col_name = col_def.name
+            if not col_name or col_name in self.counts:
+                continue
+            self.counts[col_name] = 0
+            if col_def.category in ["single", "multi"]:
+                self.categories[col_name] = set()
+            if col_def.type in ["int", "float"]:
+                self.numeric_col_names.add(col_name)
+
+    def add_rows(self, col_names: List[str], rows):
+        if not rows:
+            return
+        for i, col_name in enumerate(col_names):
+            if col_name not in self.counts:
+                continue
+            values = [row[i] for row in rows]
+            self.counts[col_name] += len(values) - values.count(None)
+            col_cats = self.categories.get(col_name)
+            if col_cats is not None:
+                for value in set(values):
+                    if value is not None:
+                        col_cats.update(str(value).split(";"))
+            if col_name in self.numeric_col_names:
+                self.add_min_max(col_name, values)
+
+    def add_min_max(self, col_name: str, values):
+        nums = [v for v in values if v is not None]
+        if not nums:
+            return
+        try:
+            lo = min(nums)
+            hi = max(nums)
+            if col_name in self.mins:
+                lo = min(lo, self.mins[col_name])
+                hi = max(hi, self.maxs[col_name])
+        except TypeError:
+            # not numbers after all
+            self.numeric_col_names.discard(col_name)
+            self.mins.pop(col_name, None)
+            self.maxs.pop(col_name, None)
+            return
+        self.mins[col_name] = lo
+        self.maxs[col_name] = hi
+
+    def has_column(self, col_name: str) -> bool:
+        return col_name in self.counts
+
+    def get_categories(self, col_name: str) -> Optional[List[str]]:
+        col_cats = self.categories.get(col_name)
+        if col_cats is None:
+            return None
+        return list(col_cats)
+
+    def get_stats(self, col_name: str) -> Optional[Dict[str, Any]]:
+        if col_name not in self.counts:
+            return None
+        stats: Dict[str, Any] = {"count": self.counts[col_name]}
+        if col_name in self.mins:
+            stats["min"] = self.mins[col_name]
+            stats["max"] = self.maxs[col_name]
+        return stats
+
+
 def read_crv(fpath):
     import polars as pl
 
+    col_names = ["uid", "chrom", "pos", "pos_end", "ref_base", "alt_base"]
+    if get_file_format(fpath) == "arrow":
+        import pyarrow as pa
+
+        reader = FileReader(fpath)
+        batches = list(reader.loop_column_batches())
+        if batches:
+            table = pa.Table.from_batches(batches)
+        else:
+            names, types = get_arrow_names_types(reader.columns.values())
+            table = pa.schema(list(zip(names, types))).empty_table()
+        df = pl.from_arrow(table.select(list(range(len(col_names)))))
+        return df.rename(dict(zip(df.columns, col_names)))  # type: ignore
+
     # Read the CSV using the comment character
     df = pl.read_csv(
         fpath,
         comment_prefix="#",  # type: ignore
         has_header=False,
-        new_columns=["uid", "chrom", "pos", "pos_end", "ref_base", "alt_base"],
     )
 
     # Select only the first 6 columns to return
-    df = df.select(["uid", "chrom", "pos", "pos_end", "ref_base", "alt_base"])
+    df = df.select(df.columns[: len(col_names)])
+    return df.rename(dict(zip(df.columns, col_names)))
+
 
-    return df
+class LineBatchReader:
+    """Reads batches of (line_no, line) of a plain, gzip, or bgzip text file
+    through one file handle. line_no is 1-based and lines have no trailing
+    newline. A background thread reads up to num_read_ahead batches ahead.
+    """
+
+    def __init__(
+        self,
+        path: Union[Path, str],
+        batch_size: int,
+        encoding: Optional[str] = None,
+        start_line_no: int = 1,
+        num_read_ahead: int = 4,
+    ):
+        from queue import Queue
+        from threading import Thread
+        from threading import Event
+
+        self.path = str(path)
+        self.batch_size = batch_size
+        self.encoding = encoding or "utf-8"
+        self.start_line_no = start_line_no
+        self.next_line_no = start_line_no
+        self.queue = Queue(maxsize=num_read_ahead)
+        self.stop_event = Event()
+        self.eof: bool = False
+        self.thread = Thread(target=self._read_batches, daemon=True)
+        self.thread.start()
+
+    def _open(self):
+        from gzip import open as gzipopen
+        from .util import is_gzip_file
+
+        if is_gzip_file(self.path):
+            return gzipopen(self.path, "rt", encoding=self.encoding)
+        return open(self.path, encoding=self.encoding)
+
+    def _put(self, item) -> bool:
+        from queue import Full
+
+        while not self.stop_event.is_set():
+            try:
+                self.queue.put(item, timeout=0.1)
+                return True
+            except Full:
+                continue
+        return False
+
+    def _read_batches(self):
+        try:
+            with self._open() as f:
+                line_no = 0
+                batch = []
+                for line in f:
+                    line_no += 1
+                    if line_no < self.start_line_no:
+                        continue
+                    if line.endswith("\n"):
+                        line = line[:-1]
+                    batch.append((line_no, line))
+                    if len(batch) == self.batch_size:
+                        if not self._put(batch):
+                            return
+                        batch = []
+                if batch and not self._put(batch):
+                    return
+            self._put(None)
+        except Exception as e:
+            self._put(e)
+
+    def get_batch(self) -> List[Tuple[int, str]]:
+        if self.eof:
+            return []
+        batch = self.queue.get()
+        if isinstance(batch, Exception):
+            self.eof = True
+            raise batch
+        if batch is None:
+            self.eof = True
+            return []
+        self.next_line_no = batch[-1][0] + 1
+        return batch
+
+    def close(self):
+        self.stop_event.set()
+        self.thread.join()
+
+
+def get_byte_range_chunks(
+    path: Union[Path, str], chunk_bytes: int, start_pos: int = 0, start_line_no: int = 1
+):
+    """Yields (start, end, line_no) byte ranges of a file which end at line
+    boundaries. line_no is the 1-based line number of the first line of each range.
+
+    Ranges end after b"\n" or at the end of the file, so a b"\r\n" is never
+    split. Lines are counted as universal newlines count them, so that line
+    numbers match reading the file in text mode, also with b"\r" line ends.
+    """
+    from os.path import getsize
+
+    file_size = getsize(path)
+    with open(path, "rb") as f:
+        start = start_pos
+        line_no = start_line_no
+        while start < file_size:
+            f.seek(start)
+            data = f.read(chunk_bytes)
+            if start + len(data) < file_size:
+                data += f.readline()
+            end = start + len(data)
+            yield start, end, line_no
+            line_no += count_universal_newlines(data)
+            start = end
+
+
+def count_universal_newlines(data: bytes) -> int:
+    return data.count(b"\n") + data.count(b"\r") - data.count(b"\r\n")
+
+
+def is_ascii_compatible_encoding(encoding: Optional[str]) -> bool:
+    """Whether line ends are encoded as the single bytes b"\r" and b"\n" in
+    encoding, so that a file in it can be split into lines as bytes."""
+    from codecs import getincrementalencoder
+
+    if not encoding:
+        return True
+    try:
+        encoder = getincrementalencoder(encoding)()
+    except LookupError:
+        return False
+    # The first call may add a byte order mark.
+    encoder.encode("a")
+    return encoder.encode("\r\na") == b"\r\na"
 
 
 def get_file_content_as_table(fpath: Union[Path, str], title: str, outer=None):
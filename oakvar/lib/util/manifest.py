@@ -0,0 +1,195 @@
+# OakVar
+#
+# Copyright (c) 2024 Oak Bioinformatics, LLC
+#
+# All rights reserved.
+#
+# Do not distribute or use this software without obtaining
+# a license from Oak Bioinformatics, LLC.
+#
+# Do not use this software to develop another software
+# which competes with the products by Oak Bioinformatics, LLC,
+# without obtaining a license for such use from Oak Bioinformatics, LLC.
+#
+# For personal use of non-commercial nature, you may use this software
+# after registering with `ov store account create`.
+#
+# For research use of non-commercial nature, you may use this software
+# after registering with `ov store account create`.
+#
+# For use by commercial entities, you must obtain a commercial license
+# from Oak Bioinformatics, LLC. Please write to info@oakbioinformatics.com
+# to obtain the commercial license.
+# ================
+# OpenCRAVAT
+#
+# MIT License
+#
+# Copyright (c) 2021 KarchinLab
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of
+# this software and associated documentation files (the "Software"), to deal in
+# the Software without restriction, including without limitation the rights to
+# use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies
+# of the Software, and to permit persons to whom the Software is furnished to do
+# so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+from typing import Optional
+from typing import List
+from typing import Dict
+from typing import Any
+from pathlib import Path
+
+MANIFEST_VERSION: int = 1
+HASH_READ_SIZE: int = 1 << 20
+
+
+class RunManifest:
+    """Records how the outputs of each stage of a run were made, so that a
+    later run with the same settings can reuse them.
+
+    Each stage has a fingerprint, a hash of what its outputs depend on
+    (input file contents, module versions and options, and the fingerprints
+    of upstream stages), and the size and modification time of its output
+    files. A stage is reusable if its fingerprint is unchanged and its
+    output files are unchanged since they were recorded.
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.stages: Dict[str, Dict[str, Any]] = {}
+
+    def load(self):
+        from json import loads
+
+        self.stages = {}
+        if not self.path.exists():
+            return
+        try:
+            d = loads(self.path.read_text())
+        except ValueError:
+            return
+        if d.get("version") != MANIFEST_VERSION:
+            return
+        self.stages = d.get("stages", {})
+
+    def save(self):
+        from json import dumps
+
+        d = {"version": MANIFEST_VERSION, "stages": self.stages}
+        tmp_path = self.path.with_name(self.path.name + ".tmp")
+        tmp_path.write_text(dumps(d, indent=2, sort_keys=True))
+        tmp_path.replace(self.path)
+
+    def get_stage(self, stage: str) -> Optional[Dict[str, Any]]:
+        return self.stages.get(stage)
+
+    def get_fingerprint(self, stage: str) -> Optional[str]:
+        entry = self.stages.get(stage)
+        if not entry:
+            return None
+        return entry.get("fingerprint")
+
+    def outputs_unchanged(self, stage: str) -> bool:
+        entry = self.stages.get(stage)
+        if not entry:
+            return False
+        for fn, stat in entry.get("outputs", {}).items():
+            if get_file_stat(self.path.parent / fn) != stat:
+                return False
+        return True
+
+    def is_fresh(self, stage: str, fingerprint: str) -> bool:
+        return (
+            self.get_fingerprint(stage) == fingerprint
+            and self.outputs_unchanged(stage)
+        )
+
+    def record(
+        self,
+        stage: str,
+        fingerprint: str,
+        output_paths: List[Path] = [],
+        **extra,
+    ):
+        outputs = {}
+        for output_path in output_paths:
+            stat = get_file_stat(output_path)
+            if stat is not None:
+                outputs[Path(output_path).name] = stat
+        entry: Dict[str, Any] = {"fingerprint": fingerprint, "outputs": outputs}
+        entry.update(extra)
+        self.stages[stage] = entry
+
+    def remove(self, stage: str):
+        self.stages.pop(stage, None)
+
+
+def get_file_stat(path) -> Optional[List[int]]:
+    from os import stat
+
+    try:
+        st = stat(path)
+    except OSError:
+        return None
+    return [st.st_size, st.st_mtime_ns]
+
+
+def get_file_hash(path) -> str:
+    from hashlib import sha256
+
+    h = sha256()
+    with open(path, "rb") as f:
+        while True:
+            data = f.read(HASH_READ_SIZE)
+            if not data:
+                break
+            h.update(data)
+    return h.hexdigest()
+
+
+def get_fingerprint(*parts) -> str:
+    from hashlib import sha256
+    from json import dumps
+
+    s = dumps(parts, sort_keys=True, default=str)
+    return sha256(s.encode()).hexdigest()
+
+
+def get_module_fingerprint(module, module_options: Dict[str, Any] = {}) -> str:
+    """Fingerprint of a module's code, data, and options. The code is hashed,
+    and the data is represented by the data source in the module's yml file and
+    the size and modification time of the files in the module's data
+    directory."""
+    from pathlib import Path
+
+    if module is None:
+        return get_fingerprint(None)
+    code_hashes = {}
+    for path in [module.script_path, module.conf_path]:
+        if path and Path(path).exists():
+            code_hashes[Path(path).name] = get_file_hash(path)
+    data_stats = {}
+    data_dir = Path(module.directory) / "data"
+    if data_dir.is_dir():
+        for path in sorted(data_dir.iterdir()):
+            data_stats[path.name] = get_file_stat(path)
+    return get_fingerprint(
+        module.name,
+        module.code_version,
+        module.data_source,
+        code_hashes,
+        data_stats,
+        module_options,
+    )
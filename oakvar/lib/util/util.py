@@ -201,6 +201,16 @@ def get_argument_parser_defaults(parser):
     return defaults
 
 
+def is_gzip_file(path) -> bool:
+    """is_gzip_file. True for gzip and bgzip files.
+
+    Args:
+        path:
+    """
+    with open(path, "rb") as f:
+        return f.read(2) == b"\x1f\x8b"
+
+
 def detect_encoding(path):
     """detect_encoding.
 
@@ -212,7 +222,7 @@ def detect_encoding(path):
 
     if " " not in path:
         path = path.strip('"')
-    if path.endswith(".gz"):
+    if is_gzip_file(path):
         f = gzipopen(path)
     else:
         f = open(path, "rb")
@@ -800,28 +810,100 @@ def get_result_db_conn(db_path: str):
 
 
 def get_sample_uid_variant_arrays(
-    db_path: str, variant_criteria=None, use_zygosity: bool = True
-) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
-    """Gets a Polars DataFrame of the presence of variants in samples.
+    db_path: str,
+    variant_criteria=None,
+    use_zygosity: bool = True,
+    sparse: bool = False,
+    dtype=np.int8,
+) -> Tuple[np.ndarray, np.ndarray, Any]:
+    """Gets a matrix of the presence of variants in samples.
 
     Rows are samples and columns are variants.
 
     Args:
         db_path (str): Path to the OakVar result database file
-                       from which a Polars DataFrame will be extracted.
+                       from which the matrix will be extracted.
+        variant_criteria (Optional[str]): SQL condition on the variant table
+            to select variants.
+        use_zygosity (bool): If True, heterozygous variants are 1 and
+            homozygous variants are 2. Otherwise, present variants are 1.
+        sparse (bool): If True, the matrix is a `scipy.sparse.csr_matrix`,
+            which needs the `scipy` module.
+        dtype: Data type of the matrix.
 
     Returns:
-        Optional[Tuple[numpy.ndarray, numpy.ndarray, numpy.ndarray]]: If no error, three DataFrames will be returned.
+        Tuple[numpy.ndarray, numpy.ndarray, Any]: Three arrays are returned.
             The first array is a 1D array of sample names.
             The second array is a 1D array of variant UIDs.
-            The third array is a 2D array of variant presence in samples.
+            The third array is a 2D array or a CSR matrix of variant presence in samples.
     """
+    import sqlite3
+
+    conn = sqlite3.connect(db_path)
+    cursor = conn.cursor()
+    samples, uids = get_sample_uid_axes(cursor, variant_criteria=variant_criteria)
+    arr = get_sample_uid_matrix(
+        cursor, samples, uids, use_zygosity=use_zygosity, sparse=sparse, dtype=dtype
+    )
+    cursor.close()
+    conn.close()
+    return samples, uids, arr
+
 
+def iter_sample_uid_variant_arrays(
+    db_path: str,
+    block_size: int = 100,
+    variant_criteria=None,
+    use_zygosity: bool = True,
+    sparse: bool = False,
+    dtype=np.int8,
+):
+    """Yields matrices of the presence of variants in blocks of samples.
+
+    Same as `get_sample_uid_variant_arrays`, but the matrix is made and
+    yielded for `block_size` samples at a time, to limit memory use with
+    large cohorts. All blocks have the same variant UID columns.
+
+    Args:
+        db_path (str): Path to the OakVar result database file
+                       from which the matrices will be extracted.
+        block_size (int): Number of samples in each block.
+        variant_criteria (Optional[str]): SQL condition on the variant table
+            to select variants.
+        use_zygosity (bool): If True, heterozygous variants are 1 and
+            homozygous variants are 2. Otherwise, present variants are 1.
+        sparse (bool): If True, the matrices are `scipy.sparse.csr_matrix`,
+            which needs the `scipy` module.
+        dtype: Data type of the matrices.
+
+    Yields:
+        Tuple[numpy.ndarray, numpy.ndarray, Any]: Sample names of the block,
+            variant UIDs, and a 2D array or a CSR matrix of variant presence
+            in the samples of the block.
+    """
     import sqlite3
-    import numpy as np
 
     conn = sqlite3.connect(db_path)
     cursor = conn.cursor()
+    try:
+        samples, uids = get_sample_uid_axes(cursor, variant_criteria=variant_criteria)
+        for start in range(0, len(samples), block_size):
+            block_samples = samples[start : start + block_size]
+            arr = get_sample_uid_matrix(
+                cursor,
+                block_samples,
+                uids,
+                use_zygosity=use_zygosity,
+                sparse=sparse,
+                dtype=dtype,
+            )
+            yield block_samples, uids, arr
+    finally:
+        cursor.close()
+        conn.close()
+
+
+def get_sample_uid_axes(cursor, variant_criteria=None) -> Tuple[np.ndarray, np.ndarray]:
     cursor.execute("select distinct(base__sample_id) from sample")
     samples = np.array([r[0] for r in cursor.fetchall()], dtype=str)
     samples.sort()
@@ -831,54 +913,78 @@ def get_sample_uid_variant_arrays(
         )
     else:
         cursor.execute("select distinct(base__uid) from variant order by base__uid")
-    uids = [r[0] for r in cursor.fetchall()]
-    num_samples = len(samples)
-    num_uids = len(uids)
-    arr = np.zeros([num_samples, num_uids])
-    for sample_no in range(num_samples):
-        if use_zygosity:
-            if variant_criteria is not None:
-                cursor.execute(
-                    "select s.base__uid, s.base__zygosity from (select base__uid, base__zygosity from sample where base__sample_id=?) as s, (select base__uid from variant where "
-                    + variant_criteria
-                    + ") as v on s.base__uid = v.base__uid order by s.base__uid",
-                    (samples[sample_no],),
-                )
-            else:
-                cursor.execute(
-                    "select base__uid, base__zygosity from sample where base__sample_id=? order by base__uid",
-                    (samples[sample_no],),
-                )
+    uids = np.array([r[0] for r in cursor.fetchall()], dtype=np.uint32)
+    return samples, uids
+
+
+def get_sample_uid_matrix(
+    cursor,
+    samples: np.ndarray,
+    uids: np.ndarray,
+    use_zygosity: bool = True,
+    sparse: bool = False,
+    dtype=np.int8,
+):
+    if sparse:
+        try:
+            from scipy.sparse import csr_matrix
+        except ModuleNotFoundError as e:
+            raise ValueError(
+                "To get a sparse matrix, you need to install the `scipy` module."
+            ) from e
+    else:
+        csr_matrix = None
+    shape = (len(samples), len(uids))
+    if use_zygosity:
+        q = (
+            "select base__uid, case base__zygosity when 'het' then 1 "
+            + "when 'hom' then 2 else 0 end from sample where base__sample_id=?"
+        )
+    else:
+        q = "select base__uid, 1 from sample where base__sample_id=?"
+    if csr_matrix:
+        arr = None
+        row_nos = []
+        col_nos = []
+        data = []
+    else:
+        arr = np.zeros(shape, dtype=dtype)
+    for sample_no, sample in enumerate(samples.tolist()):
+        cursor.execute(q, (sample,))
+        rows = cursor.fetchall()
+        if not rows:
+            continue
+        rows = np.array(rows, dtype=np.int64)
+        row_uids = rows[:, 0]
+        row_values = rows[:, 1]
+        if not row_values.all():
+            cursor.execute(
+                "select base__zygosity from sample where base__sample_id=? and base__uid=?",
+                (sample, int(row_uids[row_values == 0][0])),
+            )
+            raise ValueError(f"Unknown zygosity: {cursor.fetchone()[0]}")
+        # Variants not in uids are those not selected by variant_criteria.
+        uid_nos = np.searchsorted(uids, row_uids)
+        found = uid_nos < len(uids)
+        found[found] = uids[uid_nos[found]] == row_uids[found]
+        uid_nos = uid_nos[found]
+        row_values = row_values[found].astype(dtype)
+        if arr is not None:
+            arr[sample_no, uid_nos] = row_values
         else:
-            if variant_criteria is not None:
-                cursor.execute(
-                    "select s.base__uid from (select base__uid from sample where base__sample_id=?) as s, (select base__uid from variant where "
-                    + variant_criteria
-                    + ") as v on s.base__uid = v.base__uid order by s.base__uid",
-                    (samples[sample_no],),
-                )
-            else:
-                cursor.execute(
-                    "select base__uid from sample where base__sample_id=? order by base__uid",
-                    (samples[sample_no],),
-                )
-        for r in cursor.fetchall():
-            if variant_criteria is not None:
-                pos = uids.index(r[0])
-            else:
-                pos = r[0] - 1
-            if use_zygosity:
-                zygosity = r[1]
-                if zygosity == "het":
-                    arr[sample_no][pos] = 1
-                elif zygosity == "hom":
-                    arr[sample_no][pos] = 2
-                else:
-                    raise ValueError(f"Unknown zygosity: {zygosity}")
-            else:
-                arr[sample_no][pos] = 1
-    uids = np.array(uids, dtype=np.uint32)
-    return samples, uids, arr
+            row_nos.append(np.full(len(uid_nos), sample_no, dtype=np.int64))
+            col_nos.append(uid_nos)
+            data.append(row_values)
+    if csr_matrix:
+        if data:
+            arr = csr_matrix(
+                (np.concatenate(data), (np.concatenate(row_nos), np.concatenate(col_nos))),
+                shape=shape,
+                dtype=dtype,
+            )
+        else:
+            arr = csr_matrix(shape, dtype=dtype)
+    return arr
 
 
 def get_df_from_db(
@@ -888,9 +994,14 @@ def get_df_from_db(
     num_cores: int = 1,
     conn=None,
     library: Optional[str] = "polars",
+    use_parquet: bool = True,
     ):
     """Gets a Polars DataFrame of a table in an OakVar result database.
 
+    If a Parquet file of the table (see `write_parquet_sidecar`) exists and
+    the result database has not changed since it was written, the table is
+    read from the Parquet file instead.
+
     Args:
         db_path (str): Path to the OakVar result database file
                        from which a Polars DataFrame will be extracted.
@@ -899,7 +1010,9 @@ def get_df_from_db(
             For example,
             `"select base__uid, base__chrom, base__pos from variant where
             clinvar__sig='Pathogenic'"`.
-        num_cores (int): Number of CPU cores to use
+        num_cores (int): Number of CPU cores to use. Without `sql`, the table
+            is read in this many rowid ranges in parallel.
+        use_parquet (bool): Use the Parquet file of the table if it is valid.
 
     Returns:
         DataFrame of the given or default table of the OakVar result database
@@ -910,61 +1023,201 @@ def get_df_from_db(
     import polars as pl
 
     environ["RUST_LOG"] = "connectorx=warn,connectorx_python=warn"
-    partition_ons = {
-        "variant": "base__uid",
-        "gene": "base__hugo",
-        "sample": "base__uid",
-        "mapping": "base__uid",
-    }
     df = None
     db_path_to_use = str(Path(db_path).absolute())
-    partition_on = partition_ons.get(table_name)
     if conn is not None:
         db_conn = conn
     else:
         db_conn = get_result_db_conn(db_path_to_use)
         if not db_conn:
             return None
-    if partition_on and table_name:
-        c = db_conn.cursor()
-        c.execute(f"select {partition_on} from {table_name} limit 1")
-        ret = c.fetchone()
-        if not ret:
-            sys.stderr.write(f"{partition_on} does not exist in {table_name}")
-            c.close()
-            return None
-        else:
-            c.close()
-    c = db_conn.cursor()
-    c.execute("select sql from sqlite_master where type='table' and tbl_name='variant'")
-    ret = c.fetchone()
-    if not ret:
+    if (
+        not sql
+        and use_parquet
+        and not getattr(db_conn, "in_transaction", False)
+    ):
+        parquet_path = get_parquet_sidecar_path(db_path_to_use, table_name)
+        if is_parquet_sidecar_valid(db_path_to_use, parquet_path):
+            if conn is None:
+                db_conn.close()
+            return pl.read_parquet(parquet_path, memory_map=True)
+    schema_overrides = get_table_pl_schema(db_conn, table_name)
+    if not schema_overrides:
+        sys.stderr.write(f"{table_name} does not exist in {db_path}")
+        if conn is None:
+            db_conn.close()
         return None
-    col_defs = ret[0].split("(")[1].rstrip(")").split(", ")
-    schema_overrides = {}
-    for col_def in col_defs:
-        parts = col_def.split(" ")
-        col_name = parts[0]
-        col_type = parts[1]
-        if col_type == "text":
-            pl_type = pl.String
-        elif col_type == "integer":
-            pl_type = pl.Int32
-        elif col_type == "float":
-            pl_type = pl.Float32
-        else:
-            sys.stderr.write("Unknown column type: " + col_type)
-            return None
-        schema_overrides[col_name] = pl_type
-    c.close()
-    if not sql:
-        sql = f"select * from {table_name}"
-    df = pl.read_database(sql, db_conn, schema_overrides=schema_overrides)  # type: ignore
+    if conn is None:
+        # Without a connection of the caller, the database file is read
+        # with connectorx, and whole tables in rowid ranges if num_cores > 1.
+        try:
+            if sql:
+                df = pl.read_database_uri(
+                    sql, f"sqlite://{db_path_to_use}", engine="connectorx"
+                )
+            else:
+                df = read_table_with_connectorx(
+                    db_path_to_use, table_name, num_cores=num_cores
+                )
+        except Exception as e:
+            sys.stderr.write(f"Reading {db_path} with connectorx failed: {e}\n")
+            df = None
+        if df is not None:
+            df = df.cast(
+                {
+                    col_name: pl_type
+                    for col_name, pl_type in schema_overrides.items()
+                    if col_name in df.columns
+                }
+            )
+    if df is None:
+        if not sql:
+            sql = f"select * from {table_name}"
+        df = pl.read_database(sql, db_conn, schema_overrides=schema_overrides)  # type: ignore
     if conn is None:
         db_conn.close()
     return df
 
 
+def get_table_pl_schema(db_conn, table_name: str) -> Dict[str, Any]:
+    """Gets Polars data types of the columns of a result database table.
+
+    Column definitions in the header table of the table (for example,
+    variant_header) are used. For tables without a header table, declared
+    SQLite column types are used.
+    """
+    from json import loads
+    import polars as pl
+
+    header_pl_types = {"string": pl.String, "int": pl.Int32, "float": pl.Float32}
+    sql_pl_types = {
+        "text": pl.String,
+        "integer": pl.Int32,
+        "real": pl.Float32,
+        "float": pl.Float32,
+    }
+    c = db_conn.cursor()
+    c.execute(f"pragma table_info({table_name})")
+    sql_types = {r[1]: r[2].lower() for r in c.fetchall()}
+    header_types = {}
+    c.execute(
+        "select name from sqlite_master where type='table' and name=?",
+        (f"{table_name}_header",),
+    )
+    if c.fetchone():
+        c.execute(f"select col_name, col_def from {table_name}_header")
+        for col_name, col_def in c.fetchall():
+            header_types[col_name] = loads(col_def).get("type")
+    c.close()
+    schema = {}
+    for col_name, sql_type in sql_types.items():
+        pl_type = header_pl_types.get(header_types.get(col_name))
+        if not pl_type:
+            pl_type = sql_pl_types.get(sql_type)
+        if pl_type:
+            schema[col_name] = pl_type
+    return schema
+
+
+def read_table_with_connectorx(db_path: str, table_name: str, num_cores: int = 1):
+    import polars as pl
+
+    uri = f"sqlite://{db_path}"
+    if num_cores <= 1:
+        return pl.read_database_uri(f"select * from {table_name}", uri, engine="connectorx")
+    rowid_col = "_ov_rowid"
+    df = pl.read_database_uri(
+        f"select *, rowid as {rowid_col} from {table_name}",
+        uri,
+        engine="connectorx",
+        partition_on=rowid_col,
+        partition_num=num_cores,
+    )
+    return df.sort(rowid_col).drop(rowid_col)
+
+
+def get_parquet_sidecar_path(db_path: str, table_name: str = "variant") -> Path:
+    """Gets the path of the Parquet file of a result database table.
+
+    For run_name.sqlite, the path is run_name.<table_name>.parquet in the same
+    directory.
+    """
+    p = Path(db_path)
+    return p.with_name(f"{p.stem}.{table_name}.parquet")
+
+
+def get_db_file_signature(db_path: str) -> str:
+    from json import dumps
+
+    st = Path(db_path).stat()
+    signature = [st.st_size, st.st_mtime_ns]
+    # Changes stay in the write-ahead log until a checkpoint. An empty log is
+    # made just by opening the database, so it does not count.
+    try:
+        wal_st = Path(db_path + "-wal").stat()
+    except FileNotFoundError:
+        wal_st = None
+    if wal_st is not None and wal_st.st_size > 0:
+        signature.extend([wal_st.st_size, wal_st.st_mtime_ns])
+    return dumps(signature)
+
+
+def is_parquet_sidecar_valid(db_path: str, parquet_path: Path) -> bool:
+    from ..consts import PARQUET_DB_SIGNATURE_KEY
+
+    if not parquet_path.exists():
+        return False
+    try:
+        import pyarrow.parquet as pq
+
+        metadata = pq.read_schema(parquet_path).metadata or {}
+    except Exception:
+        return False
+    signature = metadata.get(PARQUET_DB_SIGNATURE_KEY.encode())
+    return signature is not None and signature.decode() == get_db_file_signature(
+        db_path
+    )
+
+
+def write_parquet_sidecar(
+    db_path: str, table_name: str = "variant", num_cores: int = 1
+) -> Optional[Path]:
+    """Writes a table of a result database to a Parquet file.
+
+    `get_df_from_db` reads the Parquet file instead of the database as long
+    as the database does not change. Any change to the database makes the
+    Parquet file obsolete, and it should be written again.
+
+    Args:
+        db_path (str): Path to the OakVar result database file
+        table_name (str): Table to write
+        num_cores (int): Number of CPU cores to use to read the table
+
+    Returns:
+        Path of the Parquet file, or None if the table could not be read.
+    """
+    from os import replace
+    import pyarrow.parquet as pq
+    from ..consts import PARQUET_DB_SIGNATURE_KEY
+
+    db_path = str(Path(db_path).absolute())
+    signature = get_db_file_signature(db_path)
+    df = get_df_from_db(
+        db_path, table_name=table_name, num_cores=num_cores, use_parquet=False
+    )
+    if df is None:
+        return None
+    table = df.to_arrow()
+    metadata = dict(table.schema.metadata or {})
+    metadata[PARQUET_DB_SIGNATURE_KEY.encode()] = signature.encode()
+    table = table.replace_schema_metadata(metadata)
+    parquet_path = get_parquet_sidecar_path(db_path, table_name)
+    tmp_path = parquet_path.with_name(parquet_path.name + ".tmp")
+    pq.write_table(table, tmp_path)
+    replace(tmp_path, parquet_path)
+    return parquet_path
+
+
 def is_in_jupyter_notebook() -> bool:
     import os
 